@@ -1,3 +1,3 @@
 """Flask service package for VLMEvalKit evaluation server."""
 
-__all__ = ["app", "jobs"]
+__all__ = ["app", "jobs", "events"]
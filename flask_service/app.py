@@ -1,6 +1,9 @@
 from flask import Flask, request, jsonify, send_file, Response, stream_with_context
-from .jobs import JobManager
+from .jobs import JobManager, DONE_STATUS
+from .events import EventIndex, FileIndex, event_file, read_events
+import json
 import os
+import time
 
 app = Flask(__name__)
 
@@ -9,6 +12,8 @@ WORK_ROOT = os.environ.get("MMEVAL_ROOT", os.path.abspath(os.path.join(os.path.d
 os.makedirs(WORK_ROOT, exist_ok=True)
 
 manager = JobManager(work_root=WORK_ROOT)
+event_index = EventIndex()
+file_index = FileIndex()
 
 
 @app.route("/submit", methods=["POST"])
@@ -21,7 +26,9 @@ def submit():
     - data: dataset name or list of dataset names (required)
     - work_dir: optional subdirectory under outputs
     - mode: 'all'|'infer'|'eval'
-    - extra_args: dict mapping to extra command line args
+    - extra_args: dict mapping to extra command line args (`gpus`: number of GPUs the job needs)
+    - user: optional submitter name, jobs of different users share the workers fairly
+    - priority: optional int (default 0), pending jobs with a higher priority start first
     """
     spec = request.get_json() or {}
 
@@ -58,7 +65,11 @@ def submit():
     # We will use `lmdeploy` as the model entry in VLMEvalKit config to invoke the LMDeploy API
     model = 'lmdeploy'
 
-    job = manager.create_job(model=model, data=data, work_dir=work_dir, mode=mode, extra_args=extra)
+    try:
+        job = manager.create_job(model=model, data=data, work_dir=work_dir, mode=mode, extra_args=extra,
+                                 user=spec.get('user'), priority=spec.get('priority', 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"job_id": job.job_id, "status": job.status})
 
 
@@ -70,6 +81,28 @@ def status(job_id):
     return jsonify(j.to_dict())
 
 
+@app.route("/cancel/<job_id>", methods=["POST"])
+def cancel(job_id):
+    j = manager.cancel_job(job_id)
+    if not j:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify({"job_id": j.job_id, "status": j.status})
+
+
+@app.route("/jobs", methods=["GET"])
+def jobs():
+    """List the latest jobs.
+
+    Query params:
+    - status: optional, e.g. pending / running / finished / failed / cancelled
+    - user: optional submitter name
+    - limit: max number of jobs to return (default 100)
+    """
+    limit = int(request.args.get('limit') or 100)
+    js = manager.list_jobs(status=request.args.get('status'), user=request.args.get('user'), limit=limit)
+    return jsonify([j.to_dict() for j in js])
+
+
 @app.route("/results/<job_id>", methods=["GET"])
 def results(job_id):
     j = manager.get_job(job_id)
@@ -77,12 +110,7 @@ def results(job_id):
         return jsonify({"error": "job not found"}), 404
     if j.status != "finished":
         return jsonify({"error": "job not finished", "status": j.status}), 400
-    out_dir = j.work_dir
-    files = []
-    for root, _, filenames in os.walk(out_dir):
-        for fn in filenames:
-            files.append(os.path.relpath(os.path.join(root, fn), out_dir))
-    return jsonify({"work_dir": out_dir, "files": files})
+    return jsonify({"work_dir": j.work_dir, "files": file_index.get(j)})
 
 
 @app.route("/download/<job_id>", methods=["GET"])
@@ -95,10 +123,88 @@ def download(job_id):
         return jsonify({"error": "job not finished", "status": j.status}), 400
     if not path:
         return jsonify({"error": "query param 'path' required (relative to work_dir)"}), 400
-    file_path = os.path.join(j.work_dir, path)
-    if not os.path.exists(file_path):
+    # Only the files listed in the results can be downloaded
+    if os.path.normpath(path) not in file_index.get(j):
         return jsonify({"error": "file not found"}), 404
-    return send_file(file_path, as_attachment=True)
+    return send_file(os.path.join(j.work_dir, os.path.normpath(path)), as_attachment=True)
+
+
+@app.route("/progress/<job_id>", methods=["GET"])
+def progress(job_id):
+    """Latest structured progress of a job: one `progress` event per (stage, loop, rank), evaluation results and
+    errors."""
+    j = manager.get_job(job_id)
+    if not j:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(event_index.summary(j))
+
+
+@app.route("/progress", methods=["GET"])
+def progress_batch():
+    """Progress of many jobs in one request.
+
+    Query params:
+    - ids: comma separated job ids; if not set, the jobs with the given `status` (default running)
+    - limit: max number of jobs when listing by status (default 100)
+    """
+    if request.args.get('ids'):
+        js = [manager.get_job(x) for x in request.args['ids'].split(',')]
+        js = [x for x in js if x is not None]
+    else:
+        limit = int(request.args.get('limit') or 100)
+        js = manager.list_jobs(status=request.args.get('status', 'running'), limit=limit)
+    return jsonify([event_index.summary(j) for j in js])
+
+
+@app.route("/events/<job_id>/stream", methods=["GET"])
+def events_stream(job_id):
+    """Stream the structured events of a job as server-sent events, until the job ends.
+
+    The event id is the byte offset in the event file: a client reconnecting with `Last-Event-ID` (or the query
+    param `offset`) resumes after the last event it received.
+
+    Query params:
+    - offset: optional byte offset to start from (default 0, the whole history)
+    - timeout: seconds to stream (default 3600)
+    """
+    j = manager.get_job(job_id)
+    if not j:
+        return jsonify({"error": "job not found"}), 404
+
+    offset = int(request.headers.get('Last-Event-ID') or request.args.get('offset') or 0)
+    timeout = int(request.args.get('timeout') or 3600)
+    path = event_file(j.work_dir)
+
+    def generator(offset, timeout_sec):
+        start = last_sent = time.time()
+        wait = 0.2
+        done_polls = 0
+        while time.time() - start < timeout_sec:
+            events, offset = read_events(path, offset)
+            for event, end in events:
+                yield f"id: {end}\nevent: {event.get('event', 'message')}\ndata: {json.dumps(event)}\n\n"
+                if event.get('event') == 'status' and event.get('status') in DONE_STATUS:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+            if len(events):
+                last_sent, wait = time.time(), 0.2
+                continue
+            job = manager.get_job(job_id)
+            if job is None or job.status in DONE_STATUS:
+                # Jobs without a final status event (e.g. run by an older service): stop once the file is quiet
+                done_polls += 1
+                if done_polls > 2:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+            if time.time() - last_sent > 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+            # Back off while the job is quiet, the file is only stat-ed
+            time.sleep(wait)
+            wait = min(wait * 2, 2)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generator(offset, timeout)), mimetype='text/event-stream', headers=headers)
 
 
 def _select_log_file(job, path: str = None):
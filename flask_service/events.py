@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+# Structured events of a job (json lines), written by run.py (see `vlmeval/utils/progress.py`) and by the service
+EVENT_FILE = 'events.jsonl'
+
+
+def event_file(work_dir: str) -> str:
+    return os.path.join(work_dir, EVENT_FILE)
+
+
+def append_event(work_dir: str, event: str, **kwargs):
+    record = dict(event=event, time=time.time(), **kwargs)
+    try:
+        with open(event_file(work_dir), 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    except OSError:
+        pass
+
+
+def read_events(path: str, offset: int = 0):
+    """Read the complete events after byte `offset`. Returns ([(event, end offset)], new offset).
+
+    The file is only read if it grew, a partially written last line is left for the next call.
+    """
+    try:
+        if os.path.getsize(path) <= offset:
+            return [], offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    events = []
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b'\n'):
+            break
+        offset += len(line)
+        try:
+            events.append((json.loads(line), offset))
+        except ValueError:
+            continue
+    return events, offset
+
+
+class EventIndex:
+    """Latest progress of each job, folded incrementally from its event file.
+
+    Each call only reads the bytes appended since the previous call, so polling the progress of many jobs costs a
+    `stat` per job when nothing changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+
+    @staticmethod
+    def _fold(state, event):
+        kind = event.get('event')
+        if kind == 'progress':
+            key = '|'.join(str(event.get(k)) for k in ['stage', 'model', 'dataset', 'name', 'rank'])
+            state['progress'][key] = event
+        elif kind == 'eval_finished':
+            state['results'].append(event)
+        elif kind == 'failed':
+            state['errors'].append(event)
+        elif kind == 'status':
+            state['status'] = event.get('status')
+        state['updated_at'] = event.get('time', state['updated_at'])
+
+    def summary(self, job) -> dict:
+        with self.lock:
+            state = self.states.setdefault(job.job_id, dict(
+                offset=0, status=None, progress={}, results=[], errors=[], updated_at=None))
+            events, state['offset'] = read_events(event_file(job.work_dir), state['offset'])
+            for event, _ in events:
+                self._fold(state, event)
+            return {
+                'job_id': job.job_id,
+                'status': job.status,
+                'progress': list(state['progress'].values()),
+                'results': list(state['results']),
+                'errors': list(state['errors']),
+                'updated_at': state['updated_at'],
+            }
+
+
+class FileIndex:
+    """File list of the work_dir of finished jobs, built once instead of walking the directory on every request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+
+    def get(self, job) -> list:
+        with self.lock:
+            cached = self.files.get(job.job_id)
+            if cached is not None and cached[0] == job.status:
+                return cached[1]
+        files = []
+        for root, _, filenames in os.walk(job.work_dir):
+            for fn in filenames:
+                files.append(os.path.relpath(os.path.join(root, fn), job.work_dir))
+        files.sort()
+        with self.lock:
+            self.files[job.job_id] = (job.status, files)
+        return files
@@ -1,23 +1,92 @@
 import uuid
 import json
 import os
+import signal
+import socket
+import sqlite3
 import subprocess
 import threading
 import tempfile
 from datetime import datetime
 from typing import Optional
+from urllib.parse import urlparse
+
+from .events import append_event, event_file
+
+# Jobs running at the same time, and jobs running at the same time against one API endpoint (host)
+MAX_JOBS = int(os.environ.get('MMEVAL_MAX_JOBS', 4))
+ENDPOINT_JOBS = int(os.environ.get('MMEVAL_ENDPOINT_JOBS', 2))
+# Statuses after which a job never changes
+DONE_STATUS = ('finished', 'failed', 'cancelled')
+
+
+def _now():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def _list_gpus():
+    # GPUs that can be given to jobs: `MMEVAL_GPUS` (e.g. `0,1,2,3`), else CUDA_VISIBLE_DEVICES, else nvidia-smi
+    visible = os.environ.get('MMEVAL_GPUS', os.environ.get('CUDA_VISIBLE_DEVICES'))
+    if visible is not None:
+        return [x.strip() for x in visible.split(',') if x.strip()]
+    try:
+        output = subprocess.check_output(['nvidia-smi', '--query-gpu=index', '--format=csv,noheader'], text=True)
+        return [x.strip() for x in output.strip().split('\n') if x.strip()]
+    except Exception:
+        return []
+
+
+def _service_owner():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _owner_alive(owner):
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        # Can not tell for a service on another host
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (OSError, ValueError):
+        return True
+    return True
 
 
 class Job:
-    def __init__(self, job_id: str, model, data, work_dir: str, proc: Optional[subprocess.Popen] = None, extra_args=None):
+    def __init__(self, job_id: str, model, data, work_dir: str, proc: Optional[subprocess.Popen] = None,
+                 extra_args=None, mode: str = 'all', user: str = 'default', priority: int = 0, status: str = 'pending',
+                 created_at: Optional[str] = None):
         self.job_id = job_id
         self.model = model
         self.data = data
-        self.created_at = datetime.utcnow().isoformat() + 'Z'
+        self.created_at = created_at or _now()
         self.work_dir = work_dir
         self.proc = proc
-        self.status = 'pending'
+        self.status = status
         self.extra_args = extra_args or {}
+        self.mode = mode
+        self.user = user
+        self.priority = priority
+        self.started_at = None
+        self.finished_at = None
+        self.gpu_ids = []
+        self.cancelled = False
+        # Last status written to the event file
+        self.saved_status = None
+
+    @property
+    def endpoints(self):
+        # API hosts used by the job (evaluated model and judge), each is limited to ENDPOINT_JOBS running jobs
+        bases = [self.extra_args.get('lmdeploy_api_base'), self.extra_args.get('judge_api_base')]
+        return sorted(set(urlparse(x).netloc or x for x in bases if x))
+
+    @property
+    def gpus(self):
+        return int(self.extra_args.get('gpus') or 0)
 
     def to_dict(self):
         return {
@@ -25,53 +94,279 @@ class Job:
             'model': self.model,
             'data': self.data,
             'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
             'work_dir': self.work_dir,
             'status': self.status,
+            'mode': self.mode,
+            'user': self.user,
+            'priority': self.priority,
             'pid': self.proc.pid if self.proc else None,
             'extra_args': self.extra_args,
         }
 
 
+class JobStore:
+    """Jobs persisted in a SQLite database, one row per job.
+
+    A state change updates one row (instead of rewriting the metadata of all jobs), and the queue is read with
+    indexed queries on the status, so the cost of submitting / updating a job does not grow with the number of jobs.
+    """
+
+    COLUMNS = ('job_id', 'model', 'data', 'work_dir', 'mode', 'user', 'priority', 'status', 'extra_args',
+               'created_at', 'started_at', 'finished_at')
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT UNIQUE NOT NULL,
+                model TEXT, data TEXT, work_dir TEXT, mode TEXT,
+                user TEXT NOT NULL DEFAULT 'default',
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                extra_args TEXT,
+                created_at TEXT, started_at TEXT, finished_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, seq);
+            CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, status);
+        """)
+        # `owner` (host:pid of the service running the job) was added after the first version of the table
+        columns = [x['name'] for x in self.conn.execute('PRAGMA table_info(jobs)').fetchall()]
+        if 'owner' not in columns:
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+    def insert(self, job: Job):
+        row = self._to_row(job)
+        with self.lock:
+            self.conn.execute(
+                f'INSERT INTO jobs ({", ".join(self.COLUMNS)}) VALUES ({", ".join("?" * len(self.COLUMNS))})',
+                [row[k] for k in self.COLUMNS])
+
+    def update(self, job: Job):
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, started_at = ?, finished_at = ? WHERE job_id = ?',
+                (job.status, job.started_at, job.finished_at, job.job_id))
+
+    def claim(self, job: Job, owner: str) -> bool:
+        """Atomically move a pending job to running, False if another service (sharing the database) took it or it
+        was cancelled in the meantime."""
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ? WHERE job_id = ? AND status = 'pending'",
+                (owner, job.started_at, job.job_id))
+        return cur.rowcount == 1
+
+    def cancel_pending(self, job_id: str) -> bool:
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'pending'",
+                (_now(), job_id))
+        return cur.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id, )).fetchone()
+        return self._from_row(row) if row else None
+
+    def list(self, status: Optional[str] = None, user: Optional[str] = None, limit: int = 100):
+        cond, args = [], []
+        if status:
+            cond.append('status = ?')
+            args.append(status)
+        if user:
+            cond.append('user = ?')
+            args.append(user)
+        where = f'WHERE {" AND ".join(cond)}' if cond else ''
+        with self.lock:
+            rows = self.conn.execute(f'SELECT * FROM jobs {where} ORDER BY seq DESC LIMIT ?', args + [limit]).fetchall()
+        return [self._from_row(x) for x in rows]
+
+    def queued(self):
+        # Pending jobs, highest priority first, then in submission order
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY priority DESC, seq").fetchall()
+        return [self._from_row(x) for x in rows]
+
+    def interrupt_running(self):
+        # Jobs left running by a service that exited are not tracked anymore. Jobs of a live service sharing the
+        # database (e.g. the other process of the flask reloader) are left alone
+        with self.lock:
+            rows = self.conn.execute("SELECT job_id, owner FROM jobs WHERE status = 'running'").fetchall()
+            dead = [x['job_id'] for x in rows if not _owner_alive(x['owner'])]
+            for job_id in dead:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ? WHERE job_id = ? AND status = 'running'",
+                    (_now(), job_id))
+
+    @staticmethod
+    def _to_row(job: Job):
+        row = {k: getattr(job, k) for k in JobStore.COLUMNS}
+        row['data'] = json.dumps(job.data)
+        row['extra_args'] = json.dumps(job.extra_args)
+        return row
+
+    @staticmethod
+    def _from_row(row):
+        job = Job(job_id=row['job_id'], model=row['model'], data=json.loads(row['data']), work_dir=row['work_dir'],
+                  extra_args=json.loads(row['extra_args'] or '{}'), mode=row['mode'], user=row['user'],
+                  priority=row['priority'], status=row['status'], created_at=row['created_at'])
+        job.started_at = row['started_at']
+        job.finished_at = row['finished_at']
+        return job
+
+
 class JobManager:
-    def __init__(self, work_root: str):
+    """Run the submitted jobs from a queue.
+
+    At most `MMEVAL_MAX_JOBS` jobs run at the same time, and at most `MMEVAL_ENDPOINT_JOBS` of them use the same
+    API endpoint. A job may ask for GPUs (`extra_args['gpus']`), which are taken from `MMEVAL_GPUS` and passed to
+    the job as CUDA_VISIBLE_DEVICES. When a slot is free, the pending job with the highest priority is started;
+    among jobs of the same priority, the one of the user with the fewest running jobs goes first (then FIFO).
+    """
+
+    def __init__(self, work_root: str, max_jobs: int = MAX_JOBS, endpoint_jobs: int = ENDPOINT_JOBS, gpus=None):
         self.work_root = work_root
         os.makedirs(self.work_root, exist_ok=True)
+        self.max_jobs = max_jobs
+        self.endpoint_jobs = endpoint_jobs
+        self.gpus = list(gpus) if gpus is not None else _list_gpus()
+        self.free_gpus = list(self.gpus)
+        # Running jobs, only accessed under `self.cond`
         self.jobs = {}
-        self.lock = threading.Lock()
+        self.cond = threading.Condition()
         self.meta_file = os.path.join(self.work_root, '.flask_jobs.json')
-        self._load()
-
-    def _save(self):
+        db_file = os.path.join(self.work_root, '.flask_jobs.db')
+        new_db = not os.path.exists(db_file)
+        self.store = JobStore(db_file)
+        self.owner = _service_owner()
+        if new_db:
+            self._load()
+        self.store.interrupt_running()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def _save(self, job: Job):
+        if job.cancelled and job.status in ('finished', 'failed'):
+            job.status = 'cancelled'
+        if job.status != job.saved_status:
+            # Status changes go to the event file as well, so that event streams know when the job ends
+            append_event(job.work_dir, 'status', status=job.status)
+            job.saved_status = job.status
+        if job.status == 'running' and job.started_at is None:
+            job.started_at = _now()
+        if job.status in DONE_STATUS and job.finished_at is None:
+            job.finished_at = _now()
         try:
-            with open(self.meta_file, 'w') as f:
-                json.dump({k: v.to_dict() for k, v in self.jobs.items()}, f, indent=2)
+            self.store.update(job)
         except Exception:
             pass
 
     def _load(self):
+        # Import the jobs of the legacy json metadata file
         if os.path.exists(self.meta_file):
             try:
                 data = json.load(open(self.meta_file))
                 for k, v in data.items():
-                    job = Job(job_id=v['job_id'], model=v['model'], data=v['data'], work_dir=v['work_dir'], proc=None, extra_args=v.get('extra_args'))
-                    job.status = v.get('status', 'pending')
-                    self.jobs[k] = job
+                    job = Job(job_id=v['job_id'], model=v['model'], data=v['data'], work_dir=v['work_dir'], proc=None,
+                              extra_args=v.get('extra_args'), status=v.get('status', 'pending'),
+                              created_at=v.get('created_at'))
+                    self.store.insert(job)
             except Exception:
                 pass
 
-    def create_job(self, model, data, work_dir: Optional[str] = None, mode: str = 'all', extra_args: dict = None):
+    def create_job(self, model, data, work_dir: Optional[str] = None, mode: str = 'all', extra_args: dict = None,
+                   user: str = 'default', priority: int = 0):
         job_id = uuid.uuid4().hex[:8]
         work_dir = work_dir or os.path.join(self.work_root, job_id)
+        job = Job(job_id=job_id, model=model, data=data, work_dir=work_dir, extra_args=extra_args, mode=mode,
+                  user=user or 'default', priority=int(priority or 0))
+        if job.gpus > len(self.gpus):
+            raise ValueError(f'Job asks for {job.gpus} GPUs, only {len(self.gpus)} available')
         os.makedirs(work_dir, exist_ok=True)
-        job = Job(job_id=job_id, model=model, data=data, work_dir=work_dir, extra_args=extra_args)
-        with self.lock:
-            self.jobs[job_id] = job
-            self._save()
-
-        thread = threading.Thread(target=self._run_job, args=(job, mode), daemon=True)
-        thread.start()
+        self.store.insert(job)
+        with self.cond:
+            self.cond.notify()
         return job
 
+    def cancel_job(self, job_id: str) -> Optional[Job]:
+        """Cancel a pending job, or stop a running one. Returns the job, None if it does not exist."""
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.cancelled = True
+                self._kill(job)
+                return job
+            if self.store.cancel_pending(job_id):
+                job = self.store.get(job_id)
+                append_event(job.work_dir, 'status', status=job.status)
+                return job
+            return self.store.get(job_id)
+
+    @staticmethod
+    def _kill(job: Job):
+        # run.py is started in its own session, stop it with its children (e.g. torchrun workers)
+        if job.proc is not None and job.proc.poll() is None:
+            try:
+                os.killpg(job.proc.pid, signal.SIGTERM)
+            except OSError:
+                job.proc.terminate()
+
+    def _fits(self, job: Job, endpoint_count: dict):
+        if job.gpus > len(self.free_gpus):
+            return False
+        return all(endpoint_count.get(x, 0) < self.endpoint_jobs for x in job.endpoints)
+
+    def _next_job(self) -> Optional[Job]:
+        endpoint_count, user_count = {}, {}
+        for job in self.jobs.values():
+            user_count[job.user] = user_count.get(job.user, 0) + 1
+            for x in job.endpoints:
+                endpoint_count[x] = endpoint_count.get(x, 0) + 1
+        best = None
+        for job in self.store.queued():
+            if best is not None and job.priority < best.priority:
+                break
+            if not self._fits(job, endpoint_count):
+                continue
+            # Fair share within a priority: the user with the fewest running jobs first, FIFO among equals
+            if best is None or user_count.get(job.user, 0) < user_count.get(best.user, 0):
+                best = job
+        return best
+
+    def _dispatch_loop(self):
+        with self.cond:
+            while True:
+                while len(self.jobs) < self.max_jobs:
+                    job = self._next_job()
+                    if job is None:
+                        break
+                    job.started_at = _now()
+                    if not self.store.claim(job, self.owner):
+                        continue
+                    job.gpu_ids, self.free_gpus = self.free_gpus[:job.gpus], self.free_gpus[job.gpus:]
+                    job.status = 'running'
+                    self._save(job)
+                    self.jobs[job.job_id] = job
+                    threading.Thread(target=self._execute, args=(job, ), daemon=True).start()
+                self.cond.wait()
+
+    def _execute(self, job: Job):
+        try:
+            self._run_job(job, job.mode)
+        finally:
+            with self.cond:
+                self.jobs.pop(job.job_id, None)
+                self.free_gpus = sorted(self.free_gpus + job.gpu_ids)
+                self.cond.notify()
+
     def _build_config_file(self, job: Job) -> Optional[str]:
         # If LMDeploy credentials provided, build a minimal config JSON that run.py can use
         extra = job.extra_args or {}
@@ -128,7 +423,7 @@ class JobManager:
         extra = job.extra_args or {}
         if extra.get('dry_run'):
             job.status = 'running'
-            self._save()
+            self._save(job)
             # create per-run log even for dry-run
             ts = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
             per_run_log = os.path.join(job.work_dir, f'vlmeval_{ts}.log')
@@ -155,6 +450,8 @@ class JobManager:
                 import json as _json
                 with open(os.path.join(job.work_dir, 'fake_prediction.json'), 'w') as f:
                     _json.dump(fake, f, indent=2)
+                append_event(job.work_dir, 'progress', stage='infer', name=f'{job.model}/{job.data}', completed=1,
+                             total=1, failures=0, done=True)
 
                 job.status = 'finished'
             except Exception as e:
@@ -165,7 +462,7 @@ class JobManager:
                 except Exception:
                     pass
             finally:
-                self._save()
+                self._save(job)
             return
 
         # # Prepare environment for subprocess
@@ -191,7 +488,7 @@ class JobManager:
         #     env['LMUData'] = extra.get('LMUData')
 
         job.status = 'running'
-        self._save()
+        self._save(job)
         # job.log remains a short summary file; per-run detailed log is saved separately
         job_log_path = os.path.join(job.work_dir, 'job.log')
         # central service log at repository root
@@ -239,7 +536,7 @@ class JobManager:
                         
                         job.status = 'finished'
                         log_all("[INFO] Dry-run finished successfully.")
-                        self._save()
+                        self._save(job)
                         return
 
                     # Real-run branch
@@ -272,6 +569,12 @@ class JobManager:
                         env['LMUData'] = extra.get('LMUData')
                         env_vars_set.append('LMUData')  
                     
+                    env['VLMEVAL_PROGRESS_FILE'] = event_file(job.work_dir)
+                    env_vars_set.append('VLMEVAL_PROGRESS_FILE')
+                    if job.gpu_ids:
+                        env['CUDA_VISIBLE_DEVICES'] = ','.join(job.gpu_ids)
+                        env_vars_set.append('CUDA_VISIBLE_DEVICES')
+
                     log_all(f"[DEBUG] Environment variables set for subprocess: {', '.join(env_vars_set) if env_vars_set else 'None'}")
 
                     log_all(f"[INFO] Executing command: {' '.join(cmd)}")
@@ -282,9 +585,11 @@ class JobManager:
                         master_fd, slave_fd = pty.openpty()
                         proc = subprocess.Popen(
                             cmd, stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
-                            cwd=os.getcwd(), env=env, close_fds=True,
+                            cwd=os.getcwd(), env=env, close_fds=True, start_new_session=True,
                         )
                         job.proc = proc
+                        if job.cancelled:
+                            self._kill(job)
                         os.close(slave_fd)
                         try:
                             while True:
@@ -303,9 +608,11 @@ class JobManager:
                         log_all("[DEBUG] Using PIPE for subprocess execution (no TTY).")
                         proc = subprocess.Popen(
                             cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                            text=True, bufsize=1, cwd=os.getcwd(), env=env,
+                            text=True, bufsize=1, cwd=os.getcwd(), env=env, start_new_session=True,
                         )
                         job.proc = proc
+                        if job.cancelled:
+                            self._kill(job)
                         for line in proc.stdout:
                             log_all(f"[RUN] {line.strip()}") # Log each line with a prefix
 
@@ -322,13 +629,16 @@ class JobManager:
                             os.remove(cfg_path)
                             log_all(f"[DEBUG] Cleaned up temporary config file: {cfg_path}")
                         except Exception: pass
-                    self._save()
+                    self._save(job)
         except Exception:
             # Fallback: simple invocation writing to job.log if per-run log cannot be created
             try:
                 with open(job_log_path, 'a') as out:
-                    proc = subprocess.Popen(cmd, stdout=out, stderr=out, cwd=os.getcwd(), env=env)
+                    proc = subprocess.Popen(
+                        cmd, stdout=out, stderr=out, cwd=os.getcwd(), env=env, start_new_session=True)
                     job.proc = proc
+                    if job.cancelled:
+                        self._kill(job)
                     proc.wait()
                     job.status = 'finished' if proc.returncode == 0 else 'failed'
             except Exception as e:
@@ -344,7 +654,12 @@ class JobManager:
                         os.remove(cfg_path)
                     except Exception:
                         pass
-                self._save()
+                self._save(job)
 
     def get_job(self, job_id: str) -> Optional[Job]:
-        return self.jobs.get(job_id)
+        with self.cond:
+            job = self.jobs.get(job_id)
+        return job if job is not None else self.store.get(job_id)
+
+    def list_jobs(self, status: Optional[str] = None, user: Optional[str] = None, limit: int = 100):
+        return self.store.list(status=status, user=user, limit=limit)
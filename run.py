@@ -47,6 +47,9 @@ from vlmeval.inference_video import infer_data_job_video
 from vlmeval.inference_mt import infer_data_job_mt
 from vlmeval.smp import *
 from vlmeval.utils.result_transfer import MMMU_result_transfer, MMTBench_result_transfer
+from vlmeval.utils.gpu_sched import measured_gpu_memory, record_model_memory, reset_measured_gpu_memory
+from vlmeval.utils.progress import emit_event, set_progress_context
+from vlmeval.utils.journal import ready_marker, mark_ready, wait_ready
 
 
 # Make WORLD_SIZE invisible when build models
@@ -181,6 +184,9 @@ You can launch the evaluation by setting either --data and --model or --config.
     parser.add_argument('--api-nproc', type=int, default=4, help='Parallel API calling')
     parser.add_argument('--retry', type=int, default=None, help='retry numbers for API VLMs')
     parser.add_argument('--judge-args', type=str, default=None, help='Judge arguments in JSON format')
+    parser.add_argument(
+        '--judge-concurrency', type=int, default=None,
+        help='max concurrent calls per judge endpoint, shared by all evaluations and processes on this host')
     # Explicitly Set the Judge Model
     parser.add_argument('--judge', type=str, default=None)
     # Logging Utils
@@ -195,11 +201,99 @@ You can launch the evaluation by setting either --data and --model or --config.
     parser.add_argument(
         '--use-vllm', action='store_true', help='use vllm to generate, the flag is only supported in Llama4 for now')
     parser.add_argument('--use-verifier', action='store_true', help='use verifier to evaluate')
+    # Evaluate a dataset in the background while the inference of the next dataset runs
+    parser.add_argument(
+        '--async-eval', action='store_true',
+        help='evaluate each dataset in a background thread of rank 0, overlapping the inference of the next one')
+    # Format of the prediction file (and of the intermediate evaluation files derived from it)
+    parser.add_argument(
+        '--result-format', type=str, default=None, choices=PRED_FORMATS,
+        help='format of prediction files, parquet / tsv are much faster than xlsx for large files')
 
     args = parser.parse_args()
     return args
 
 
+def eval_dataset(dataset, dataset_name, model_name, result_file, judge_kwargs, args, pred_root, pred_root_meta):
+    """Evaluate the predictions of `model_name` on `dataset`, only called on RANK 0."""
+    logger = get_logger('RUN')
+    # Prepare Submission Files for MMMU_TEST AND MMT-Bench_ALL
+    if dataset_name in ['MMMU_TEST']:
+        result_json = MMMU_result_transfer(result_file)
+        logger.info(f'Transfer MMMU_TEST result to json for official evaluation, '
+                    f'json file saved in {result_json}')
+        return
+    elif 'MMT-Bench_ALL' in dataset_name:
+        submission_file = MMTBench_result_transfer(result_file, **judge_kwargs)
+        logger.info(f'Extract options from prediction of MMT-Bench FULL split for official evaluation '
+                    f'(https://eval.ai/web/challenges/challenge-page/2328/overview), '
+                    f'submission file saved in {submission_file}')
+        return
+
+    # Skip the evaluation part if only infer
+    if args.mode == 'infer':
+        return
+
+    # Skip the evaluation part if the dataset evaluation is not supported or annotations are missing
+    if 'MLLMGuard_DS' in dataset_name:
+        logger.info('The evaluation of MLLMGuard_DS is not supported yet. ')
+        return
+    elif 'AesBench_TEST' == dataset_name:
+        logger.info(f'The results are saved in {result_file}. '
+                    f'Please send it to the AesBench Team via huangyipo@hotmail.com.')
+        return
+    elif dataset_name in ['DocVQA_TEST', 'InfoVQA_TEST', 'Q-Bench1_TEST', 'A-Bench_TEST']:
+        logger.info(f'{dataset_name} is a test split without ground-truth. '
+                    'Thus only the inference part is supported for those datasets. ')
+        return
+    elif dataset_name in [
+        'MMBench_TEST_CN', 'MMBench_TEST_EN', 'MMBench', 'MMBench_CN',
+        'MMBench_TEST_CN_V11', 'MMBench_TEST_EN_V11', 'MMBench_V11', 'MMBench_CN_V11'
+    ] and not MMBenchOfficialServer(dataset_name):
+        logger.error(
+            f'Can not evaluate {dataset_name} on non-official servers, will skip the evaluation.')
+        return
+
+    # Setup the proxy for the evaluation
+    eval_proxy = os.environ.get('EVAL_PROXY', None)
+    old_proxy = os.environ.get('HTTP_PROXY', '')
+    if eval_proxy is not None:
+        proxy_set(eval_proxy)
+
+    # Perform the Evaluation
+    set_progress_context(stage='eval', model=model_name, dataset=dataset_name)
+    eval_results = dataset.evaluate(result_file, **judge_kwargs)
+    emit_event(
+        'eval_finished', result_file=result_file,
+        results=eval_results.to_dict() if isinstance(eval_results, pd.DataFrame) else eval_results)
+    # Display Evaluation Results in Terminal
+    if eval_results is not None:
+        assert isinstance(eval_results, dict) or isinstance(eval_results, pd.DataFrame)
+        logger.info(f'The evaluation of model {model_name} x dataset {dataset_name} has finished! ')
+        logger.info('Evaluation Results:')
+        if isinstance(eval_results, dict):
+            logger.info('\n' + json.dumps(eval_results, indent=4))
+        elif isinstance(eval_results, pd.DataFrame):
+            if len(eval_results) < len(eval_results.columns):
+                eval_results = eval_results.T
+            logger.info('\n' + tabulate(eval_results))
+
+    # Restore the proxy
+    if eval_proxy is not None:
+        proxy_set(old_proxy)
+
+    # Create the symbolic links for the prediction files
+    files = os.listdir(pred_root)
+    files = [x for x in files if (f'{model_name}_{dataset_name}' in x or "status.json" in x)]
+    for f in files:
+        cwd = os.getcwd()
+        file_addr = osp.join(cwd, pred_root, f)
+        link_addr = osp.join(cwd, pred_root_meta, f)
+        if osp.exists(link_addr) or osp.islink(link_addr):
+            os.remove(link_addr)
+        os.symlink(file_addr, link_addr)
+
+
 def main():
     logger = get_logger('RUN')
     args = parse_args()
@@ -218,6 +312,11 @@ def main():
         else:
             logger.warning('--reuse is set, will reuse the latest prediction & temporary pickle files')
 
+    if args.result_format is not None:
+        os.environ['PRED_FORMAT'] = args.result_format
+    if args.judge_concurrency is not None:
+        os.environ['VLMEVAL_JUDGE_CONCURRENCY'] = str(args.judge_concurrency)
+
     if 'MMEVAL_ROOT' in os.environ:
         args.work_dir = os.environ['MMEVAL_ROOT']
 
@@ -246,9 +345,25 @@ def main():
             backend='nccl',
             timeout=datetime.timedelta(seconds=int(os.environ.get('DIST_TIMEOUT', 3600)))
         )
+        # Identifies this launch in the file markers the ranks synchronize with (see `ready_marker`)
+        token = [uuid4().hex if RANK == 0 else None]
+        dist.broadcast_object_list(token)
+        os.environ['VLMEVAL_RUN_TOKEN'] = token[0]
+
+    eval_executor, eval_futures = None, []
+    # Markers written by rank 0, removed once all ranks are done
+    ready_markers = []
+    if args.async_eval and RANK == 0 and args.mode != 'infer':
+        from concurrent.futures import ThreadPoolExecutor
+        eval_executor = ThreadPoolExecutor(max_workers=1)
 
     for _, model_name in enumerate(args.model):
         model = None
+        # The recorded memory of a model must not include the peak of the previous one
+        try:
+            reset_measured_gpu_memory()
+        except Exception as e:
+            logger.warning(f'Failed to reset the GPU memory counters: {e}')
         date, commit_id = timestr('day'), githash(digits=8)
         eval_id = f"T{date}_G{commit_id}"
 
@@ -267,40 +382,34 @@ def main():
             model = build_model_from_config(cfg['model'], model_name, args.use_vllm)
 
         for _, dataset_name in enumerate(args.data):
-            if WORLD_SIZE > 1:
-                dist.barrier()
+            # No barrier between datasets: rank 0 prepares each dataset (download, reuse of previous predictions)
+            # and marks it ready, the other ranks only wait for that. A rank that published its shard of a dataset
+            # moves on to the next one, while rank 0 merges (and, without `--async-eval`, evaluates) the shards.
+            prepared = ready_marker(osp.join(pred_root, f'.{dataset_name}'))
+            ready_markers.append(prepared)
+            if WORLD_SIZE > 1 and RANK != 0 and not wait_ready(prepared):
+                logger.error(f'Dataset {dataset_name} failed to be prepared on RANK 0, will be skipped. ')
+                continue
 
             try:
-                result_file_base = f'{model_name}_{dataset_name}.xlsx'
+                result_file_base = f'{model_name}_{dataset_name}.{get_pred_file_format()}'
 
                 if use_config:
-                    if WORLD_SIZE > 1:
-                        if RANK == 0:
-                            dataset = build_dataset_from_config(cfg['data'], dataset_name)
-                        dist.barrier()
                     dataset = build_dataset_from_config(cfg['data'], dataset_name)
-                    if dataset is None:
-                        logger.error(f'Dataset {dataset_name} is not valid, will be skipped. ')
-                        continue
                 else:
                     dataset_kwargs = {}
                     if dataset_name in ['MMLongBench_DOC', 'DUDE', 'DUDE_MINI', 'SLIDEVQA', 'SLIDEVQA_MINI']:
                         dataset_kwargs['model'] = model_name
-
-                    # If distributed, first build the dataset on the main process for doing preparation works
-                    if WORLD_SIZE > 1:
-                        if RANK == 0:
-                            dataset = build_dataset(dataset_name, **dataset_kwargs)
-                        dist.barrier()
-
                     dataset = build_dataset(dataset_name, **dataset_kwargs)
-                    if dataset is None:
-                        logger.error(f'Dataset {dataset_name} is not valid, will be skipped. ')
-                        continue
+                if dataset is None:
+                    logger.error(f'Dataset {dataset_name} is not valid, will be skipped. ')
+                    if WORLD_SIZE > 1 and RANK == 0:
+                        mark_ready(prepared, ok=False)
+                    continue
 
                 # Handling Multi-Turn Dataset
                 if dataset.TYPE == 'MT':
-                    result_file_base = result_file_base.replace('.xlsx', '.tsv')
+                    result_file_base = get_intermediate_file_path(result_file_base, '', 'tsv')
 
                 result_file = osp.join(pred_root, result_file_base)
                 # Reuse the previous prediction file if exists
@@ -310,13 +419,14 @@ def main():
                         dataset_name=dataset_name, reuse=args.reuse, reuse_aux=args.reuse_aux
                     )
 
-                if WORLD_SIZE > 1:
-                    dist.barrier()
+                if WORLD_SIZE > 1 and RANK == 0:
+                    mark_ready(prepared)
 
                 if model is None:
                     model = model_name  # which is only a name
 
                 # Perform the Inference
+                set_progress_context(stage='infer', model=model_name, dataset=dataset_name)
                 if dataset.MODALITY == 'VIDEO':
                     model = infer_data_job_video(
                         model,
@@ -404,89 +514,55 @@ def main():
                 if RANK == 0:
                     logger.info(judge_kwargs)
 
-                if WORLD_SIZE > 1:
-                    dist.barrier()
-
-                # Only RANK 0 handles the evaluation part
+                # Only RANK 0 handles the evaluation part. The shards were merged by infer_data_job without a barrier,
+                # the other ranks go on with the next dataset
                 if RANK == 0:
-                    # Prepare Submission Files for MMMU_TEST AND MMT-Bench_ALL
-                    if dataset_name in ['MMMU_TEST']:
-                        result_json = MMMU_result_transfer(result_file)
-                        logger.info(f'Transfer MMMU_TEST result to json for official evaluation, '
-                                    f'json file saved in {result_json}')
-                        continue
-                    elif 'MMT-Bench_ALL' in dataset_name:
-                        submission_file = MMTBench_result_transfer(result_file, **judge_kwargs)
-                        logger.info(f'Extract options from prediction of MMT-Bench FULL split for official evaluation '
-                                    f'(https://eval.ai/web/challenges/challenge-page/2328/overview), '
-                                    f'submission file saved in {submission_file}')
-                        continue
-
-                    # Skip the evaluation part if only infer
-                    if args.mode == 'infer':
-                        continue
-
-                    # Skip the evaluation part if the dataset evaluation is not supported or annotations are missing
-                    if 'MLLMGuard_DS' in dataset_name:
-                        logger.info('The evaluation of MLLMGuard_DS is not supported yet. ')
-                        continue
-                    elif 'AesBench_TEST' == dataset_name:
-                        logger.info(f'The results are saved in {result_file}. '
-                                    f'Please send it to the AesBench Team via huangyipo@hotmail.com.')
-                        continue
-                    elif dataset_name in ['DocVQA_TEST', 'InfoVQA_TEST', 'Q-Bench1_TEST', 'A-Bench_TEST']:
-                        logger.info(f'{dataset_name} is a test split without ground-truth. '
-                                    'Thus only the inference part is supported for those datasets. ')
-                        continue
-                    elif dataset_name in [
-                        'MMBench_TEST_CN', 'MMBench_TEST_EN', 'MMBench', 'MMBench_CN',
-                        'MMBench_TEST_CN_V11', 'MMBench_TEST_EN_V11', 'MMBench_V11', 'MMBench_CN_V11'
-                    ] and not MMBenchOfficialServer(dataset_name):
-                        logger.error(
-                            f'Can not evaluate {dataset_name} on non-official servers, will skip the evaluation.')
-                        continue
-
-                    # Setup the proxy for the evaluation
-                    eval_proxy = os.environ.get('EVAL_PROXY', None)
-                    old_proxy = os.environ.get('HTTP_PROXY', '')
-                    if eval_proxy is not None:
-                        proxy_set(eval_proxy)
-
-                    # Perform the Evaluation
-                    eval_results = dataset.evaluate(result_file, **judge_kwargs)
-                    # Display Evaluation Results in Terminal
-                    if eval_results is not None:
-                        assert isinstance(eval_results, dict) or isinstance(eval_results, pd.DataFrame)
-                        logger.info(f'The evaluation of model {model_name} x dataset {dataset_name} has finished! ')
-                        logger.info('Evaluation Results:')
-                        if isinstance(eval_results, dict):
-                            logger.info('\n' + json.dumps(eval_results, indent=4))
-                        elif isinstance(eval_results, pd.DataFrame):
-                            if len(eval_results) < len(eval_results.columns):
-                                eval_results = eval_results.T
-                            logger.info('\n' + tabulate(eval_results))
-
-                    # Restore the proxy
-                    if eval_proxy is not None:
-                        proxy_set(old_proxy)
-
-                    # Create the symbolic links for the prediction files
-                    files = os.listdir(pred_root)
-                    files = [x for x in files if (f'{model_name}_{dataset_name}' in x or "status.json" in x)]
-                    for f in files:
-                        cwd = os.getcwd()
-                        file_addr = osp.join(cwd, pred_root, f)
-                        link_addr = osp.join(cwd, pred_root_meta, f)
-                        if osp.exists(link_addr) or osp.islink(link_addr):
-                            os.remove(link_addr)
-                        os.symlink(file_addr, link_addr)
+                    eval_args = (
+                        dataset, dataset_name, model_name, result_file, judge_kwargs, args, pred_root, pred_root_meta)
+                    # The evaluation can overlap the inference of the next dataset, except when it sets a proxy
+                    if eval_executor is not None and os.environ.get('EVAL_PROXY', None) is None:
+                        eval_futures.append(
+                            (model_name, dataset_name, eval_executor.submit(eval_dataset, *eval_args)))
+                    else:
+                        eval_dataset(*eval_args)
 
             except Exception as e:
                 logger.exception(f'Model {model_name} x Dataset {dataset_name} combination failed: {e}, '
                                  'skipping this combination.')
+                if WORLD_SIZE > 1 and RANK == 0 and not osp.exists(prepared):
+                    mark_ready(prepared, ok=False)
+                emit_event('failed', model=model_name, dataset=dataset_name, error=f'{type(e)}: {e}')
                 continue
 
+        # Record the measured memory footprint of the model, used by the GPU slot scheduler to pack instances.
+        # vLLM preallocates a pool sized by `gpu_memory_utilization`, its reservation is not the model footprint
+        if (
+            model is not None and not isinstance(model, str) and not getattr(model, 'is_api', False)
+            and not getattr(model, 'use_vllm', False)
+        ):
+            try:
+                gb = measured_gpu_memory()
+                if gb > 0:
+                    record_model_memory(model_name, gb)
+            except Exception as e:
+                logger.warning(f'Failed to record the GPU memory of {model_name}: {e}')
+
+    for model_name, dataset_name, fut in eval_futures:
+        try:
+            fut.result()
+        except Exception as e:
+            logger.exception(f'Model {model_name} x Dataset {dataset_name} evaluation failed: {e}')
+            emit_event('failed', stage='eval', model=model_name, dataset=dataset_name, error=f'{type(e)}: {e}')
+    if eval_executor is not None:
+        eval_executor.shutdown()
+
     if WORLD_SIZE > 1:
+        # The only barrier of the run: the ranks wait for each other once, when all of them are done
+        dist.barrier()
+        if RANK == 0:
+            for marker in ready_markers:
+                if osp.exists(marker):
+                    os.remove(marker)
         dist.destroy_process_group()
 
 
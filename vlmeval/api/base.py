@@ -58,10 +58,29 @@ class BaseAPI:
 
     def working(self):
         """If the API model is working, return True, else return False.
+        The result is cached per (endpoint, key) and shared across processes, see `EndpointHealth`.
 
         Returns:
             bool: If the API model is working, return True, else return False.
         """
+        from .health import EndpointHealth
+        endpoint, key = self.health_endpoint()
+        return EndpointHealth.of(endpoint, key).check(self.probe, self.generate_working)
+
+    def health_endpoint(self):
+        """The (endpoint, key) identifying the service behind this model, used to cache the health status."""
+        return f'{type(self).__name__}:{getattr(self, "model", None)}', getattr(self, 'key', None)
+
+    def probe(self):
+        """A cheap health check without generation (e.g. listing the models).
+
+        Returns:
+            bool: True / False if the endpoint is healthy / dead, None if the probe is not supported.
+        """
+        return None
+
+    def generate_working(self):
+        """Check that the model works by generating a response to 'hello'."""
         self.old_timeout = None
         if hasattr(self, 'timeout'):
             self.old_timeout = self.timeout
@@ -59,7 +59,6 @@ class Claude_Wrapper(BaseAPI):
         super().__init__(retry=retry, verbose=verbose, system_prompt=system_prompt, **kwargs)
 
     def encode_image_file_to_base64(self, image_path, target_size=-1, fmt='.jpg'):
-        image = Image.open(image_path)
         if fmt in ('.jpg', '.jpeg'):
             format = 'JPEG'
         elif fmt == '.png':
@@ -67,7 +66,7 @@ class Claude_Wrapper(BaseAPI):
         else:
             print(f'Unsupported image format: {fmt}, will cause media type match error.')
 
-        return encode_image_to_base64(image, target_size=target_size, fmt=format)
+        return encode_image_file_to_base64(image_path, target_size=target_size, fmt=format)
 
     # inputs can be a lvl-2 nested list: [content1, content2, content3, ...]
     # content can be a string or a list of image & text
@@ -146,9 +146,7 @@ class DoubaoVLWrapper(BaseAPI):
                 if msg['type'] == 'text':
                     content_list.append(dict(type='text', text=msg['value']))
                 elif msg['type'] == 'image':
-                    from PIL import Image
-                    img = Image.open(msg['value'])
-                    b64 = encode_image_to_base64(img)
+                    b64 = encode_image_file_to_base64(msg['value'])
                     img_struct = dict(url=f'data:image/jpeg;base64,{b64}')
                     content_list.append(dict(type='image_url', image_url=img_struct))
         else:
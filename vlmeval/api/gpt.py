@@ -1,7 +1,9 @@
 from ..smp import *
 import os
 import sys
+import functools
 from .base import BaseAPI
+from ..utils.progress import record_api_usage
 
 APIBASES = {
     'OFFICIAL': 'https://api.openai.com/v1/chat/completions',
@@ -170,9 +172,7 @@ class OpenAIWrapper(BaseAPI):
                 if msg['type'] == 'text':
                     content_list.append(dict(type='text', text=msg['value']))
                 elif msg['type'] == 'image':
-                    from PIL import Image
-                    img = Image.open(msg['value'])
-                    b64 = encode_image_to_base64(img, target_size=self.img_size)
+                    b64 = encode_image_file_to_base64(msg['value'], target_size=self.img_size)
                     img_struct = dict(url=f'data:image/jpeg;base64,{b64}', detail=self.img_detail)
                     content_list.append(dict(type='image_url', image_url=img_struct))
         else:
@@ -195,6 +195,31 @@ class OpenAIWrapper(BaseAPI):
             input_msgs.append(dict(role='user', content=self.prepare_itlist(inputs)))
         return input_msgs
 
+    def health_endpoint(self):
+        return f'{self.api_base}:{self.model}', self.key
+
+    def probe(self):
+        # List the models of an OpenAI-compatible endpoint, much cheaper than a generation
+        if self.use_azure or not self.api_base.endswith('/chat/completions'):
+            return None
+        models_url = self.api_base[:-len('/chat/completions')] + '/models'
+        auth = self.key if 'internvl2-pro' in self.model else f'Bearer {self.key}'
+        headers = {'Authorization': auth}
+        try:
+            response = requests.get(models_url, headers=headers, timeout=10)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return False
+        if response.status_code in [401, 403]:
+            return False
+        if response.status_code != 200:
+            return None
+        try:
+            models = [x['id'] for x in response.json()['data']]
+        except Exception:
+            return None
+        # Some proxies do not list all the models they serve, fall back to a generation in that case
+        return True if self.model in models else None
+
     def generate_inner(self, inputs, **kwargs) -> str:
         input_msgs = self.prepare_inputs(inputs)
         temperature = kwargs.pop('temperature', self.temperature)
@@ -237,6 +262,7 @@ class OpenAIWrapper(BaseAPI):
         try:
             resp_struct = json.loads(response.text)
             answer = resp_struct['choices'][0]['message']['content'].strip()
+            record_api_usage(resp_struct.get('usage'))
         except Exception as err:
             if self.verbose:
                 self.logger.error(f'{type(err)}: {err}')
@@ -245,47 +271,87 @@ class OpenAIWrapper(BaseAPI):
         return ret_code, answer, response
 
     def get_image_token_len(self, img_path, detail='low'):
-        import math
         if detail == 'low':
             return 85
-
-        im = Image.open(img_path)
-        height, width = im.size
-        if width > 1024 or height > 1024:
-            if width > height:
-                height = int(height * 1024 / width)
-                width = 1024
-            else:
-                width = int(width * 1024 / height)
-                height = 1024
-
-        h = math.ceil(height / 512)
-        w = math.ceil(width / 512)
-        total = 85 + 170 * h * w
-        return total
+        return _image_token_len(img_path, detail)
 
     def get_token_len(self, inputs) -> int:
-        import tiktoken
-        try:
-            enc = tiktoken.encoding_for_model(self.model)
-        except Exception as err:
-            if 'gpt' in self.model.lower():
-                if self.verbose:
-                    self.logger.warning(f'{type(err)}: {err}')
-                enc = tiktoken.encoding_for_model('gpt-4')
-            else:
-                return 0
+        enc_name = _tiktoken_encoding_name(self.model)
+        if enc_name is None:
+            return 0
         assert isinstance(inputs, list)
         tot = 0
         for item in inputs:
             if 'role' in item:
                 tot += self.get_token_len(item['content'])
             elif item['type'] == 'text':
-                tot += len(enc.encode(item['value']))
+                tot += _text_token_len(enc_name, item['value'])
             elif item['type'] == 'image':
                 tot += self.get_image_token_len(item['value'], detail=self.img_detail)
         return tot
 
+    def fit_conversation(self, inputs, max_tokens=None):
+        """Return the longest suffix of a multi-turn conversation (starting with a user turn) that fits in the
+        context window together with the system prompt and `max_tokens` for the answer, computed in one pass."""
+        if len(inputs) == 0 or 'role' not in inputs[0]:
+            return inputs
+        budget = GPT_context_window(self.model) - (max_tokens or self.max_tokens)
+        if self.system_prompt is not None:
+            budget -= self.get_token_len([dict(type='text', value=self.system_prompt)])
+        tot, start = 0, None
+        for i in range(len(inputs) - 1, -1, -1):
+            # 4 tokens for the per-message overhead of the chat format
+            tot += self.get_token_len(inputs[i]['content']) + 4
+            if tot > budget:
+                break
+            if inputs[i]['role'] == 'user':
+                start = i
+        # If even the last turn does not fit, send it anyway and let the API report the error
+        return inputs[start:] if start is not None else inputs[-1:]
+
+    def chat_inner(self, inputs, **kwargs):
+        # Drop the oldest turns that can not fit before sending, `BaseAPI.chat_inner` still handles API errors
+        try:
+            inputs = self.fit_conversation(inputs, max_tokens=kwargs.get('max_tokens', None))
+        except Exception as err:
+            self.logger.warning(f'Failed to fit the conversation in the context window: {type(err)} {err}')
+        return super().chat_inner(inputs, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _tiktoken_encoding_name(model):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model).name
+    except Exception:
+        if 'gpt' in model.lower():
+            return tiktoken.encoding_for_model('gpt-4').name
+        return None
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _text_token_len(enc_name, text):
+    import tiktoken
+    return len(tiktoken.get_encoding(enc_name).encode(text))
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _image_token_len(img_path, detail):
+    import math
+    width, height = get_image_size(img_path)
+    if width > 1024 or height > 1024:
+        if width > height:
+            height = int(height * 1024 / width)
+            width = 1024
+        else:
+            width = int(width * 1024 / height)
+            height = 1024
+
+    h = math.ceil(height / 512)
+    w = math.ceil(width / 512)
+    total = 85 + 170 * h * w
+    return total
+
 
 class GPT4V(OpenAIWrapper):
 
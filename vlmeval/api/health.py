@@ -0,0 +1,108 @@
+import os
+import os.path as osp
+import json
+import time
+import threading
+from ..smp import md5, get_logger
+
+# Seconds a successful check is trusted, `VLMEVAL_HEALTH_TTL=0` disables the cache
+HEALTH_TTL = 600
+# Seconds a failed endpoint is not checked again, doubled after each consecutive failure
+HEALTH_COOLDOWN = 60
+HEALTH_MAX_COOLDOWN = 600
+
+
+class EndpointHealth:
+    """Cached health status of an API endpoint, shared by all models using the same (endpoint, key).
+
+    The status lives in memory and in a small json file under `VLMEVAL_HEALTH_DIR`
+    (default `~/.cache/vlmeval/health`), so it is reused across datasets and processes. It also acts as a
+    circuit breaker: after a failed check, the endpoint is reported dead without being contacted until the
+    cooldown expires.
+    """
+
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, endpoint, key=None):
+        self.endpoint = endpoint
+        self.name = md5(f'{endpoint}|{key}')
+        self.ttl = float(os.environ.get('VLMEVAL_HEALTH_TTL', HEALTH_TTL))
+        health_dir = os.environ.get('VLMEVAL_HEALTH_DIR', osp.join(osp.expanduser('~'), '.cache', 'vlmeval', 'health'))
+        self.status_file = osp.join(health_dir, f'{self.name}.json')
+        self.status = {}
+        # Serialize the checks of one endpoint inside the process, concurrent evaluators wait for the first one
+        self.lock = threading.Lock()
+        self.logger = get_logger('EndpointHealth')
+
+    @classmethod
+    def of(cls, endpoint, key=None):
+        with cls._lock:
+            if (endpoint, key) not in cls._instances:
+                cls._instances[(endpoint, key)] = cls(endpoint, key)
+            return cls._instances[(endpoint, key)]
+
+    def _load(self):
+        status = self.status
+        if osp.exists(self.status_file):
+            try:
+                with open(self.status_file) as f:
+                    status = json.load(f)
+            except Exception:
+                pass
+        if status.get('time', 0) >= self.status.get('time', 0):
+            self.status = status
+        return self.status
+
+    def _dump(self):
+        try:
+            os.makedirs(osp.dirname(self.status_file), exist_ok=True)
+            tmp = f'{self.status_file}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.status, f)
+            os.replace(tmp, self.status_file)
+        except OSError as err:
+            self.logger.warning(f'Failed to save the health status of {self.endpoint}: {err}')
+
+    def cached(self):
+        """True / False if the status is still valid (healthy within TTL / circuit open), None if a check is needed."""
+        if self.ttl <= 0:
+            return None
+        status = self._load()
+        now = time.time()
+        if status.get('ok', False) and now - status['time'] < self.ttl:
+            return True
+        if not status.get('ok', True) and now < status.get('retry_after', 0):
+            return False
+        return None
+
+    def record(self, ok):
+        failures = 0 if ok else self.status.get('failures', 0) + 1
+        cooldown = min(HEALTH_COOLDOWN * 2 ** max(failures - 1, 0), HEALTH_MAX_COOLDOWN)
+        now = time.time()
+        self.status = dict(ok=ok, time=now, failures=failures, retry_after=now + cooldown if not ok else 0)
+        if not ok:
+            self.logger.warning(
+                f'Endpoint {self.endpoint} is not working, will not be checked again in the next {cooldown}s.')
+        if self.ttl > 0:
+            self._dump()
+
+    def check(self, probe, fallback):
+        """Return the (cached) health of the endpoint.
+
+        `probe()` is a cheap check (e.g. listing the models), returning None if it can not tell;
+        `fallback()` is the full check, only used when the probe is not conclusive.
+        """
+        with self.lock:
+            ok = self.cached()
+            if ok is not None:
+                return ok
+            try:
+                ok = probe()
+            except Exception as err:
+                self.logger.info(f'Health probe of {self.endpoint} failed: {type(err)} {err}')
+                ok = None
+            if ok is None:
+                ok = bool(fallback())
+            self.record(ok)
+            return ok
@@ -32,6 +32,78 @@ validated_llms = [
 Auto_model = ['chatglm']
 
 
+class DynamicBatcher:
+    """Gather concurrent requests from worker threads into batches.
+
+    A background thread waits for the first request, then collects more for at most `max_wait` seconds
+    (or until `max_batch_size` requests are queued) and runs `batch_fn` on them. `batch_fn` takes a list of inputs
+    and returns a list of (output, num_generated_tokens).
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait=0.05, name='DynamicBatcher'):
+        import queue
+        import threading
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.logger = get_logger(name)
+        self.num_batches, self.num_requests, self.num_tokens, self.gen_time = 0, 0, 0, 0.
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def submit(self, inputs):
+        from concurrent.futures import Future
+        future = Future()
+        self.queue.put((inputs, future))
+        return future.result()
+
+    def _loop(self):
+        import queue
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            st = time.time()
+            try:
+                outputs = self.batch_fn([x[0] for x in batch])
+            except Exception as err:
+                for _, future in batch:
+                    future.set_exception(err)
+                continue
+            with self.lock:
+                self.num_batches += 1
+                self.num_requests += len(batch)
+                self.num_tokens += sum(x[1] for x in outputs)
+                self.gen_time += time.time() - st
+                if self.num_batches % 20 == 0:
+                    self.logger.info(self.report(self._stats()))
+            for (_, future), (output, _) in zip(batch, outputs):
+                future.set_result(output)
+
+    def _stats(self):
+        return dict(
+            batches=self.num_batches, requests=self.num_requests, tokens=self.num_tokens,
+            avg_batch_size=self.num_requests / self.num_batches if self.num_batches else 0.,
+            tokens_per_sec=self.num_tokens / self.gen_time if self.gen_time else 0.)
+
+    def stats(self):
+        with self.lock:
+            return self._stats()
+
+    @staticmethod
+    def report(stats):
+        return (
+            f'{stats["requests"]} requests in {stats["batches"]} batches '
+            f'(avg batch size {stats["avg_batch_size"]:.1f}), {stats["tokens_per_sec"]:.1f} tokens/s'
+        )
+
+
 class HFChatModel:
 
     def _get_context_length(self, model, model_path):
@@ -66,6 +138,10 @@ class HFChatModel:
                  **kwargs):
 
         self.logger = get_logger('HFChatModel')
+        # Concurrent `generate` calls are gathered into batches of at most `max_batch_size` (1 to disable)
+        self.max_batch_size = kwargs.pop('max_batch_size', 16)
+        self.max_wait = kwargs.pop('max_wait', 0.05)
+        self.batcher = None
         if 'vicuna' in model_path.lower() or 'llama' in model_path.lower():
             try:
                 from fastchat.model import get_conversation_template
@@ -138,8 +214,49 @@ class HFChatModel:
         for k, v in kwargs.items():
             self.logger.info(f'Following args will be used for generation (If not set specifically), {k}: {v}. ')
         self.kwargs = kwargs
+        # Created once here: evaluator thread pools call `generate` concurrently and must share one batcher
+        if self.max_batch_size > 1 and listinstr(['llama', 'vicuna'], self.model_path.lower()):
+            self.batcher = DynamicBatcher(
+                self._batch_generate, max_batch_size=self.max_batch_size, max_wait=self.max_wait,
+                name='HFChatModel')
+
+    def _batch_generate(self, prompts):
+        # Returns a list of (response, num_generated_tokens)
+        if 'llama' in self.model_path.lower():
+            prompts = [[{'role': 'system', 'content': self.system_prompt}, {'role': 'user', 'content': x}]
+                       for x in prompts]
+            outputs = self.model(prompts, gen_config=self.gen_config)
+            return [(x.text, x.generate_token_len) for x in outputs]
+
+        from fastchat.model import get_conversation_template
+        texts = []
+        for x in prompts:
+            conv = get_conversation_template('vicuna')
+            conv.append_message(conv.roles[0], x)
+            conv.append_message(conv.roles[1], None)
+            texts.append(conv.get_prompt())
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.unk_token or self.tokenizer.eos_token
+        inputs = self.tokenizer(texts, return_tensors='pt', padding=True)
+        if torch.cuda.is_available():
+            for k in inputs:
+                inputs[k] = inputs[k].cuda()
+        params = dict(do_sample=True, temperature=0.7, repetition_penalty=1.0, max_new_tokens=512)
+        params.update(self.kwargs)
+        outputs = self.model.generate(**inputs, **params)
+        outputs = outputs[:, inputs['input_ids'].shape[1]:]
+        ret = []
+        for out in outputs:
+            num_tokens = int((out != self.tokenizer.pad_token_id).sum())
+            resp = self.tokenizer.decode(out, skip_special_tokens=True, spaces_between_special_tokens=False)
+            ret.append((resp, num_tokens))
+        return ret
 
     def generate_str(self, input, **kwargs):
+        if self.batcher is not None and len(kwargs) == 0:
+            return self.batcher.submit(input)
+
         if 'baichuan' in self.model_path.lower():
             messages = []
             messages.append({'role': 'user', 'content': input})
@@ -119,9 +119,7 @@ class HunyuanWrapper(BaseAPI):
                 if msg['type'] == 'text':
                     content_list.append(dict(Type='text', Text=msg['value']))
                 elif msg['type'] == 'image':
-                    from PIL import Image
-                    img = Image.open(msg['value'])
-                    b64 = encode_image_to_base64(img)
+                    b64 = encode_image_file_to_base64(msg['value'])
                     img_struct = dict(Url=f'data:image/jpeg;base64,{b64}')
                     content_list.append(dict(Type='image_url', ImageUrl=img_struct))
         else:
@@ -359,10 +359,10 @@ class CGAVCounting(VideoBaseDataset):
 
     def evaluate(self, eval_file, **judge_kwargs):
 
-        assert eval_file.endswith(".xlsx"), "data file should be an xlsx file"
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), "data file should be a prediction file (xlsx / tsv / parquet)"
 
-        tgt_file = eval_file.replace(".xlsx", "_rating.json")
-        score_file = eval_file.replace(".xlsx", "_score.xlsx")
+        tgt_file = get_intermediate_file_path(eval_file, "_rating", "json")
+        score_file = get_intermediate_file_path(eval_file, "_score")
 
         data = load(eval_file)
 
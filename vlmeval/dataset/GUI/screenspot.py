@@ -125,8 +125,7 @@ def convert_bbox(bbox, image_path):
         new_bbox[0] + new_bbox[2],
         new_bbox[1] + new_bbox[3],
     ]
-    image = Image.open(image_path)
-    img_size = image.size
+    img_size = get_image_size(image_path)
     new_bbox = [
         new_bbox[0] / img_size[0],
         new_bbox[1] / img_size[1],
@@ -324,7 +323,7 @@ class ScreenSpot(ImageBaseDataset):
                 results_dict[key] = str(0)
             else:
                 results_dict[key] = str(sum(results_dict[key]) / len(results_dict[key]))
-        score_pth = eval_file.replace(".xlsx", "_score.json")
+        score_pth = get_intermediate_file_path(eval_file, "_score", "json")
         dump(results_dict, score_pth)
 
         failure_cases_path = os.environ.get("FAILURE_CASES_PATH", None)
@@ -357,8 +356,7 @@ class ScreenSpot(ImageBaseDataset):
             x1, y1, w, h = bbox
             bbox = (x1, y1, x1 + w - 1, y1 + h - 1)
 
-            image = Image.open(os.path.join(self.img_root, line["image_path"]))
-            img_size = image.size
+            img_size = self.image_size(line["image_path"])
 
             def make_safe(value):
                 if value == -1:
@@ -437,7 +435,7 @@ class ScreenSpot(ImageBaseDataset):
                 sub_stats = itertools.chain(*sub_stats)
                 final_score_dict[c + '_Accuracy'] = np.mean([x > 0 for x in sub_stats]) * 100
 
-        score_pth = eval_file.replace(".xlsx", "_score.json")
+        score_pth = get_intermediate_file_path(eval_file, "_score", "json")
         dump(final_score_dict, score_pth)
 
         failure_cases_path = os.environ.get("FAILURE_CASES_PATH", None)
@@ -126,8 +126,7 @@ def convert_bbox(bbox, image_path, convert_xywh_to_x1y1x2y2=True):
             new_bbox[0] + new_bbox[2],
             new_bbox[1] + new_bbox[3],
         ]
-    image = Image.open(image_path)
-    img_size = image.size
+    img_size = get_image_size(image_path)
     new_bbox = [
         new_bbox[0] / img_size[0],
         new_bbox[1] / img_size[1],
@@ -312,7 +311,7 @@ class ScreenSpot_Pro(ImageBaseDataset):
                 results_dict[key] = str(0)
             else:
                 results_dict[key] = str(sum(results_dict[key]) / len(results_dict[key]))
-        score_pth = eval_file.replace(".xlsx", "_score.json")
+        score_pth = get_intermediate_file_path(eval_file, "_score", "json")
         dump(results_dict, score_pth)
 
         failure_cases_path = os.environ.get("FAILURE_CASES_PATH", None)
@@ -343,8 +342,7 @@ class ScreenSpot_Pro(ImageBaseDataset):
             )
             # The format of bbox is (x1, y1, x2, y2)
 
-            image = Image.open(os.path.join(self.img_root, line["image_path"]))
-            img_size = image.size
+            img_size = self.image_size(line["image_path"])
 
             def make_safe(value):
                 if value == -1:
@@ -422,7 +420,7 @@ class ScreenSpot_Pro(ImageBaseDataset):
             sub_stats = itertools.chain(*sub_stats)
             final_score_dict[c + '_Accuracy'] = np.mean([x > 0 for x in sub_stats]) * 100
 
-        score_pth = eval_file.replace(".xlsx", "_score.json")
+        score_pth = get_intermediate_file_path(eval_file, "_score", "json")
         dump(final_score_dict, score_pth)
 
         failure_cases_path = os.environ.get("FAILURE_CASES_PATH", None)
@@ -125,8 +125,7 @@ def convert_bbox(bbox, image_path):
         new_bbox[0] + new_bbox[2],
         new_bbox[1] + new_bbox[3],
     ]
-    image = Image.open(image_path)
-    img_size = image.size
+    img_size = get_image_size(image_path)
     new_bbox = [
         new_bbox[0] / img_size[0],
         new_bbox[1] / img_size[1],
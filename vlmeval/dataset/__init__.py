@@ -129,14 +129,15 @@ class ConcatDataset(ImageBaseDataset):
         data['original_index'] = data.pop('index')
         data['index'] = np.arange(len(data))
         self.data = data
+        # index -> row lookup for the sub datasets, each lookup returns a fresh dict
+        self.records_map = {dname: DataRecords(self.dataset_map[dname].data) for dname in datasets}
 
     def build_prompt(self, line):
         if isinstance(line, int):
             line = self.data.iloc[line]
         idx = line['original_index']
         dname = line['SUB_DATASET']
-        org_data = self.dataset_map[dname].data
-        org_line = cp.deepcopy(org_data[org_data['index'] == idx]).iloc[0]
+        org_line = self.records_map[dname].by_index(idx)
         return self.dataset_map[dname].build_prompt(org_line)
 
     def dump_image(self, line):
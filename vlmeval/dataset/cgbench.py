@@ -432,10 +432,10 @@ class CGBench_MCQ_Grounding_Mini(VideoBaseDataset):
 
     def evaluate(self, eval_file, **judge_kwargs):
 
-        assert eval_file.endswith(".xlsx"), "data file should be an xlsx file"
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), "data file should be a prediction file (xlsx / tsv / parquet)"
 
-        tgt_file = eval_file.replace(".xlsx", "_rating.json")
-        score_file = eval_file.replace(".xlsx", "_score.xlsx")
+        tgt_file = get_intermediate_file_path(eval_file, "_rating", "json")
+        score_file = get_intermediate_file_path(eval_file, "_score")
 
         data = load(eval_file)
 
@@ -760,12 +760,12 @@ class CGBench_OpenEnded_Mini(VideoBaseDataset):
 
         from .utils.cgbench import get_dimention_rating_open_ended, post_process_open
 
-        assert eval_file.endswith(".xlsx"), "data file should be an xlsx file"
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), "data file should be a prediction file (xlsx / tsv / parquet)"
 
-        tgt_file = eval_file.replace(".xlsx", "_rating.json")
-        score_file = eval_file.replace(".xlsx", "_score.xlsx")
-        step_1_tmp_file = eval_file.replace(".xlsx", "_step_1.pkl")
-        step_2_tmp_file = eval_file.replace(".xlsx", "_step_2.pkl")
+        tgt_file = get_intermediate_file_path(eval_file, "_rating", "json")
+        score_file = get_intermediate_file_path(eval_file, "_score")
+        step_1_tmp_file = get_intermediate_file_path(eval_file, "_step_1", "pkl")
+        step_2_tmp_file = get_intermediate_file_path(eval_file, "_step_2", "pkl")
 
         data = load(eval_file)
 
@@ -1314,10 +1314,10 @@ class CGBench_MCQ_Grounding(VideoBaseDataset):
 
     def evaluate(self, eval_file, **judge_kwargs):
 
-        assert eval_file.endswith(".xlsx"), "data file should be an xlsx file"
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), "data file should be a prediction file (xlsx / tsv / parquet)"
 
-        tgt_file = eval_file.replace(".xlsx", "_rating.json")
-        score_file = eval_file.replace(".xlsx", "_score.xlsx")
+        tgt_file = get_intermediate_file_path(eval_file, "_rating", "json")
+        score_file = get_intermediate_file_path(eval_file, "_score")
 
         data = load(eval_file)
 
@@ -1641,12 +1641,12 @@ class CGBench_OpenEnded(VideoBaseDataset):
 
         from .utils.cgbench import get_dimention_rating_open_ended, post_process_open
 
-        assert eval_file.endswith(".xlsx"), "data file should be an xlsx file"
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), "data file should be a prediction file (xlsx / tsv / parquet)"
 
-        tgt_file = eval_file.replace(".xlsx", "_rating.json")
-        score_file = eval_file.replace(".xlsx", "_score.xlsx")
-        step_1_tmp_file = eval_file.replace(".xlsx", "_step_1.pkl")
-        step_2_tmp_file = eval_file.replace(".xlsx", "_step_2.pkl")
+        tgt_file = get_intermediate_file_path(eval_file, "_rating", "json")
+        score_file = get_intermediate_file_path(eval_file, "_score")
+        step_1_tmp_file = get_intermediate_file_path(eval_file, "_step_1", "pkl")
+        step_2_tmp_file = get_intermediate_file_path(eval_file, "_step_2", "pkl")
 
         data = load(eval_file)
 
@@ -51,6 +51,8 @@ class ImageBaseDataset:
         data['index'] = [str(x) for x in data['index']]
 
         self.meta_only = True
+        # Maps the index of a question to the question whose image it reuses (str -> str)
+        self.image_src = {}
 
         # The image field can store the base64 encoded image or another question index (for saving space)
         if 'image' in data:
@@ -61,6 +63,7 @@ class ImageBaseDataset:
                     idx = image_map[k]
                     assert idx in image_map and len(image_map[idx]) > 64
                     image_map[k] = image_map[idx]
+                    self.image_src[k] = idx
 
             images = [toliststr(image_map[k]) for k in data['index']]
             data['image'] = [x[0] if len(x) == 1 else x for x in images]
@@ -74,6 +77,9 @@ class ImageBaseDataset:
             data['index'] = [int(x) for x in data['index']]
 
         self.data = data
+        # Register the image meta index of `img_root` for the `read_ok` / image size lookups, it is filled as the
+        # images are dumped and persisted for the next runs
+        image_meta_index(self.img_root)
         self.post_build(dataset)
 
     def __len__(self):
@@ -132,20 +138,19 @@ class ImageBaseDataset:
                     image_path = [f'{index}_{i}.png' for i in range(len(line['image']))]
                 for img, im_name in zip(line['image'], image_path):
                     path = osp.join(self.img_root, im_name)
-                    if not read_ok(path):
-                        decode_base64_to_image_file(img, path)
+                    self._dump_image_file(img, path)
                     tgt_path.append(path)
 
             elif isinstance(line['image'], str) and 'image_path' in line:
                 assert isinstance(line['image_path'], str)
                 tgt_path = osp.join(self.img_root, line['image_path'])
-                if not read_ok(tgt_path):
-                    decode_base64_to_image_file(line['image'], tgt_path)
+                self._dump_image_file(line['image'], tgt_path)
                 tgt_path = [tgt_path]
             else:
-                tgt_path = osp.join(self.img_root, f"{line['index']}.jpg")
-                if not read_ok(tgt_path):
-                    decode_base64_to_image_file(line['image'], tgt_path)
+                # Questions sharing an image (e.g. circular variants) share the dumped file as well
+                image_src = getattr(self, 'image_src', {})
+                tgt_path = osp.join(self.img_root, f"{image_src.get(str(line['index']), line['index'])}.jpg")
+                self._dump_image_file(line['image'], tgt_path)
                 tgt_path = [tgt_path]
         else:
             assert 'image_path' in line
@@ -160,6 +165,39 @@ class ImageBaseDataset:
 
         return tgt_path
 
+    def _dump_image_file(self, image, path):
+        # Valid images are indexed, later checks (in this run or the next ones) only `stat` the file
+        try:
+            rec = self.image_meta.get(path, with_hash=False)
+            if rec['width'] > 0 and rec['height'] > 0:
+                return
+        except Exception:
+            pass
+        decode_base64_to_image_file(image, path)
+        self.image_meta.get(path, with_hash=False)
+
+    @property
+    def image_meta(self):
+        return image_meta_index(self.img_root)
+
+    def build_image_meta(self, nproc=16, with_hash=True):
+        # Dump all images (if needed) and index their headers, the index is saved under `self.img_root`
+        paths = []
+        for i in range(len(self.data)):
+            line = self.data.iloc[i]
+            if self.meta_only:
+                tgt_path = toliststr(line['image_path'])
+                tgt_path = [x if osp.exists(x) else osp.join(self.img_root, x) for x in tgt_path]
+            else:
+                tgt_path = self.dump_image(line)
+            paths.extend(toliststr(tgt_path))
+        return self.image_meta.build(paths, nproc=nproc, with_hash=with_hash)
+
+    def image_size(self, path):
+        if not osp.exists(path):
+            path = osp.join(self.img_root, path)
+        return self.image_meta.size(path)
+
     def display(self, line):
         if isinstance(line, int):
             line = self.data.iloc[line]
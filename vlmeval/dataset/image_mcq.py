@@ -3,7 +3,7 @@ import re
 import warnings
 
 from .image_base import ImageBaseDataset
-from .utils import build_judge, DEBUG_MESSAGE
+from .utils import build_judge, JudgeRequestCache, DEBUG_MESSAGE
 from ..smp import *
 import pandas as pd
 from tqdm import tqdm
@@ -239,7 +239,8 @@ class ImageMCQDataset(ImageBaseDataset):
 
     def evaluate_heuristic(self, eval_file, **judge_kwargs):
         from .utils.multiple_choice import (
-            report_acc, report_acc_MMT, report_acc_MMSci, mcq_circular_eval, mcq_vanilla_eval
+            report_acc, report_acc_MMT, report_acc_MMSci, mcq_circular_eval, mcq_vanilla_eval,
+            mcq_vanilla_eval_chunked
         )
         # assert dataset is not None
         dataset_map = {
@@ -250,6 +251,10 @@ class ImageMCQDataset(ImageBaseDataset):
         if dataset in dataset_map:
             dataset = dataset_map[dataset]
         nproc = judge_kwargs.pop('nproc', 4)
+        # If set, the prediction file is evaluated in chunks of `chunk_size` rows with constant memory
+        chunk_size = judge_kwargs.pop('chunk_size', None)
+        # If > 1, answers that need the judge are matched `pack_size` at a time in a single judge call
+        pack_size = int(judge_kwargs.pop('pack_size', 1))
 
         circular = False
         if listinstr(['mmbench', 'ccbench', 'circular', 'mmcr'], dataset.lower()):
@@ -272,12 +277,24 @@ class ImageMCQDataset(ImageBaseDataset):
                 warnings.warn('OPENAI API is not working properly, will use exact matching for evaluation')
                 warnings.warn(DEBUG_MESSAGE)
                 model = None
+            else:
+                # Identical judge requests (same question, options & prediction) are sent only once
+                model = JudgeRequestCache(model)
         else:
             warnings.warn('OPENAI_API_KEY is not set properly, will use exact matching for evaluation')
             model = None
 
         result_file = eval_file.replace(f'.{suffix}', f'_{name_str}_result.pkl')
 
+        if chunk_size is not None and not circular and not listinstr(['MMT', 'MMSci'], dataset):
+            eval_record = eval_file.replace(f'.{suffix}', f'_{name_str}_result.tsv')
+            acc = mcq_vanilla_eval_chunked(
+                model, eval_file, self.data, nproc, result_file, eval_record, self.dataset_name,
+                chunk_size=int(chunk_size), pack_size=pack_size
+            ).report()
+            dump(acc, eval_file.replace(f'.{suffix}', '_acc.csv'))
+            return acc
+
         data = load(eval_file)
         data = data.sort_values(by='index')
         data['prediction'] = [str(x) for x in data['prediction']]
@@ -296,7 +313,9 @@ class ImageMCQDataset(ImageBaseDataset):
         if circular:
             data = mcq_circular_eval(model, data, meta, nproc, result_file, self.dataset_name)
         else:
-            data = mcq_vanilla_eval(model, data, meta, nproc, result_file, self.dataset_name)
+            data = mcq_vanilla_eval(model, data, meta, nproc, result_file, self.dataset_name, pack_size=pack_size)
+        if isinstance(model, JudgeRequestCache):
+            model.report()
 
         # load split
         eval_record = eval_file.replace(f'.{suffix}', f'_{name_str}_result.{suffix}')
@@ -393,9 +412,8 @@ class ImageMCQDataset(ImageBaseDataset):
         # Add verifier evaluation for specific datasets
         from .utils.verifier import Verifier
         verifier = Verifier(use_vllm=judge_kwargs.get('use_vllm', False))
-        verifier_scores = []
-        verifier_matches = []
-        for idx, row in tqdm(data.iterrows(), total=len(data), desc="Verifier Evaluation Progress"):
+        questions, answers = [], []
+        for idx, row in data.iterrows():
             question_text = row['question']
             if 'A' in row and not pd.isna(row['A']):
                 options = []
@@ -411,12 +429,12 @@ class ImageMCQDataset(ImageBaseDataset):
             else:
                 answer_text = correct_option
 
-            score = verifier.evaluate(question_text, row['prediction'], answer_text)
-            verifier_scores.append(score)
-            verifier_matches.append(1.0 if score else 0.0)
+            questions.append(question_text)
+            answers.append(answer_text)
 
+        verifier_scores = verifier.evaluate_batch(questions, list(data['prediction']), answers)
         data['verifier_score'] = verifier_scores
-        data['verifier_match'] = verifier_matches
+        data['verifier_match'] = [1.0 if score else 0.0 for score in verifier_scores]
 
         detailed_result_file = eval_file.replace(f'.{suffix}', '_detailed_results.xlsx')
         dump(data, detailed_result_file)
@@ -615,11 +633,11 @@ class MMMUProDataset(MMMUDataset):
         if 'COT' in self.dataset_name:
             data = load(eval_file)
             data['prediction'] = [self.cot_postproc(x) for x in data['prediction']]
-            tgt = eval_file.replace('.xlsx', '_cotpost.xlsx')
+            tgt = get_intermediate_file_path(eval_file, '_cotpost')
             dump(data, tgt)
             res = super().evaluate(tgt, **judge_kwargs)
-            acc_org = eval_file.replace('.xlsx', '_acc.csv')
-            acc_now = eval_file.replace('.xlsx', '_cotpost_acc.csv')
+            acc_org = get_intermediate_file_path(eval_file, '_acc', 'csv')
+            acc_now = get_intermediate_file_path(eval_file, '_cotpost_acc', 'csv')
             shutil.copy(acc_now, acc_org)
             return res
         else:
@@ -1017,11 +1035,11 @@ class MMERealWorld(ImageMCQDataset):
     @classmethod
     def evaluate(self, eval_file, **judge_kwargs):
         from .utils.multiple_choice import extract_characters_regex, get_dimension_rating
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         FAIL_MSG = 'Failed to obtain answer via API.'
-        tmp_file = eval_file.replace('.xlsx', '_tmp.pkl')
-        tgt_file = eval_file.replace('.xlsx', '_rating.json')
-        score_file = eval_file.replace('.xlsx', '_score.xlsx')
+        tmp_file = get_intermediate_file_path(eval_file, '_tmp', 'pkl')
+        tgt_file = get_intermediate_file_path(eval_file, '_rating', 'json')
+        score_file = get_intermediate_file_path(eval_file, '_score')
 
         if not osp.exists(score_file):
 
@@ -1437,7 +1455,7 @@ class WeMath(ImageBaseDataset):
             four_dim_scores = wemath_accuracy(eval_file)
         combine_score = {**accuracy_scores, **four_dim_scores}
         combine_score = pd.DataFrame(combine_score)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
         dump(combine_score, score_pth)
         return combine_score
 
@@ -1647,7 +1665,7 @@ class VisuLogic(ImageMCQDataset):
             accuracy_scores = VisuLogic_acc(eval_file)
         combine_score = {**accuracy_scores,}
         combine_score = pd.DataFrame(combine_score)
-        score_pth = storage.replace('.xlsx', '_acc.csv')
+        score_pth = get_intermediate_file_path(storage, '_acc', 'csv')
         dump(combine_score, score_pth)
         return combine_score
 
@@ -2376,7 +2394,7 @@ class _3DSRBench(ImageMCQDataset):
             acc_map[k]['setting'] = [k] * len(acc_map[k])
             metrics.append(acc_map[k])
         res_all = pd.concat(metrics)
-        dump(res_all, eval_file.replace('.xlsx', '_acc_all.csv'))
+        dump(res_all, get_intermediate_file_path(eval_file, '_acc_all', 'csv'))
         return res_all
 
 
@@ -2495,7 +2513,7 @@ class AffordanceDataset(ImageMCQDataset):
             model = None
 
         try:
-            df = pd.read_excel(eval_file)
+            df = load(eval_file)
         except FileNotFoundError:
             print(f"未找到文件：{eval_file}")
         except Exception as e:
@@ -2559,11 +2577,11 @@ class TreeBench(ImageMCQDataset):
         import ast
         from .utils.multiple_choice import extract_characters_regex
         from .utils.treebench import get_dimension_rating
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         FAIL_MSG = 'Failed to obtain answer via API.'
-        tmp_file = eval_file.replace('.xlsx', '_tmp.pkl')
-        tgt_file = eval_file.replace('.xlsx', '_rating.json')
-        score_file = eval_file.replace('.xlsx', '_score.xlsx')
+        tmp_file = get_intermediate_file_path(eval_file, '_tmp', 'pkl')
+        tgt_file = get_intermediate_file_path(eval_file, '_rating', 'json')
+        score_file = get_intermediate_file_path(eval_file, '_score')
 
         if not osp.exists(score_file):
 
@@ -9,7 +9,7 @@ from tqdm import tqdm
 from .image_base import ImageBaseDataset
 from .utils import build_judge, DEBUG_MESSAGE
 from ..smp import *
-from ..utils import track_progress_rich
+from ..utils import track_progress_rich, track_pipeline_rich
 
 
 class ImageVQADataset(ImageBaseDataset):
@@ -70,9 +70,8 @@ class ImageVQADataset(ImageBaseDataset):
         assert 'answer' in data and 'prediction' in data
         data['prediction'] = [str(x) for x in data['prediction']]
         data['answer'] = [str(x) for x in data['answer']]
-        lt = len(data)
         pool = mp.Pool(16)
-        lines = [data.iloc[i] for i in range(lt)]
+        lines = list(DataRecords(data))
         if listinstr(['TextVQA'], dataset):
             res = pool.map(partial(process_line, method='vqa_score'), lines)
         elif listinstr(['ChartQA'], dataset):
@@ -132,11 +131,11 @@ class ImageVQADataset(ImageBaseDataset):
         lines = [data.iloc[i] for i in range(lt)]
         from .utils.verifier import Verifier
         verifier = Verifier(use_vllm=judge_kwargs.get('use_vllm', False))
+        scores = verifier.evaluate_batch(
+            [line['question'] for line in lines], [line['prediction'] for line in lines],
+            [line['answer'] for line in lines])
         res = []
-        scores = []
-        for line in tqdm(lines):
-            score = verifier.evaluate(line['question'], line['prediction'], line['answer'])
-            scores.append(score)
+        for line, score in zip(lines, scores):
             res.append({
                 'gt': [line['answer']],
                 'pred': line['prediction'],
@@ -292,7 +291,7 @@ class OCRBench(ImageBaseDataset):
              + final_score_dict['Handwritten Mathematical Expression Recognition'])
         final_score_dict['Final Score Norm'] = (
             float(final_score_dict['Final Score']) / 10)
-        score_pth = eval_file.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'json')
         dump(final_score_dict, score_pth)
         return final_score_dict
 
@@ -360,7 +359,7 @@ class MathVista(ImageBaseDataset):
             dump(data, storage)
 
         score = MathVista_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -372,21 +371,14 @@ class MathVista(ImageBaseDataset):
             from .utils.verifier import Verifier
             verifier = Verifier(use_vllm=judge_kwargs.get('use_vllm', False))
 
-            verifier_scores = []
-            verifier_matches = []
-            for idx, row in tqdm(data.iterrows(), total=len(data), desc="Verifier Evaluation Progress"):
-                question_text = row['question'] if 'question' in row else ""
-                prediction_text = row['prediction'] if 'prediction' in row else ""
-                answer_text = row['answer'] if 'answer' in row else ""
-
-                score = verifier.evaluate(question_text, prediction_text, answer_text)
-                verifier_scores.append(score)
-                verifier_matches.append(1.0 if score else 0.0)
+            def column(key):
+                return list(data[key]) if key in data else [""] * len(data)
 
+            verifier_scores = verifier.evaluate_batch(column('question'), column('prediction'), column('answer'))
             data['verifier_score'] = verifier_scores
-            data['verifier_match'] = verifier_matches
+            data['verifier_match'] = [1.0 if score else 0.0 for score in verifier_scores]
 
-            detailed_result_file = eval_file.replace('.xlsx', '_detailed_results.xlsx')
+            detailed_result_file = get_intermediate_file_path(eval_file, '_detailed_results')
             dump(data, detailed_result_file)
 
         def MathVista_acc_verifier(result_file):
@@ -425,7 +417,7 @@ class MathVista(ImageBaseDataset):
             return res
 
         score = MathVista_acc_verifier(detailed_result_file)
-        score_pth = eval_file.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -488,86 +480,39 @@ class MathVerse(ImageBaseDataset):
         model = judge_kwargs['model']
         suffix = eval_file.split('.')[-1]
         storage_extract = eval_file.replace(f'.{suffix}', f'_{model}_extract.xlsx')
-        tmp_file_extract = eval_file.replace(f'.{suffix}', f'_{model}_extract.pkl')
         storage_score = eval_file.replace(f'.{suffix}', f'_{model}_score.xlsx')
-        tmp_file_score = eval_file.replace(f'.{suffix}', f'_{model}_score.pkl')
+        tmp_file = eval_file.replace(f'.{suffix}', f'_{model}_pipeline.pkl')
         nproc = judge_kwargs.pop('nproc', 4)
-        # stage1: extract the answer
-        if not osp.exists(storage_extract):
-            data = load(eval_file)
-            model = build_judge(max_tokens=128, **judge_kwargs)
-            assert model.working(), 'MathVerse evaluation requires a working OPENAI API\n' + DEBUG_MESSAGE
-            lt = len(data)
-            lines = [data.iloc[i] for i in range(lt)]
-            tups = [(model, line) for line in lines]
-            indices = [line['index'] for line in lines]
-
-            ans = {}
-            if osp.exists(tmp_file_extract):
-                ans = load(tmp_file_extract)
-            tups = [x for x, i in zip(tups, indices) if i not in ans]
-            indices = [i for i in indices if i not in ans]
-
-            if len(indices):
-                new_results = track_progress_rich(
-                    MathVerse_auxeval_extract,
-                    tups,
-                    nproc=nproc,
-                    chunksize=nproc,
-                    keys=indices,
-                    save=tmp_file_extract,
-                )
-                ans = load(tmp_file_extract)
-                for k, v in zip(indices, new_results):
-                    assert k in ans
-                    assert ans[k]['log_extract'] == v['log_extract'] and ans[
-                        k]['extract'] == v['extract']
-
-            data['extract'] = [ans[idx]['extract'] for idx in data['index']]
-            data['log_extract'] = [
-                ans[idx]['log_extract'] for idx in data['index']
-            ]
-            dump(data, storage_extract)
-
-        # stage2: score the answer
+        # Stage 1 extracts the answer, stage 2 scores it. The stages are pipelined: an item is scored as soon as its
+        # answer is extracted, both stages share one judge and one checkpoint
         if not osp.exists(storage_score):
-            data = load(storage_extract)
+            stages = []
+            if osp.exists(storage_extract):
+                data = load(storage_extract)
+            else:
+                data = load(eval_file)
+                stages.append(MathVerse_auxeval_extract)
+            stages.append(MathVerse_auxeval_score)
+
             model = build_judge(max_tokens=128, **judge_kwargs)
             assert model.working(), 'MathVerse evaluation requires a working OPENAI API\n' + DEBUG_MESSAGE
-            lt = len(data)
-            lines = [data.iloc[i] for i in range(lt)]
-            tups = [(model, line) for line in lines]
-            indices = [line['index'] for line in lines]
-
-            ans = {}
-            if osp.exists(tmp_file_score):
-                ans = load(tmp_file_score)
-            tups = [x for x, i in zip(tups, indices) if i not in ans]
-            indices = [i for i in indices if i not in ans]
-
-            if len(indices):
-                new_results = track_progress_rich(
-                    MathVerse_auxeval_score,
-                    tups,
-                    nproc=nproc,
-                    chunksize=nproc,
-                    keys=indices,
-                    save=tmp_file_score,
-                )
-                ans = load(tmp_file_score)
-                for k, v in zip(indices, new_results):
-                    assert k in ans
-                    assert ans[k]['log_score'] == v['log_score'] and ans[k][
-                        'score'] == v['score']
+            lines = list(DataRecords(data))
+            ans = track_pipeline_rich(
+                [partial(stage, model) for stage in stages],
+                lines,
+                keys=[line['index'] for line in lines],
+                nproc=nproc,
+                save=tmp_file,
+            )
 
-            data['score'] = [ans[idx]['score'] for idx in data['index']]
-            data['log_score'] = [
-                ans[idx]['log_score'] for idx in data['index']
-            ]
+            for k in ['extract', 'log_extract', 'score', 'log_score']:
+                data[k] = [ans[idx][k] for idx in data['index']]
+            if not osp.exists(storage_extract):
+                dump(data.drop(columns=['score', 'log_score']), storage_extract)
             dump(data, storage_score)
 
         score = MathVerse_acc(storage_score)
-        score_pth = storage_score.replace('.xlsx', '.csv')
+        score_pth = get_intermediate_file_path(storage_score, '', 'csv')
         dump(score, score_pth)
         return score
 
@@ -638,7 +583,7 @@ class MathVision(ImageBaseDataset):
             dump(data, storage)
 
         score = MATH_V_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -651,25 +596,18 @@ class MathVision(ImageBaseDataset):
             from .utils.verifier import Verifier
             verifier = Verifier(use_vllm=judge_kwargs.get('use_vllm', False))
 
-            verifier_scores = []
-            verifier_matches = []
-            for idx, row in tqdm(data.iterrows(), total=len(data), desc="Verifier Evaluation Progress"):
-                question_text = row['question'] if 'question' in row else ""
-                prediction_text = row['prediction'] if 'prediction' in row else ""
-                answer_text = row['answer'] if 'answer' in row else ""
-
-                score = verifier.evaluate(question_text, prediction_text, answer_text)
-                verifier_scores.append(score)
-                verifier_matches.append(1.0 if score else 0.0)
+            def column(key):
+                return list(data[key]) if key in data else [""] * len(data)
 
+            verifier_scores = verifier.evaluate_batch(column('question'), column('prediction'), column('answer'))
             data['verifier_score'] = verifier_scores
-            data['verifier_match'] = verifier_matches
+            data['verifier_match'] = [1.0 if score else 0.0 for score in verifier_scores]
 
-            detailed_result_file = eval_file.replace('.xlsx', '_detailed_results.xlsx')
+            detailed_result_file = get_intermediate_file_path(eval_file, '_detailed_results')
             dump(data, detailed_result_file)
 
         else:
-            detailed_result_file = eval_file.replace('.xlsx', '_detailed_results.xlsx')
+            detailed_result_file = get_intermediate_file_path(eval_file, '_detailed_results')
             if not osp.exists(detailed_result_file):
                 dump(data, detailed_result_file)
 
@@ -700,7 +638,7 @@ class MathVision(ImageBaseDataset):
             return res
 
         score = MathVision_acc_verifier(detailed_result_file)
-        score_pth = eval_file.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -842,7 +780,7 @@ class Physics_yale(ImageBaseDataset):
             dump(data, storage)
 
         score = PHYSIC_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -1190,7 +1128,7 @@ class SeePhys(ImageBaseDataset):
             dump(data, storage)
 
         score = eval_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(storage, '_score', 'json')
         dump(score, score_pth)
         return score
 
@@ -1276,7 +1214,7 @@ class LogicVista(ImageBaseDataset):
             dump(data, storage)
         if osp.exists(storage):
             accuracy_scores = evaluate_logicvista(storage)
-            score_pth = storage.replace('.xlsx', '_score.csv')
+            score_pth = get_intermediate_file_path(storage, '_score', 'csv')
             dump(accuracy_scores, score_pth)
 
             return accuracy_scores
@@ -1609,8 +1547,8 @@ class MMVet(ImageBaseDataset):
             dump(data, storage)
 
         score, score_fine = MMVet_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
-        score_fine_pth = storage.replace('.xlsx', '_score_fine.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
+        score_fine_pth = get_intermediate_file_path(storage, '_score_fine', 'csv')
         dump(score, score_pth)
         dump(score_fine, score_fine_pth)
         return score
@@ -2007,7 +1945,7 @@ class CRPE(ImageBaseDataset):
             else:
                 final_score_dict[category] = None
 
-        score_pth = eval_file.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'json')
         dump(final_score_dict, score_pth)
         return final_score_dict
 
@@ -2271,7 +2209,7 @@ class QSpatial(ImageBaseDataset):
                 delta_1_point_5_per_question_type
             })
 
-        score_pth = eval_file.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'json')
         dump(final_score_dict, score_pth)
         return final_score_dict
 
@@ -2395,7 +2333,7 @@ class MMNIAH(ImageBaseDataset):
             else:
                 final_score_dict[category] = None
 
-        score_pth = eval_file.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'json')
         dump(final_score_dict, score_pth)
         return final_score_dict
 
@@ -2480,12 +2418,9 @@ class MMSci_Captioning(ImageBaseDataset):
         from .utils.mmsci import (get_all_metrics_for_g_eval_score,
                                   get_all_metrics_for_reference_based_metrics,
                                   merge_rating, fact_score_generate)
-        refer_based_metrics_output_file = eval_file.replace(
-            '.xlsx', '_reference_based_metrics.xlsx')
-        g_eval_metrics_output_file = eval_file.replace('.xlsx',
-                                                       '_g_eval_metrics.xlsx')
-        fact_score_metrics_output_file = eval_file.replace(
-            '.xlsx', '_fact_score.xlsx')
+        refer_based_metrics_output_file = get_intermediate_file_path(eval_file, '_reference_based_metrics')
+        g_eval_metrics_output_file = get_intermediate_file_path(eval_file, '_g_eval_metrics')
+        fact_score_metrics_output_file = get_intermediate_file_path(eval_file, '_fact_score')
 
         # calculate reference-based metrics
         if not osp.exists(refer_based_metrics_output_file):
@@ -2510,8 +2445,7 @@ class MMSci_Captioning(ImageBaseDataset):
             if isinstance(references[0], str):
                 references = [[r] for r in references]
 
-            reference_based_metrics_file = eval_file.replace(
-                '.xlsx', '_reference_based_metrics.pkl')
+            reference_based_metrics_file = get_intermediate_file_path(eval_file, '_reference_based_metrics', 'pkl')
             existing_data = get_all_metrics_for_reference_based_metrics(
                 references, candidates, image_id_list,
                 reference_based_metrics_file)
@@ -2584,7 +2518,7 @@ class MMSci_Captioning(ImageBaseDataset):
         rating = merge_rating(refer_based_metrics_output_file,
                               g_eval_metrics_output_file,
                               fact_score_metrics_output_file)
-        dump(rating, eval_file.replace('.xlsx', '_final_rating.xlsx'))
+        dump(rating, get_intermediate_file_path(eval_file, '_final_rating'))
         return rating
 
 
@@ -2597,7 +2531,7 @@ class BMMR(ImageBaseDataset):
 
     def evaluate(self, eval_file, **judge_kwargs):
         from .utils.bmmr import get_acc_for_reference_based_metrics, merge_rating
-        refer_based_metrics_output_file = eval_file.replace('.xlsx', '_reference_based_metrics.xlsx')
+        refer_based_metrics_output_file = get_intermediate_file_path(eval_file, '_reference_based_metrics')
         if not osp.exists(refer_based_metrics_output_file):
             data = load(eval_file)
             old_candidates = {}
@@ -2623,7 +2557,7 @@ class BMMR(ImageBaseDataset):
             if isinstance(references[0], str):
                 references = [[r] for r in references]
 
-            reference_based_metrics_file = eval_file.replace('.xlsx', '_reference_based_metrics.pkl')
+            reference_based_metrics_file = get_intermediate_file_path(eval_file, '_reference_based_metrics', 'pkl')
             assert len(references) == len(candidates) == len(image_id_list) == len(task_type_list)
             existing_data = get_acc_for_reference_based_metrics(
                 references, candidates, image_id_list, task_type_list, reference_based_metrics_file
@@ -2636,7 +2570,7 @@ class BMMR(ImageBaseDataset):
         rating = merge_rating(
             refer_based_metrics_output_file,
         )
-        dump(rating, eval_file.replace('.xlsx', '_final_rating.xlsx'))
+        dump(rating, get_intermediate_file_path(eval_file, '_final_rating'))
         return rating
 
     def build_prompt(self, line):
@@ -2877,7 +2811,7 @@ class OCR_Reasoning(ImageBaseDataset):
             ]
             dump(data, storage)
         score = OcrR_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
         dump(score, score_pth)
         return score
 
@@ -3057,7 +2991,7 @@ class PhyX(ImageBaseDataset):
                 dump(data, storage)
 
             score = PhyX_acc(storage)
-            score_pth = storage.replace('.xlsx', '_score.csv')
+            score_pth = get_intermediate_file_path(storage, '_score', 'csv')
             dump(score, score_pth)
             return score
 
@@ -3309,7 +3243,7 @@ class MMEReasoning(ImageBaseDataset):
             dump(data, storage_score)
 
         score = MMEReasoning_acc(storage_score)
-        score_pth = storage_score.replace('.xlsx', '.csv')
+        score_pth = get_intermediate_file_path(storage_score, '', 'csv')
         dump(score, score_pth)
         return score
 
@@ -3370,13 +3304,13 @@ class MMVMBench(ImageBaseDataset):
 
     @classmethod
     def evaluate(self, eval_file, **judge_kwargs):
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         judge = judge_kwargs['model']
         nproc = judge_kwargs.pop('nproc', 4)
 
-        tmp_file = eval_file.replace('.xlsx', f'_{judge}_tmp.pkl')
-        score_file = eval_file.replace('.xlsx', f'_{judge}_score.xlsx')
-        acc_file = eval_file.replace('.xlsx', f'_{judge}_acc.xlsx')
+        tmp_file = get_intermediate_file_path(eval_file, f'_{judge}_tmp', 'pkl')
+        score_file = get_intermediate_file_path(eval_file, f'_{judge}_score')
+        acc_file = get_intermediate_file_path(eval_file, f'_{judge}_acc')
 
         judge_kwargs['temperature'] = 0.0
         model = build_judge(**judge_kwargs)
@@ -3487,6 +3421,6 @@ class OCRBench_v2(ImageBaseDataset):
         final_score_dict = {**en_scores, **cn_scores}
         final_score_dict["English Overall Score"] = score_en_overall
         final_score_dict["Chinese Overall Score"] = score_cn_overall
-        score_pth = eval_file.replace('.xlsx', '_score.json')
+        score_pth = get_intermediate_file_path(eval_file, '_score', 'json')
         dump(final_score_dict, score_pth)
         return final_score_dict
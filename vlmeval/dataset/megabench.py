@@ -395,7 +395,7 @@ class MEGABench(VideoBaseDataset):
         return message
 
     def evaluate(self, eval_file, **judge_kwargs):
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         data = load(eval_file)
         result = []
 
@@ -424,7 +424,7 @@ class MEGABench(VideoBaseDataset):
         # save the result to json
         output_path = os.path.join(os.path.dirname(eval_file), f'megabench_result_{self.subset_name}.json')
         result_path = os.path.join(os.path.dirname(eval_file), f'megabench_score_{self.subset_name}.json')
-        score_path = eval_file.replace('.xlsx','_acc_{self.subset_name}.json')
+        score_path = get_intermediate_file_path(eval_file, '_acc_{self.subset_name}', 'json')
         if not os.path.exists(output_path) or not os.path.exists(result_path):
             for task_name, group in data.groupby('task_name'):
                 task_dict = {
@@ -460,6 +460,8 @@ class MEGABench(VideoBaseDataset):
                 subset_name=self.subset_name,
                 responses_file=output_path,
                 output_file=result_path,
+                nproc=judge_kwargs.get('nproc', 4),
+                judge_nproc=judge_kwargs.get('nproc', 4),
             )
             evaluator.evaluate()
 
@@ -96,7 +96,7 @@ Please directly reply with your response to the only question.
         if isinstance(line, int):
             assert line < len(self)
             video = self.videos[line]
-        elif isinstance(line, pd.Series):
+        elif isinstance(line, (pd.Series, dict)):
             video = line['video']
         elif isinstance(line, str):
             video = line
@@ -208,13 +208,13 @@ Please directly reply with your response to the only question.
     def evaluate(self, eval_file, **judge_kwargs):
         from .utils.mmbench_video import get_dimension_rating, system_prompt, build_prompt
 
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         judge = judge_kwargs['model']
         nproc = judge_kwargs.pop('nproc', 4)
 
-        tmp_file = eval_file.replace('.xlsx', f'_{judge}_tmp.pkl')
-        tgt_file = eval_file.replace('.xlsx', f'_{judge}_rating.json')
-        score_file = eval_file.replace('.xlsx', f'_{judge}_score.xlsx')
+        tmp_file = get_intermediate_file_path(eval_file, f'_{judge}_tmp', 'pkl')
+        tgt_file = get_intermediate_file_path(eval_file, f'_{judge}_rating', 'json')
+        score_file = get_intermediate_file_path(eval_file, f'_{judge}_score')
 
         model = build_judge(system_prompt=system_prompt, **judge_kwargs)
         assert model.working(), 'MMBench-Video evaluation requires a working OPENAI API\n' + DEBUG_MESSAGE
@@ -576,7 +576,7 @@ class MMLongBench(ImageBaseDataset):
             dump(data, storage)
 
         score = MMLongBench_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
 
         dump(score, score_pth)
         logger.info(f'MMLongBench_eval successfully finished evaluating {eval_file}, results saved in {score_pth}')
@@ -108,7 +108,7 @@ class MovieChat1k(VideoBaseDataset):
         if isinstance(line, int):
             assert line < len(self)
             video = self.videos[line]
-        elif isinstance(line, pd.Series):
+        elif isinstance(line, (pd.Series, dict)):
             video = line['video']
         elif isinstance(line, str):
             video = line
@@ -215,16 +215,16 @@ class MovieChat1k(VideoBaseDataset):
     def evaluate(self, eval_file, **judge_kwargs):
         from .utils.moviechat1k import get_dimension_rating, prepare_score_prompt
 
-        assert eval_file.endswith('.xlsx'), 'data file should be an xlsx file'
+        assert eval_file.endswith(PRED_FILE_SUFFIXES), 'data file should be a prediction file (xlsx / tsv / parquet)'
         judge = judge_kwargs.setdefault('model', 'chatgpt-0125')
         assert judge in ['chatgpt-0125'], f'Invalid judge model for MovieChat1k: {judge}'
         nproc = judge_kwargs.pop('nproc', 4)
         _ = judge_kwargs.pop('verbose', None)
         _ = judge_kwargs.pop('retry', None)
 
-        tmp_file = eval_file.replace('.xlsx', f'_{judge}_tmp.pkl')
-        tgt_file = eval_file.replace('.xlsx', f'_{judge}_rating.json')
-        score_file = eval_file.replace('.xlsx', f'_{judge}_score.xlsx')
+        tmp_file = get_intermediate_file_path(eval_file, f'_{judge}_tmp', 'pkl')
+        tgt_file = get_intermediate_file_path(eval_file, f'_{judge}_rating', 'json')
+        score_file = get_intermediate_file_path(eval_file, f'_{judge}_score')
 
         model = build_judge(**judge_kwargs)
 
@@ -181,7 +181,7 @@ class SlideVQA(ImageBaseDataset):
             dump(data, storage)
 
         score = SlideVQA_acc(storage)
-        score_pth = storage.replace('.xlsx', '_score.csv')
+        score_pth = get_intermediate_file_path(storage, '_score', 'csv')
 
         dump(score, score_pth)
         logger.info(f'SlideVQA successfully finished evaluating {eval_file}, results saved in {score_pth}')
@@ -1,11 +1,12 @@
-from .judge_util import build_judge, DEBUG_MESSAGE
+from .judge_util import build_judge, JudgeRequestCache, JudgeGovernor, governor_stats, DEBUG_MESSAGE
 from .multiple_choice import extract_answer_from_item, prefetch_answer
 from .vqa_eval import levenshtein_distance
 from .spatial457 import Spatial457_utils
 
 
 __all__ = [
-    'build_judge', 'extract_answer_from_item', 'prefetch_answer',
+    'build_judge', 'JudgeRequestCache', 'JudgeGovernor', 'governor_stats',
+    'extract_answer_from_item', 'prefetch_answer',
     'levenshtein_distance', 'DEBUG_MESSAGE',
     'Spatial457_utils'
 ]
@@ -1,9 +1,158 @@
 import os
-from ...smp import load_env
+import hashlib
+import threading
+from ...smp import load_env, get_logger
 
 INTERNAL = os.environ.get('INTERNAL', 0)
 
 
+class JudgeProxy:
+    """Base class of judge wrappers. Attributes not set by the wrapper are read from / written to the wrapped model
+    (e.g. `model.system_prompt = ...` in evaluators still configures the underlying judge)."""
+
+    def __getattr__(self, name):
+        if name in ['model', '_wrapped']:
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get('_wrapped', False) and name not in self.__dict__:
+            setattr(self.model, name, value)
+        else:
+            super().__setattr__(name, value)
+
+    @property
+    def base_model(self):
+        model = self.model
+        while isinstance(model, JudgeProxy):
+            model = model.model
+        return model
+
+
+class JudgeGovernor(JudgeProxy):
+    """Cap the number of concurrent calls to a judge endpoint across threads and processes.
+
+    Each endpoint owns `max_concurrency` slot files under `lock_dir`. A call holds an exclusive file lock on one
+    slot while it runs, so every evaluator / `run.py` process on the host shares the same budget.
+    Per-process queue depth and latency stats are written to `lock_dir` and can be read by `governor_stats`.
+    """
+
+    def __init__(self, model, max_concurrency, lock_dir=None, endpoint=None):
+        import os.path as osp
+        self.model = model
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.lock_dir = lock_dir or os.environ.get(
+            'VLMEVAL_JUDGE_LOCK_DIR', osp.join(osp.expanduser('~'), '.cache', 'vlmeval', 'judge_locks'))
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.endpoint = endpoint or self.endpoint_of(model)
+        self.slot_key = hashlib.md5(self.endpoint.encode('utf-8')).hexdigest()[:16]
+        self.lock = threading.Lock()
+        self.waiting, self.running, self.calls = 0, 0, 0
+        self.wait_time, self.call_time = 0., 0.
+        self.stats_time = 0
+        self.stats_lock = threading.Lock()
+        self._wrapped = True
+
+    @staticmethod
+    def endpoint_of(model):
+        api_base = getattr(model, 'api_base', None)
+        if isinstance(api_base, str):
+            return api_base
+        return f'{type(model).__name__}:{getattr(model, "model", None)}'
+
+    def _acquire(self):
+        import time
+        import portalocker
+        slot, delay = os.getpid() % self.max_concurrency, 0.01
+        while True:
+            for i in range(self.max_concurrency):
+                pth = os.path.join(self.lock_dir, f'{self.slot_key}.slot{(slot + i) % self.max_concurrency}.lock')
+                fh = open(pth, 'a')
+                try:
+                    portalocker.lock(fh, portalocker.LOCK_EX | portalocker.LOCK_NB)
+                    return fh
+                except portalocker.exceptions.LockException:
+                    fh.close()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    @staticmethod
+    def _release(fh):
+        import portalocker
+        portalocker.unlock(fh)
+        fh.close()
+
+    def generate(self, message, **kwargs):
+        import time
+        with self.lock:
+            self.waiting += 1
+        st = time.time()
+        fh = self._acquire()
+        acquired = time.time()
+        with self.lock:
+            self.waiting -= 1
+            self.running += 1
+            self.wait_time += acquired - st
+        try:
+            return self.model.generate(message, **kwargs)
+        finally:
+            self._release(fh)
+            with self.lock:
+                self.running -= 1
+                self.calls += 1
+                self.call_time += time.time() - acquired
+            self.dump_stats()
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                endpoint=self.endpoint, pid=os.getpid(), max_concurrency=self.max_concurrency,
+                waiting=self.waiting, running=self.running, calls=self.calls,
+                avg_wait=self.wait_time / self.calls if self.calls else 0.,
+                avg_latency=self.call_time / self.calls if self.calls else 0.)
+
+    def dump_stats(self, force=False):
+        # At most once per second per process, writing stats never fails the judge call
+        import json
+        import time
+        import uuid
+        if not self.stats_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and time.time() - self.stats_time < 1:
+                return
+            self.stats_time = time.time()
+            pth = os.path.join(self.lock_dir, f'{self.slot_key}.{os.getpid()}.stats.json')
+            tmp = f'{pth}.{uuid.uuid4().hex}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(dict(self.stats(), time=self.stats_time), f)
+            os.replace(tmp, pth)
+        except OSError as err:
+            get_logger('JudgeGovernor').warning(f'Failed to write the judge stats: {err}')
+        finally:
+            self.stats_lock.release()
+
+
+def governor_stats(lock_dir=None, max_age=60):
+    """Collect the live stats of all governed judge endpoints on this host: {endpoint: [per-process stats]}."""
+    import glob
+    import json
+    import time
+    import os.path as osp
+    lock_dir = lock_dir or os.environ.get(
+        'VLMEVAL_JUDGE_LOCK_DIR', osp.join(osp.expanduser('~'), '.cache', 'vlmeval', 'judge_locks'))
+    ret = {}
+    for pth in glob.glob(osp.join(lock_dir, '*.stats.json')):
+        try:
+            with open(pth) as f:
+                stat = json.load(f)
+        except Exception:
+            continue
+        if time.time() - stat['time'] <= max_age:
+            ret.setdefault(stat['endpoint'], []).append(stat)
+    return ret
+
+
 def build_judge(**kwargs):
     from ...api import OpenAIWrapper, SiliconFlowAPI, HFChatModel
     model = kwargs.pop('model', None)
@@ -37,9 +186,105 @@ def build_judge(**kwargs):
         model = HFChatModel(model_version, **kwargs)
     else:
         model = OpenAIWrapper(model_version, **kwargs)
+
+    # Shared concurrency budget per judge endpoint, across all evaluators and processes on this host
+    max_concurrency = os.environ.get('VLMEVAL_JUDGE_CONCURRENCY', None)
+    if max_concurrency:
+        model = JudgeGovernor(model, int(max_concurrency))
     return model
 
 
+class JudgeRequestCache(JudgeProxy):
+    """Deduplicate the requests sent to a judge model.
+
+    Identical requests issued concurrently share one call, and answers are memoized for the lifetime of the object.
+    With `cache_file` (or env `VLMEVAL_JUDGE_CACHE`), answers are also stored in a sqlite file and reused across runs.
+    Failed API calls are never cached. All other attributes are forwarded to the wrapped model.
+    """
+
+    FAIL_MSG = 'Failed to obtain answer via API'
+
+    def __init__(self, model, cache_file=None):
+        self.model = model
+        self.cache_file = cache_file or os.environ.get('VLMEVAL_JUDGE_CACHE', None)
+        self.memo = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits, self.calls = 0, 0
+        if self.cache_file is not None:
+            with self._connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS judge_cache (key TEXT PRIMARY KEY, response TEXT)')
+        self._wrapped = True
+
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.cache_file, timeout=60)
+
+    def key(self, message, **kwargs):
+        model = self.base_model
+        model_id = (type(model).__name__, getattr(model, 'model', None),
+                    getattr(model, 'temperature', None), getattr(model, 'system_prompt', None))
+        return hashlib.md5(repr((model_id, message, sorted(kwargs.items()))).encode('utf-8')).hexdigest()
+
+    def _load(self, key):
+        if self.cache_file is None:
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT response FROM judge_cache WHERE key = ?', (key, )).fetchone()
+        return None if row is None else row[0]
+
+    def _store(self, key, response):
+        if self.cache_file is not None:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO judge_cache VALUES (?, ?)', (key, response))
+
+    def generate(self, message, **kwargs):
+        key = self.key(message, **kwargs)
+        while True:
+            with self.lock:
+                if key in self.memo:
+                    self.hits += 1
+                    return self.memo[key]
+                event = self.inflight.get(key, None)
+                if event is None:
+                    self.inflight[key] = threading.Event()
+                    break
+            # The same request is in flight, wait for its answer (or retry if it failed)
+            event.wait()
+
+        try:
+            response = self._load(key)
+            if response is None:
+                with self.lock:
+                    self.calls += 1
+                response = self.model.generate(message, **kwargs)
+                if isinstance(response, str) and self.FAIL_MSG not in response:
+                    self._store(key, response)
+            else:
+                with self.lock:
+                    self.hits += 1
+            if isinstance(response, str) and self.FAIL_MSG not in response:
+                with self.lock:
+                    self.memo[key] = response
+            return response
+        finally:
+            with self.lock:
+                self.inflight.pop(key).set()
+
+    def invalidate(self, message, **kwargs):
+        # Drop a cached answer, e.g. when it could not be parsed and the caller retries
+        key = self.key(message, **kwargs)
+        with self.lock:
+            self.memo.pop(key, None)
+        if self.cache_file is not None:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM judge_cache WHERE key = ?', (key, ))
+
+    def report(self):
+        get_logger('JudgeRequestCache').info(
+            f'{self.calls} judge calls, {self.hits} requests served from cache / deduplicated')
+
+
 DEBUG_MESSAGE = """
 To debug the OpenAI API, you can try the following scripts in python:
 ```python
@@ -1,6 +1,7 @@
 import argparse
 import json
 import os
+import time
 from typing import Any, Dict, List
 import ast
 from vlmeval import load, dump
@@ -10,22 +11,55 @@ from . import MetricType, AggregationType, ResponseParseType
 from .parsing.common.utils import evaluate_as_string
 
 
+# Metrics that query an LLM judge, their fields are evaluated in the main process through a thread pool
+LLM_JUDGE_METRICS = ("gpt_4o_as_judge", "ascii_art_gpt4o_judge")
+DEFAULT_SCORE_CONFIG = {
+    "field_score_function": {},
+    "aggregation": {"function": None, "field_weights": {}},
+    "response_parse_function": None,
+}
+
+
+class EvalContextIndex:
+    """Parsed eval contexts of a task, indexed both by query position and by sample id."""
+
+    def __init__(self, contexts):
+        # contexts: list of (sample id, eval_context string), in the order of the HF dataset
+        self.by_idx = [ast.literal_eval(ctx) for _, ctx in contexts]
+        self.by_id = {sample_id: ctx for (sample_id, _), ctx in zip(contexts, self.by_idx)}
+
+    def get(self, query):
+        if "query_idx" in query:
+            return self.by_idx[query["query_idx"]]
+        return self.by_id[query["global_idx"]]
+
+
+def _score_task_worker(args):
+    return MEGABenchEvaluator._score_task(*args)
+
+
 class MEGABenchEvaluator:
     def __init__(
         self,
         subset_name: str,
         responses_file: str,
         output_file: str,
+        nproc: int = 1,
+        judge_nproc: int = 8,
     ):
         """
         :param hf_data_file: Path to a file containing HF dataset tasks + their metric configs
         :param model_responses_file: Path to a JSON file with tasks + model responses
         :param output_file: Path to store evaluated results
+        :param nproc: Number of processes used to evaluate the rule-based fields, tasks are distributed among them
+        :param judge_nproc: Maximum number of concurrent LLM judge queries
         """
         self.hf_data = self._load_hf(subset_name)  # e.g. same structure used previously
         self.data = self._load_json(responses_file)  # The model's output
         self.output_file = output_file
         self.tmp_output_file = output_file.replace(".json", "_tmp.pkl")
+        self.nproc = nproc
+        self.judge_nproc = judge_nproc
 
         # Build a dict of {task_name -> metric configuration} for quick lookup
         self.scoring_functions = {}
@@ -49,18 +83,10 @@ class MEGABenchEvaluator:
 
         return task_dict
 
-    def _get_eval_context(self, task_name, query):
-        if "query_idx" in query:
-            query_idx = query["query_idx"]
-            eval_context = self.hf_data[task_name][query_idx]["eval_context"]
-        else:
-            global_idx = query["global_idx"]
-            global_idx_to_sample = {sample["id"]: sample for sample in self.hf_data[task_name]}
-            eval_context = global_idx_to_sample[global_idx]["eval_context"]
+    def _task_contexts(self, task_name):
+        # Only the fields needed to build the EvalContextIndex, cheap to send to the worker processes
+        return [(sample["id"], sample["eval_context"]) for sample in self.hf_data.get(task_name, [])]
 
-        eval_context = ast.literal_eval(eval_context)
-        return eval_context
-    
     def _determine_eval_style(self, task):
         metric_info = self.scoring_functions[task["task_name"]]
         all_task_metrics = list(metric_info["field_score_function"].values())
@@ -74,125 +100,199 @@ class MEGABenchEvaluator:
         )
         return eval_type
 
+    @classmethod
+    def _score_task(cls, task, score_config, contexts, records):
+        """
+        Parse the responses of a task and evaluate all its rule-based fields. The queries already in `records` are
+        skipped. Runs in a worker process, so everything it needs is passed in.
+        Returns the task (with `scores` filled) and the pending LLM judge fields:
+        a list of (query idx, field, metric name, response object, is_aux, eval_context).
+        """
+        task_name = task.get("task_name", "")
+        context_index = None
+        metric_cache = {}
+        pending = []
+        program_fields = []
+
+        field_score_functions = score_config.get("field_score_function", {})
+        global_aux_metrics = score_config.get("global_aux_metrics", {})
+        parser_type_str = score_config.get("response_parse_function", "dummy")
+        parser = ResponseParseType.from_string(parser_type_str)
+
+        # Extract the fields from the first correct_answer (assuming uniform)
+        first_correct = task["query_response"][0]["correct_answer"]
+        all_fields = list(first_correct.keys())
+        # Usually, we only treat “##something” fields as metadata, so skip them:
+        answer_fields = [f for f in all_fields if not f.startswith("##")]
+
+        for idx, query in enumerate(task["query_response"]):
+            if idx in records:
+                query["scores"] = records[idx]
+                continue
+
+            response_text = query.get("response", "")
+            correct_answer = query["correct_answer"]
+            # 1) Parse the response according to the specified parser
+            response_obj = cls._parse_response(
+                task_name,
+                parser,
+                response_text,
+                correct_answer,
+                answer_fields,
+                query,
+                task,
+            )
+            if context_index is None:
+                context_index = EvalContextIndex(contexts)
+            eval_context = context_index.get(query)
+
+            # Initialize scores for this query
+            query["scores"] = {"field": {}, "info": {}}
+            # 2) Evaluate each field, global auxiliary metrics (if any) get the entire response object
+            # under the `fld` key to do an additional check
+            fields = [(fld, name, response_obj, False) for fld, name in field_score_functions.items()]
+            fields += [(fld, name, {fld: response_obj}, True) for fld, name in global_aux_metrics.items()]
+            for fld, fld_metric_name, obj, is_aux in fields:
+                if fld_metric_name in LLM_JUDGE_METRICS:
+                    pending.append((idx, fld, fld_metric_name, obj, is_aux, eval_context))
+                    continue
+                if fld_metric_name == MetricType.PROGRAM_JUDGE.value:
+                    program_fields.append((query, fld, obj.get(fld), eval_context))
+                    continue
+                if fld_metric_name not in metric_cache:
+                    metric_cache[fld_metric_name] = cls._build_metric(fld_metric_name, score_config)
+                cls._evaluate_field(
+                    task_name,
+                    metric_cache[fld_metric_name],
+                    fld,
+                    obj,
+                    correct_answer,
+                    query,
+                    is_aux=is_aux,
+                    eval_context=eval_context,
+                )
+
+        # The test cases of all the programs of the task run concurrently in the sandbox pool
+        if len(program_fields):
+            from .scoring.program_judge import ProgramJudge
+            scores = ProgramJudge.match_batch(
+                [response for _, _, response, _ in program_fields],
+                [eval_context for _, _, _, eval_context in program_fields],
+            )
+            for (query, fld, _, _), score in zip(program_fields, scores):
+                query["scores"]["field"][fld] = score
+        return task, pending
+
+    def _judge_fields(self, tasks, pending, exist_records):
+        """Evaluate the pending LLM judge fields of all tasks through one thread pool."""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from tqdm import tqdm
+        jobs = []
+        for task, task_pending in zip(tasks, pending):
+            if not len(task_pending):
+                continue
+            score_config = self.scoring_functions.get(task["task_name"], DEFAULT_SCORE_CONFIG)
+            # Judges are stateless between queries, one instance per task and metric is shared by the threads
+            metrics = {}
+            for idx, fld, fld_metric_name, obj, is_aux, eval_context in task_pending:
+                if fld_metric_name not in metrics:
+                    metrics[fld_metric_name] = self._build_metric(fld_metric_name, score_config)
+                query = task["query_response"][idx]
+                jobs.append((task, idx, (
+                    task["task_name"], metrics[fld_metric_name], fld, obj,
+                    query["correct_answer"], query, is_aux, eval_context
+                )))
+        if not len(jobs):
+            return
+
+        # A query is recorded once all its judge fields are done
+        remaining = {}
+        for task, idx, _ in jobs:
+            remaining[(task["task_name"], idx)] = remaining.get((task["task_name"], idx), 0) + 1
+        last_save = time.time()
+        with ThreadPoolExecutor(max_workers=self.judge_nproc) as executor:
+            futures = {executor.submit(self._evaluate_field, *args): (task, idx) for task, idx, args in jobs}
+            for fut in tqdm(as_completed(futures), total=len(futures), desc="MEGABench LLM judge"):
+                fut.result()
+                task, idx = futures[fut]
+                key = (task["task_name"], idx)
+                remaining[key] -= 1
+                if remaining[key] == 0:
+                    exist_records[task["task_name"]][idx] = task["query_response"][idx]["scores"]
+                if time.time() - last_save > 10:
+                    dump(exist_records, self.tmp_output_file)
+                    last_save = time.time()
+        dump(exist_records, self.tmp_output_file)
+
     def evaluate(self):
         """
         The main entry point to evaluate all tasks in self.data based on the HF dataset’s metric info.
+        Rule-based fields are evaluated in `nproc` processes (one task per job), LLM judge fields are then
+        sent concurrently by at most `judge_nproc` threads.
         """
         if os.path.exists(self.tmp_output_file):
             exist_records = load(self.tmp_output_file)
         else:
             exist_records = {}
+
+        tasks = [task for task in self.data if task.get("query_response")]
+        args = []
+        for task in tasks:
+            task_name = task.get("task_name", "")
+            exist_records.setdefault(task_name, {})
+            # If no scoring config is found for the given task_name, skip
+            score_config = self.scoring_functions.get(task_name, DEFAULT_SCORE_CONFIG)
+            args.append((task, score_config, self._task_contexts(task_name), exist_records[task_name]))
+
+        # 1) Parse the responses and evaluate the rule-based fields
+        if self.nproc > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(self.nproc, len(tasks))) as executor:
+                results = list(executor.map(_score_task_worker, args))
+        else:
+            results = [_score_task_worker(x) for x in args]
+        scored = [task for task, _ in results]
+        pending = [task_pending for _, task_pending in results]
+        # Tasks are evaluated in copies when using processes, put the results back in place
+        data_pos = {id(task): i for i, task in enumerate(self.data)}
+        for task, task_scored in zip(tasks, scored):
+            self.data[data_pos[id(task)]] = task_scored
+        tasks = scored
+
+        for task, task_pending in zip(tasks, pending):
+            pending_idx = set(x[0] for x in task_pending)
+            for idx, query in enumerate(task["query_response"]):
+                if idx not in pending_idx:
+                    exist_records[task["task_name"]][idx] = query["scores"]
+        dump(exist_records, self.tmp_output_file)
+
+        # 2) Evaluate the LLM judge fields
+        self._judge_fields(tasks, pending, exist_records)
+
+        # 3) Aggregate the query-level and task-level scores
         num_tasks = 0
         num_queries = 0
         total_query_score = 0.0
         total_task_score = 0.0
-
-        # Evaluate each task
-        for task in self.data:
+        for task in tasks:
             task_name = task.get("task_name", "")
-            if task_name not in exist_records:
-                exist_records[task_name] = {}
-
-            # If no scoring config is found for the given task_name, skip
-            score_config = self.scoring_functions.get(
-                task_name,
-                {
-                    "field_score_function": {},
-                    "aggregation": {"function": None, "field_weights": {}},
-                    "response_parse_function": None,
-                },
-            )
-            if not task.get("query_response"):
-                # No queries to score
-                continue
-
+            score_config = self.scoring_functions.get(task_name, DEFAULT_SCORE_CONFIG)
             num_tasks += 1
             task_score_sum = 0.0
             # Prepare the aggregator
             aggregator = AggregationType.from_string(score_config["aggregation"]["function"])
             field_weights = score_config["aggregation"]["field_weights"]
-
-            # Parse the metric definitions
-            field_score_functions = score_config.get("field_score_function", {})
-            global_aux_metrics = score_config.get("global_aux_metrics", {})
-            parser_type_str = score_config.get("response_parse_function", "dummy")
-            parser = ResponseParseType.from_string(parser_type_str)
-
-            # Extract the fields from the first correct_answer (assuming uniform)
-            first_correct = task["query_response"][0]["correct_answer"]
-            all_fields = list(first_correct.keys())
-            # Usually, we only treat “##something” fields as metadata, so skip them:
-            answer_fields = [f for f in all_fields if not f.startswith("##")]
-
-            # For each query in the task
-            for idx, query in enumerate(task["query_response"]):
+            for query in task["query_response"]:
                 num_queries += 1
-                response_text = query.get("response", "")
-                correct_answer = query["correct_answer"]
-
-                # 1) Parse the response according to the specified parser
-                response_obj = self._parse_response(
-                    task_name,
-                    parser,
-                    response_text,
-                    correct_answer,
-                    answer_fields,
-                    query,
-                    task,
-                )
-
-                if idx in exist_records[task_name]:
-                    query["scores"] = exist_records[task_name][idx]
-                else:
-                    # Initialize scores for this query
-                    query["scores"] = {"field": {}, "info": {}}
-
-                    # 2) Evaluate each field
-                    for fld, fld_metric_name in field_score_functions.items():
-                        metric = self._build_metric(fld_metric_name, score_config)
-                        self._evaluate_field(
-                            task_name,
-                            metric,
-                            fld,
-                            response_obj,
-                            correct_answer,
-                            query
-                        )
-
-                    # Evaluate global auxiliary metrics (if any)
-                    for fld, fld_metric_name in global_aux_metrics.items():
-                        metric = self._build_metric(fld_metric_name, score_config)
-                        # Some tasks want the entire response object to do an additional check
-                        # So, pass original `response_obj` under `fld` key:
-                        tmp_obj = {fld: response_obj}
-                        self._evaluate_field(
-                            task_name,
-                            metric,
-                            fld,
-                            tmp_obj,
-                            correct_answer,
-                            query,
-                            is_aux=True,
-                        )
-
-                    exist_records[task_name][idx] = query["scores"]
-                    if idx % 10 == 0 or idx == len(task["query_response"]) - 1:
-                        dump(exist_records, self.tmp_output_file)
-
-                # 3) Aggregate the query-level score
                 query["scores"]["query"] = aggregator.aggregate(
                     query["scores"]["field"],
                     field_weights,
                 )
-
                 if query["scores"]["query"] >= 0:
                     task_score_sum += query["scores"]["query"]
 
             # Calculate overall task score
-            if task["query_response"]:
-                mean_score = task_score_sum / len(task["query_response"])
-            else:
-                mean_score = 0.0
+            mean_score = task_score_sum / len(task["query_response"])
             task["task_score"] = task_score_sum
             task["mean_task_score"] = mean_score
             task["eval_type"] = self._determine_eval_style(task)
@@ -228,8 +328,8 @@ class MEGABenchEvaluator:
         self._save_results(self.output_file, output_data)
         print(f"Evaluation complete! Results saved to {self.output_file}")
 
+    @staticmethod
     def _evaluate_field(
-        self,
         task_name: str,
         metric: Any,
         field: str,
@@ -237,9 +337,9 @@ class MEGABenchEvaluator:
         correct_answer: Dict[str, Any],
         query: Dict[str, Any],
         is_aux: bool = False,
+        eval_context: Dict[str, Any] = None,
     ) -> float:
         """Compute score for a single field using the given metric."""
-        eval_context = self._get_eval_context(task_name, query)
 
         if metric == MetricType.UNSUPPORTED:
             print(f"The metric for {field} in task {task_name} is not supported")
@@ -279,8 +379,8 @@ class MEGABenchEvaluator:
             predicted_val = response_obj.get(field, "")
             query["scores"]["field"][field] = metric.match(predicted_val, correct_val)
 
+    @staticmethod
     def _parse_response(
-        self,
         task_name: str,
         parser,
         response_text: str,
@@ -332,7 +432,8 @@ class MEGABenchEvaluator:
             )
         return response_obj
 
-    def _build_metric(self, metric_name: str, score_config: Dict[str, Any]):
+    @staticmethod
+    def _build_metric(metric_name: str, score_config: Dict[str, Any]):
         """
         Given a string for the metric (e.g. 'gpt_4o_as_judge'),
         return the actual MetricType or a specialized metric class.
@@ -1,6 +1,15 @@
 import io
+import os
+import math
+import atexit
+import select
+import signal
 import pathlib
 import json
+import queue
+import threading
+import time
+import warnings
 import multiprocessing
 from unittest.mock import patch
 from multiprocessing.queues import Empty
@@ -43,24 +52,251 @@ class ProgramJudge:
         test_cases = eval_context["test_case"]
 
         # Create a CodeTester instance with the response and the found test cases
-        tester = CodeTester(response, test_cases)
+        tester = CodeTester(response, test_cases, pool=sandbox_pool())
         score, results = tester.run_tests()
 
         # ProgramJudge.save_test_results(task_name, results, query_results_file)
         return score
 
+    @staticmethod
+    def match_batch(responses, eval_contexts):
+        """Score many responses, the test cases of all responses run concurrently in the sandbox pool."""
+        pool = sandbox_pool()
+        testers = [
+            CodeTester(response, eval_context["test_case"], pool=pool)
+            for response, eval_context in zip(responses, eval_contexts)
+        ]
+        if pool is None:
+            return [tester.run_tests()[0] for tester in testers]
+        jobs = [job for tester in testers for job in tester.jobs()]
+        outputs = pool.run_many(jobs)
+        scores = []
+        for tester in testers:
+            num = len(tester.test_cases)
+            scores.append(tester.score_outputs(outputs[:num])[0])
+            outputs = outputs[num:]
+        return scores
+
 
 #########################################################
 ### Implementation of the automatic code tester
 #########################################################
 
 
+def _execute_user_code(user_code, input_str):
+    contains_main_block = 'if __name__ == "__main__":' in user_code
+    stdout = io.StringIO()
+    try:
+        with patch("builtins.input", side_effect=input_str.splitlines()):
+            with patch("sys.stdout", new=stdout):
+                if contains_main_block:
+                    # If the user code contains the main block, execute in the context of __name__ == "__main__"
+                    exec(user_code, {"__name__": "__main__"})
+                else:
+                    # Otherwise, just execute the user code directly
+                    exec(user_code)
+    except Exception as e:
+        return f"ERROR during execution: {e}"
+    return stdout.getvalue().rstrip()
+
+
+RESULT_MARKER = b"R"
+# Checked once per pool: a test case allocating a few hundred MB must pass under the memory limit
+MEMORY_PROBE_MB = 256
+
+
+def _address_space():
+    # Current virtual memory size (bytes) of this process, 0 if unknown
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _limit_memory(memory_mb):
+    """Allow `memory_mb` of new allocations. The child inherits the address space of the worker (the evaluator it
+    was forked from, several GB after `import vlmeval`), so the budget is added on top of the current size."""
+    import resource
+    limit = _address_space() + memory_mb * 2**20
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _run_in_child(user_code, input_str, timeout, memory_mb):
+    """Run one test case in a child forked from the sandbox worker, with CPU / memory / wall time limits."""
+    import resource
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(rfd)
+            cpu = math.ceil(timeout) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+            if memory_mb:
+                _limit_memory(memory_mb)
+            result = _execute_user_code(user_code, input_str)
+            with os.fdopen(wfd, "wb") as f:
+                # The status byte tells an empty output apart from a child killed before reporting
+                f.write(RESULT_MARKER + result.encode("utf-8", errors="replace"))
+        finally:
+            # Never return into the worker loop, whatever the user code did (including sys.exit)
+            os._exit(0)
+
+    os.close(wfd)
+    chunks, timed_out = [], False
+    deadline = time.monotonic() + timeout
+    with os.fdopen(rfd, "rb") as f:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([f], [], [], remaining)[0]:
+                timed_out = True
+                break
+            chunk = os.read(f.fileno(), 2**16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    if timed_out:
+        return "ERROR: Code execution exceeded the time limit."
+    output = b"".join(chunks)
+    if not output.startswith(RESULT_MARKER):
+        # Killed by the CPU / memory limit, or exited without reporting
+        return "ERROR: No output was produced before timeout."
+    return output[len(RESULT_MARKER):].decode("utf-8", errors="replace")
+
+
+def _sandbox_worker_loop(conn, memory_mb):
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send(_run_in_child(*job, memory_mb=memory_mb))
+
+
+class SandboxWorker:
+    """A persistent worker process, every test case runs in a child forked from it."""
+
+    def __init__(self, memory_mb=None):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_sandbox_worker_loop, args=(child_conn, memory_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def run(self, user_code, input_str, timeout):
+        self.conn.send((user_code, input_str, timeout))
+        # The time limit is enforced by the worker, the margin covers forking and reporting
+        if not self.conn.poll(timeout + 5):
+            raise TimeoutError("Sandbox worker does not respond")
+        return self.conn.recv()
+
+    def close(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    A pool of persistent sandbox workers running test cases concurrently.
+    Each test case runs in a fresh child of a worker (cheap fork of a small process) with
+    RLIMIT_CPU / RLIMIT_AS limits and captured stdout. A worker that crashes or stops responding is replaced.
+    """
+
+    def __init__(self, num_workers=None, memory_mb=None):
+        self.num_workers = num_workers or min(8, os.cpu_count() or 1)
+        self.memory_mb = memory_mb
+        self.workers = [SandboxWorker(memory_mb) for _ in range(self.num_workers)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def run(self, user_code, input_str, timeout):
+        worker = self.idle.get()
+        try:
+            return worker.run(user_code, input_str, timeout)
+        except (EOFError, OSError, TimeoutError):
+            worker.close()
+            self.workers.remove(worker)
+            worker = SandboxWorker(self.memory_mb)
+            self.workers.append(worker)
+            return "ERROR: No output was produced before timeout."
+        finally:
+            self.idle.put(worker)
+
+    def run_many(self, jobs):
+        # jobs: list of (user_code, input_str, timeout), returns the outputs in order
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            return list(executor.map(lambda job: self.run(*job), jobs))
+
+    def memory_ok(self):
+        # The sandbox must not fail test cases the unsandboxed tester passes, e.g. allocating a few hundred MB
+        size = MEMORY_PROBE_MB * 2**20
+        return self.run(f"print(len(bytearray({size})))", "\n", 10) == str(size)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+
+_SANDBOX_POOL = {}
+_SANDBOX_LOCK = threading.Lock()
+
+
+def sandbox_pool():
+    """
+    The sandbox pool of the current process, created on first use. The size and memory limit (in MB) can be set
+    via `MEGABENCH_SANDBOX_WORKERS` and `MEGABENCH_SANDBOX_MEMORY`. Returns None when sandboxing is not available
+    (no fork / resource, or inside a daemonic process), then test cases run in one new process each.
+    """
+    if not hasattr(os, "fork") or multiprocessing.current_process().daemon:
+        return None
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        return None
+    pid = os.getpid()
+    with _SANDBOX_LOCK:
+        # Pools are not shared with forked processes
+        if pid not in _SANDBOX_POOL:
+            num_workers = int(os.environ.get("MEGABENCH_SANDBOX_WORKERS", 0)) or None
+            pool = SandboxPool(
+                num_workers=num_workers,
+                memory_mb=int(os.environ.get("MEGABENCH_SANDBOX_MEMORY", 2048)),
+            )
+            if pool.memory_mb and not pool.memory_ok():
+                warnings.warn(
+                    f"The sandbox memory limit ({pool.memory_mb} MB) rejects a {MEMORY_PROBE_MB} MB allocation, "
+                    "test cases run without memory limit."
+                )
+                pool.close()
+                pool = SandboxPool(num_workers=num_workers)
+            _SANDBOX_POOL[pid] = pool
+            atexit.register(_SANDBOX_POOL[pid].close)
+        return _SANDBOX_POOL[pid]
+
+
 class CodeTester:
-    def __init__(self, user_code, test_cases, timeout=2, verbose=True):
+    def __init__(self, user_code, test_cases, timeout=2, verbose=True, pool=None):
         self.user_code = user_code
         self.test_cases = test_cases
+        if isinstance(self.test_cases, dict):
+            self.test_cases = [self.test_cases]
         self.timeout = timeout
         self.verbose = verbose
+        self.pool = pool
 
     def run_user_code(self, input_data):
         input_str = "\n".join(input_data) + "\n"
@@ -86,37 +322,33 @@ class CodeTester:
         return result
 
     def target(self, output_queue, input_str):
-        contains_main_block = 'if __name__ == "__main__":' in self.user_code
-        stdout = io.StringIO()
-        try:
-            with patch("builtins.input", side_effect=input_str.splitlines()):
-                with patch("sys.stdout", new=stdout):
-                    if contains_main_block:
-                        # If the user code contains the main block, execute in the context of __name__ == "__main__"
-                        exec(self.user_code, {"__name__": "__main__"})
-                    else:
-                        # Otherwise, just execute the user code directly
-                        exec(self.user_code)
-        except Exception as e:
-            output_queue.put(f"ERROR during execution: {e}")
-        else:
-            output_queue.put(stdout.getvalue().rstrip())
+        output_queue.put(_execute_user_code(self.user_code, input_str))
 
     def evaluate_test_case(self, input_data, expected_output):
         output = self.run_user_code(input_data)
         return output == expected_output.rstrip(), output
 
+    def jobs(self):
+        # The sandbox pool jobs of all test cases
+        return [
+            (self.user_code, "\n".join(test_case["input"]) + "\n", self.timeout)
+            for test_case in self.test_cases
+        ]
+
     def run_tests(self):
-        if isinstance(self.test_cases, dict):
-            self.test_cases = [self.test_cases]
+        if self.pool is not None:
+            outputs = self.pool.run_many(self.jobs())
+        else:
+            outputs = [self.run_user_code(test_case["input"]) for test_case in self.test_cases]
+        return self.score_outputs(outputs)
+
+    def score_outputs(self, outputs):
         total_tests = len(self.test_cases)
         passed_tests = 0
         results = []
 
-        for i, test_case in enumerate(self.test_cases, 1):
-            result, output = self.evaluate_test_case(
-                test_case["input"], test_case["expected"]
-            )
+        for i, (test_case, output) in enumerate(zip(self.test_cases, outputs), 1):
+            result = output == test_case["expected"].rstrip()
 
             test_result = {
                 "response": self.user_code,
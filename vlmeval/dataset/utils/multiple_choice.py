@@ -310,22 +310,24 @@ def prefetch_answer(item):
     return can_infer(item['prediction'], choices)
 
 
-def extract_answer_from_item(model, item, dataset_name=None):
-    logger = get_logger('Evaluation')
-    # It will return: (pred, raw, llm_time)
-    choices = build_choices(item)
-    option_str = build_option_str(choices)
-
+def build_judge_prompt(item, dataset_name=None):
+    option_str = build_option_str(build_choices(item))
     if dataset_name == 'BLINK':
-        prompt = build_prompt_blink(item['question'], option_str, item['prediction'])
+        return build_prompt_blink(item['question'], option_str, item['prediction'])
     elif dataset_name == 'WeMath':
-        prompt = build_prompt_wemath(item['question'], option_str, item['prediction'])
+        return build_prompt_wemath(item['question'], option_str, item['prediction'])
     elif cn_string(item['question']):
-        prompt = build_prompt_cn(item['question'], option_str, item['prediction'])
+        return build_prompt_cn(item['question'], option_str, item['prediction'])
     elif dataset_name is not None and 'LEGO' in dataset_name:
-        prompt = build_prompt_LEGO(item['question'], option_str, item['prediction'],item['question_type'])
-    else:
-        prompt = build_prompt(item['question'], option_str, item['prediction'])
+        return build_prompt_LEGO(item['question'], option_str, item['prediction'],item['question_type'])
+    return build_prompt(item['question'], option_str, item['prediction'])
+
+
+def extract_answer_from_item(model, item, dataset_name=None):
+    logger = get_logger('Evaluation')
+    # It will return: (pred, raw, llm_time)
+    choices = build_choices(item)
+    prompt = build_judge_prompt(item, dataset_name=dataset_name)
     retry = 3
 
     if dataset_name is not None and 'LEGO' in dataset_name:
@@ -349,6 +351,9 @@ def extract_answer_from_item(model, item, dataset_name=None):
             if ret:
                 return dict(opt=ret, log=ans)
             else:
+                # Do not reuse the unparsable answer for the retries if the judge deduplicates requests
+                if hasattr(model, 'invalidate'):
+                    model.invalidate(prompt)
                 logger.warning(
                     f'Failed to in infer: prediction is {ans}, choice labels are {set(choices)}'
                     f', Answer is {item["answer"]}' if "answer" in item else ""
@@ -392,6 +397,69 @@ def eval_vanilla(model, item, dataset_name=None):
         return dict(hit=0, log=f'Match Log: {match_log}. ')
 
 
+def build_packed_prompt(items):
+    tmpl = (
+        'You are an AI assistant who will help me to match answers with the options of single-choice questions. '
+        'For each numbered item below, you are provided with a question, several options, and an answer, '
+        'and you need to find which option is most similar to the answer. '
+        'If the meaning of all options are significantly different from the answer, use Z. '
+        'Output a JSON object that maps each item number to a single uppercase character, '
+        'e.g. {{"1": "A", "2": "Z"}}, and nothing else. \n\n{}'
+    )
+    blocks = []
+    for i, item in enumerate(items):
+        option_str = build_option_str(build_choices(item))
+        blocks.append(
+            f'Item {i + 1}:\nQuestion: {item["question"]}\nOptions: {option_str}\nAnswer: {item["prediction"]}\n')
+    return tmpl.format('\n'.join(blocks))
+
+
+def judge_pack(model, items):
+    # Returns the option of each item, None if the judge did not give a valid option for it
+    ans = model.generate(build_packed_prompt(items))
+    opts = [None] * len(items)
+    match = re.search(r'\{.*\}', ans, re.DOTALL)
+    if match is None:
+        return opts
+    try:
+        parsed = json.loads(match.group(0))
+    except Exception:
+        return opts
+    for i, item in enumerate(items):
+        opt = str(parsed.get(str(i + 1), '')).strip().upper()
+        if opt in build_choices(item) or opt == 'Z':
+            opts[i] = opt
+    return opts
+
+
+def eval_vanilla_packed(model, items, dataset_name=None, pack_size=8, nproc=4):
+    """Resolve the items that can not be prefetched with packed judge calls (`pack_size` items per call).
+
+    Items with identical (question, options, prediction) are judged once. Returns {index: dict(hit, log)} for the
+    items the judge answered validly, the others are left to the per-item path (`eval_vanilla`).
+    """
+    if model is None or (dataset_name is not None and listinstr(['BLINK', 'WeMath', 'LEGO'], dataset_name)):
+        return {}
+    groups = defaultdict(list)
+    for item in items:
+        if not prefetch_answer(item) and not cn_string(item['question']):
+            groups[build_judge_prompt(item, dataset_name)].append(item)
+    todo = [v[0] for v in groups.values()]
+    packs = [todo[i: i + pack_size] for i in range(0, len(todo), pack_size)]
+    if len(packs) == 0:
+        return {}
+    res = track_progress_rich(judge_pack, [dict(model=model, items=p) for p in packs], nproc=nproc)
+
+    results = {}
+    for pack, opts in zip(packs, res):
+        for item, opt in zip(pack, opts):
+            if opt is None:
+                continue
+            for x in groups[build_judge_prompt(item, dataset_name)]:
+                results[x['index']] = dict(hit=int(opt == x['GT']), log=f'Match Log: {opt} (packed judge). ')
+    return results
+
+
 # For Circular Evaluation
 def eval_circular_group(model, sub_data, dataset_name=None):
     prefetched = prefetch_circular_group(sub_data, verbose=True)
@@ -427,7 +495,7 @@ def eval_circular_group(model, sub_data, dataset_name=None):
 
 
 # data, meta are pd.DataFrame, result_file is a path
-def mcq_vanilla_eval(model, data, meta, nproc, result_file, dataset_name=None):
+def mcq_vanilla_eval(model, data, meta, nproc, result_file, dataset_name=None, pack_size=1):
     result = {}
     if osp.exists(result_file):
         result = load(result_file)
@@ -439,13 +507,11 @@ def mcq_vanilla_eval(model, data, meta, nproc, result_file, dataset_name=None):
 
     data = data[data['index'].isin(answer_map)]
     data['GT'] = [answer_map[idx] for idx in data['index']]
-    items = []
-
-    for i in range(len(data)):
-        # Dealing with the normal part
-        item = data.iloc[i]
-        if item['index'] not in result:
-            items.append(item)
+    items = [item for item in DataRecords(data) if item['index'] not in result]
+    if pack_size > 1 and len(items):
+        result.update(eval_vanilla_packed(model, items, dataset_name, pack_size=pack_size, nproc=nproc))
+        dump(result, result_file)
+        items = [item for item in items if item['index'] not in result]
 
     tups = [dict(model=model, item=x, dataset_name=dataset_name) for x in items]
     keys = [x['index'] for x in items]
@@ -462,6 +528,137 @@ def mcq_vanilla_eval(model, data, meta, nproc, result_file, dataset_name=None):
     return data
 
 
+def iter_eval_chunks(eval_file, chunk_size=10000):
+    # Yield the prediction file as DataFrames of at most `chunk_size` rows, without loading the whole file
+    suffix = eval_file.split('.')[-1]
+    if suffix == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(eval_file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif suffix in ['tsv', 'csv']:
+        yield from pd.read_csv(eval_file, sep='\t' if suffix == 'tsv' else ',', chunksize=chunk_size)
+    elif suffix == 'xlsx':
+        from openpyxl import load_workbook
+        wb = load_workbook(eval_file, read_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows)
+        buf = []
+        for row in rows:
+            buf.append(row)
+            if len(buf) == chunk_size:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if len(buf):
+            yield pd.DataFrame(buf, columns=header)
+        wb.close()
+    else:
+        raise NotImplementedError(f'Chunked evaluation does not support {suffix} files')
+
+
+class MCQAccAccumulator:
+    """Mergeable hit counter, `report()` gives the same table as `report_acc` without keeping the records."""
+
+    GROUPS = ['l2-category', 'category']
+
+    def __init__(self):
+        # (split) -> [hit, total]; group -> (ability, split) -> [hit, total]
+        self.overall = {}
+        self.groups = {}
+
+    def update(self, df):
+        splits = list(df['split']) if 'split' in df else ['none'] * len(df)
+        hits = list(df['hit'])
+        for sp, hit in zip(splits, hits):
+            cnt = self.overall.setdefault(sp, [0, 0])
+            cnt[0] += hit
+            cnt[1] += 1
+        for group in self.GROUPS:
+            if group not in df:
+                continue
+            stat = self.groups.setdefault(group, {})
+            for ab, sp, hit in zip(df[group], splits, hits):
+                cnt = stat.setdefault((ab, sp), [0, 0])
+                cnt[0] += hit
+                cnt[1] += 1
+        return self
+
+    def merge(self, other):
+        for sp, (hit, tot) in other.overall.items():
+            cnt = self.overall.setdefault(sp, [0, 0])
+            cnt[0] += hit
+            cnt[1] += tot
+        for group, stat in other.groups.items():
+            mine = self.groups.setdefault(group, {})
+            for k, (hit, tot) in stat.items():
+                cnt = mine.setdefault(k, [0, 0])
+                cnt[0] += hit
+                cnt[1] += tot
+        return self
+
+    def report(self):
+        def mean(cnt):
+            return cnt[0] / cnt[1] if cnt is not None and cnt[1] else np.nan
+
+        res = defaultdict(list)
+        splits = sorted(self.overall, key=str)
+        res['split'] = splits
+        res['Overall'] = [mean(self.overall[sp]) for sp in splits]
+        for group in self.GROUPS:
+            if group not in self.groups:
+                continue
+            stat = self.groups[group]
+            abilities = sorted(set(ab for ab, _ in stat), key=str)
+            for ab in abilities:
+                ab_name = MMB_abbrs[ab] if ab in MMB_abbrs else ab
+                res[ab_name] = [mean(stat.get((ab, sp), None)) for sp in splits]
+        return pd.DataFrame(res)
+
+
+# Streaming version of `mcq_vanilla_eval`, the prediction file is processed chunk by chunk.
+# Judge results are cached per chunk, the evaluated records are appended to `record_file` (tsv).
+# Returns a MCQAccAccumulator, peak memory does not grow with the size of the prediction file.
+def mcq_vanilla_eval_chunked(model, eval_file, meta, nproc, result_file, record_file, dataset_name=None,
+                             chunk_size=10000, pack_size=1):
+    answer_map = {i: c for i, c in zip(meta['index'], meta['answer'])}
+    if 'MMMU' in dataset_name:
+        answer_map = {k: (v if v in list(string.ascii_uppercase) else 'A') for k, v in answer_map.items()}
+
+    acc = MCQAccAccumulator()
+    for i, data in enumerate(iter_eval_chunks(eval_file, chunk_size=chunk_size)):
+        data = data.rename(columns={k: k.lower() for k in data.keys() if k not in list(string.ascii_uppercase)})
+        data['prediction'] = [str(x) for x in data['prediction']]
+        if 'MMMU' in dataset_name:
+            data = MMMU_preproc(data)
+        data = data[data['index'].isin(answer_map)].copy()
+        data['GT'] = [answer_map[idx] for idx in data['index']]
+
+        chunk_result_file = result_file.replace('.pkl', f'_chunk{i}.pkl')
+        result = load(chunk_result_file) if osp.exists(chunk_result_file) else {}
+        items = [x for x in data.to_dict('records') if x['index'] not in result]
+        if pack_size > 1 and len(items):
+            result.update(eval_vanilla_packed(model, items, dataset_name, pack_size=pack_size, nproc=nproc))
+            dump(result, chunk_result_file)
+            items = [x for x in items if x['index'] not in result]
+        tups = [dict(model=model, item=x, dataset_name=dataset_name) for x in items]
+        keys = [x['index'] for x in items]
+        if len(tups):
+            res = track_progress_rich(
+                eval_vanilla, tups, nproc=nproc, chunksize=nproc, save=chunk_result_file, keys=keys)
+            result = load(chunk_result_file)
+            for k, v in zip(keys, res):
+                if k not in result:
+                    result[k] = v
+
+        data['hit'] = [result[idx]['hit'] for idx in data['index']]
+        data['log'] = [result[idx]['log'] for idx in data['index']]
+        data.pop('GT')
+        data.to_csv(
+            record_file, sep='\t', index=False, encoding='utf-8', quoting=csv.QUOTE_ALL,
+            mode='w' if i == 0 else 'a', header=i == 0)
+        acc.update(data)
+    return acc
+
+
 # data, meta are pd.DataFrame, result_file is a path
 def mcq_circular_eval(model, data, meta, nproc, result_file, dataset_name=None):
     result = {}
@@ -46,7 +46,7 @@ def process_results(score_file,model_name):
         confusion_matrix,
         roc_auc_score
     )
-    data = pd.read_excel(score_file)
+    data = load(score_file)
 
     # Create the prediction column based on the Score and Answer columns
     data['prediction'] = data.apply(
@@ -131,7 +131,7 @@ def aggregate_metrics_with_macro_average(score_file):
         roc_auc_score
     )
     # Load data
-    data = pd.read_excel(score_file)
+    data = load(score_file)
 
     # Create the prediction column based on the Score and Answer columns
     data['prediction'] = data.apply(
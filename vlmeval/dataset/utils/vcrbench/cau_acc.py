@@ -3,10 +3,12 @@ import os
 from collections import defaultdict
 import sys
 import pandas as pd
+from ....smp import load
 
 
 def xlsx2json(xlsx_file, json_file):
-    df = pd.read_excel(xlsx_file)
+    # The score tables keep the format of the prediction file (xlsx / tsv / parquet)
+    df = load(xlsx_file)
     df.to_json(json_file, orient='records')
 
 
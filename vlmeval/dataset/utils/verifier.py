@@ -109,6 +109,8 @@ QUESTION_QUALITY_PROMPT_EN_COT = (
 )
 
 import os
+import hashlib
+import sqlite3
 from abc import ABC, abstractmethod
 
 
@@ -124,11 +126,27 @@ class BaseVerifierModel(ABC):
 
 
 class Verifier:
-    """Main Verifier Class"""
+    """Main Verifier Class
 
-    def __init__(self, model_path, use_vllm=False, use_cot=False, **kwargs):
+    Verdicts are cached by content hash (in memory, and in the sqlite file `VERIFIER_CACHE` if set).
+    If `VERIFIER_SERVER` is set (e.g. http://127.0.0.1:8848), requests are sent to a long-lived verifier server
+    (`python -m vlmeval.dataset.utils.verifier`) instead of loading the model in this process.
+    """
+
+    def __init__(self, model_path=None, use_vllm=False, use_cot=False, **kwargs):
+        self.server = os.environ.get('VERIFIER_SERVER', None) or None
+        self.use_cot = use_cot
+        self.cache = {}
+        self.cache_file = os.environ.get('VERIFIER_CACHE', None) or None
+        if self.cache_file is not None:
+            with sqlite3.connect(self.cache_file, timeout=60) as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER)')
+        if self.server is not None:
+            self.model_path = model_path or os.environ.get('VERIFIER_PATH', None)
+            self.model = None
+            return
         if 'VERIFIER_PATH' in os.environ and os.environ['VERIFIER_PATH'] != '':
-            self.logger.info('Environment variable VERIFIER_PATH is set. Will use it as model_path. ')
+            print('Environment variable VERIFIER_PATH is set. Will use it as model_path. ')
             model_path = os.environ['VERIFIER_PATH']
         else:
             raise ValueError('VERIFIER_PATH is not set. Please set it in the .env file.')
@@ -139,7 +157,58 @@ class Verifier:
         return Verifier_Model(model_path=model_path, **kwargs)
 
     def evaluate(self, question, prediction, groundtruth):
-        return self.model.evaluate(question, prediction, groundtruth)
+        return self.evaluate_batch([question], [prediction], [groundtruth])[0]
+
+    def _key(self, question, prediction, groundtruth):
+        content = repr((self.model_path, self.use_cot, str(question), str(prediction), str(groundtruth)))
+        return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        found = {k: self.cache[k] for k in keys if k in self.cache}
+        missing = [k for k in keys if k not in found]
+        if self.cache_file is not None and len(missing):
+            with sqlite3.connect(self.cache_file, timeout=60) as conn:
+                for i in range(0, len(missing), 500):
+                    batch = missing[i: i + 500]
+                    rows = conn.execute(
+                        f'SELECT key, verdict FROM verdicts WHERE key IN ({",".join("?" * len(batch))})', batch)
+                    found.update({k: bool(v) for k, v in rows})
+        return found
+
+    def _store(self, verdicts):
+        self.cache.update(verdicts)
+        if self.cache_file is not None and len(verdicts):
+            with sqlite3.connect(self.cache_file, timeout=60) as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO verdicts VALUES (?, ?)', [(k, int(v)) for k, v in verdicts.items()])
+
+    def _evaluate_remote(self, questions, predictions, groundtruths):
+        import requests
+        items = [dict(question=str(q), prediction=str(p), groundtruth=str(g))
+                 for q, p, g in zip(questions, predictions, groundtruths)]
+        resp = requests.post(f'{self.server.rstrip("/")}/evaluate', json=dict(items=items), timeout=None)
+        resp.raise_for_status()
+        return resp.json()['verdicts']
+
+    def evaluate_batch(self, questions, predictions, groundtruths):
+        """Evaluate a list of (question, prediction, groundtruth), returns a list of bool verdicts.
+        Duplicated and previously seen items are only verified once."""
+        keys = [self._key(q, p, g) for q, p, g in zip(questions, predictions, groundtruths)]
+        found = self._lookup(list(set(keys)))
+        todo = {}
+        for k, q, p, g in zip(keys, questions, predictions, groundtruths):
+            if k not in found and k not in todo:
+                todo[k] = (q, p, g)
+        if len(todo):
+            qs, ps, gs = [list(x) for x in zip(*todo.values())]
+            if self.server is not None:
+                verdicts = self._evaluate_remote(qs, ps, gs)
+            else:
+                verdicts = self.model.evaluate_batch(qs, ps, gs)
+            new = {k: bool(v) for k, v in zip(todo, verdicts)}
+            self._store(new)
+            found.update(new)
+        return [found[k] for k in keys]
 
     @staticmethod
     def clear_model_cache():
@@ -255,15 +324,25 @@ class Verifier_Model(BaseVerifierModel):
             }
             print(f"Cached transformers model: {cache_key}")
 
+    def build_prompt(self, question, prediction, groundtruth):
+        tmpl = QUESTION_QUALITY_PROMPT_EN_COT if self.use_cot else QUESTION_QUALITY_PROMPT_EN_NO_COT
+        prompt = tmpl.format(question=question, gold_answer=groundtruth, llm_response=prediction)
+        messages = [{"role": "user", "content": prompt}]
+        return self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True,
+            enable_thinking=True,  # Switches between thinking and non-thinking modes. Default is True.
+        )
+
+    def _is_correct(self, generated_text):
+        response = self._process_judgment(generated_text).strip().upper()
+        return "CORRECT" in response or "A" in response
+
     def evaluate_vllm(self, question, prediction, groundtruth):
-        if self.use_cot:
-            prompt = QUESTION_QUALITY_PROMPT_EN_COT.format(
-                question=question, gold_answer=groundtruth, llm_response=prediction
-            )
-        else:
-            prompt = QUESTION_QUALITY_PROMPT_EN_NO_COT.format(
-                question=question, gold_answer=groundtruth, llm_response=prediction
-            )
+        return self.evaluate_batch_vllm([question], [prediction], [groundtruth])[0]
+
+    def evaluate_batch_vllm(self, questions, predictions, groundtruths):
         from vllm import SamplingParams
 
         sampling_params = SamplingParams(
@@ -271,21 +350,10 @@ class Verifier_Model(BaseVerifierModel):
             detokenize=True,
             max_tokens=4096,
         )
-        messages = [{"role": "user", "content": prompt}]
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True,
-            enable_thinking=True,  # Switches between thinking and non-thinking modes. Default is True.
-        )
-        outputs = self.model.generate([text], sampling_params=sampling_params)
-        for output in outputs:
-            generated_text = output.outputs[0].text
-        response = self._process_judgment(generated_text)
-        if "CORRECT" in response or "A" in response:
-            return True
-        else:
-            return False
+        texts = [self.build_prompt(q, p, g) for q, p, g in zip(questions, predictions, groundtruths)]
+        # vLLM schedules the whole list with continuous batching, outputs keep the input order
+        outputs = self.model.generate(texts, sampling_params=sampling_params)
+        return [self._is_correct(output.outputs[0].text) for output in outputs]
 
     def _process_judgment(self, judgment_str: str) -> str:
         import re
@@ -313,41 +381,87 @@ class Verifier_Model(BaseVerifierModel):
             return ""
 
     def evaluate_transformers(self, question, prediction, groundtruth):
-        # prepare the model input
-        if self.use_cot:
-            prompt = QUESTION_QUALITY_PROMPT_EN_COT.format(
-                question=question, gold_answer=groundtruth, llm_response=prediction
-            )
-        else:
-            prompt = QUESTION_QUALITY_PROMPT_EN_NO_COT.format(
-                question=question, gold_answer=groundtruth, llm_response=prediction
-            )
-        messages = [{"role": "user", "content": prompt}]
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True,
-            enable_thinking=True,  # Switches between thinking and non-thinking modes. Default is True.
-        )
-        model_inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
-
-        # conduct text completion
-        generated_ids = self.model.generate(**model_inputs, max_new_tokens=32768)
-        output_ids = generated_ids[0][len(model_inputs.input_ids[0]):].tolist()
-
-        # the result will begin with thinking content in <think></think> tags, followed by the actual response
-        response = self.tokenizer.decode(output_ids, skip_special_tokens=True)
-        response = self._process_judgment(response)
-
-        # Parse the response to determine if it's correct
-        response = response.strip().upper()
-        if "CORRECT" in response or "A" in response:
-            return True
-        else:
-            return False
+        return self.evaluate_batch_transformers([question], [prediction], [groundtruth], batch_size=1)[0]
+
+    def evaluate_batch_transformers(self, questions, predictions, groundtruths, batch_size=8):
+        texts = [self.build_prompt(q, p, g) for q, p, g in zip(questions, predictions, groundtruths)]
+        # Length bucketing: prompts of similar length are batched together to limit padding
+        lengths = [len(x) for x in self.tokenizer(texts).input_ids]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        padding_side = self.tokenizer.padding_side
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        verdicts = [None] * len(texts)
+        for st in range(0, len(order), batch_size):
+            batch = order[st: st + batch_size]
+            model_inputs = self.tokenizer(
+                [texts[i] for i in batch], return_tensors="pt", padding=True).to(self.model.device)
+            # conduct text completion
+            generated_ids = self.model.generate(**model_inputs, max_new_tokens=32768)
+            for i, ids in zip(batch, generated_ids):
+                output_ids = ids[model_inputs.input_ids.shape[1]:].tolist()
+                # the result will begin with thinking content in <think></think> tags, followed by the actual response
+                response = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+                verdicts[i] = self._is_correct(response)
+        self.tokenizer.padding_side = padding_side
+        return verdicts
 
     def evaluate(self, question, prediction, groundtruth):
         if self.use_vllm:
             return self.evaluate_vllm(question, prediction, groundtruth)
         else:
             return self.evaluate_transformers(question, prediction, groundtruth)
+
+    def evaluate_batch(self, questions, predictions, groundtruths, batch_size=8):
+        if self.use_vllm:
+            return self.evaluate_batch_vllm(questions, predictions, groundtruths)
+        else:
+            return self.evaluate_batch_transformers(questions, predictions, groundtruths, batch_size=batch_size)
+
+
+def serve(port=8848, host='127.0.0.1', use_vllm=True, use_cot=False):
+    """Serve one loaded verifier to several evaluation processes.
+    POST /evaluate {"items": [{"question", "prediction", "groundtruth"}, ...]} -> {"verdicts": [bool, ...]}"""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # The server always runs the model itself
+    os.environ.pop('VERIFIER_SERVER', None)
+    verifier = Verifier(use_vllm=use_vllm, use_cot=use_cot)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/evaluate':
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            items = body['items']
+            # Requests from different clients are run one batch at a time on the shared model
+            with lock:
+                verdicts = verifier.evaluate_batch(
+                    [x['question'] for x in items], [x['prediction'] for x in items],
+                    [x['groundtruth'] for x in items])
+            payload = json.dumps(dict(verdicts=verdicts)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    print(f'Verifier server listening on http://{host}:{port}')
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8848)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--use-transformers', action='store_true', help='use transformers instead of vLLM')
+    parser.add_argument('--use-cot', action='store_true')
+    args = parser.parse_args()
+    serve(port=args.port, host=args.host, use_vllm=not args.use_transformers, use_cot=args.use_cot)
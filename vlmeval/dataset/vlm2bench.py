@@ -2,6 +2,7 @@
 import os
 import pandas as pd
 from .image_base import ImageBaseDataset
+from ..smp import load, get_intermediate_file_path
 from .utils.vlm2bench import (
     common_process_results,
     tf_pair_aggregate_accuracy,
@@ -53,11 +54,18 @@ class VLM2Bench(ImageBaseDataset):
         msgs.append({"type": "text", "value": prompt})
         return msgs
 
+    @staticmethod
+    def _read_table(pth):
+        # TSV predictions may contain non utf-8 bytes, other formats (xlsx / parquet) are read with `load`
+        if pth.lower().endswith(".tsv"):
+            return pd.read_csv(pth, sep="\t", encoding="latin1", engine="python")
+        return load(pth)
+
     @classmethod
     def evaluate(cls, eval_file, **judge_kwargs):
         """
         Evaluation function:
-        - Automatically read the model prediction result file (xlsx or TSV), which contains fields: index, question, answer, category, prediction
+        - Automatically read the model prediction result file (xlsx, TSV or parquet), which contains fields: index, question, answer, category, prediction
         - Directly use the original fields for evaluation without additional conversion;
         - For categories "oc-cnt" or "pc-cnt", calculate image_seq_len based on the "image" field (stored as a regular multi-image encoding)
           and write it into each record;
@@ -70,24 +78,12 @@ class VLM2Bench(ImageBaseDataset):
         model = judge_kwargs.get("model")
         if model:
             suffix = eval_file.split('.')[-1]
-            storage = eval_file.replace(f'.{suffix}', f'_{model}.xlsx')
+            storage = get_intermediate_file_path(eval_file, f'_{model}')
             score_file = eval_file.replace(f'.{suffix}', f'_{model}_score.csv')
             tmp_file = eval_file.replace(f'.{suffix}', f'_{model}.pkl')
-            if os.path.exists(storage):
-                if storage.lower().endswith(".xlsx"):
-                    data = pd.read_excel(storage)
-                else:
-                    data = pd.read_csv(storage, sep="\t", encoding="latin1", engine="python")
-            else:
-                if eval_file.lower().endswith(".xlsx"):
-                    data = pd.read_excel(eval_file)
-                else:
-                    data = pd.read_csv(eval_file, sep="\t", encoding="latin1", engine="python")
+            data = cls._read_table(storage if os.path.exists(storage) else eval_file)
         else:
-            if eval_file.lower().endswith(".xlsx"):
-                data = pd.read_excel(eval_file)
-            else:
-                data = pd.read_csv(eval_file, sep="\t", encoding="latin1", engine="python")
+            data = cls._read_table(eval_file)
 
         results = data.to_dict(orient="records")
         processed = common_process_results(results)
@@ -1,7 +1,9 @@
 import torch
-import torch.distributed as dist
 from vlmeval.config import supported_VLM
-from vlmeval.utils import track_progress_rich
+from vlmeval.utils import track_progress_rich, PredictionJournal, publish_shard, collect_shards, remove_shards
+from vlmeval.utils import ProgressReporter, ready_marker, mark_ready, wait_ready
+from vlmeval.utils.prefix_order import prefix_order, use_prefix_order
+from vlmeval.utils.warm_pool import build_model
 from vlmeval.smp import *
 
 FAIL_MSG = 'Failed to obtain answer via API.'
@@ -31,11 +33,10 @@ def infer_data_api(model, work_dir, model_name, dataset, index_set=None, api_npr
     if hasattr(model, 'set_dump_image'):
         model.set_dump_image(dataset.dump_image)
 
-    lt, indices = len(data), list(data['index'])
+    indices = list(data['index'])
 
     structs = []
-    for i in range(lt):
-        item = data.iloc[i]
+    for item in DataRecords(data):
         if hasattr(model, 'use_custom_prompt') and model.use_custom_prompt(dataset_name):
             assert hasattr(model, 'build_prompt')
             struct = model.build_prompt(item, dataset=dataset_name)
@@ -66,6 +67,10 @@ def infer_data_api(model, work_dir, model_name, dataset, index_set=None, api_npr
     structs = [s for i, s in zip(indices, structs) if i not in res]
     indices = [i for i in indices if i not in res]
 
+    if use_prefix_order() and len(structs):
+        order = prefix_order(structs, log_name=f'{model_name}/{dataset_name}')
+        structs, indices = [structs[i] for i in order], [indices[i] for i in order]
+
     gen_func = model.generate
     structs = [dict(message=struct, dataset=dataset_name) for struct in structs]
 
@@ -79,12 +84,29 @@ def infer_data_api(model, work_dir, model_name, dataset, index_set=None, api_npr
     return res
 
 
+def group_by_image(data, dataset):
+    # Put circular variants (same `g_index`) and questions sharing an image next to each other, so that the
+    # image / preprocessing caches and the vLLM prefix & encoder caches are reused across them
+    if 'g_index' in data:
+        keys = [str(x) for x in data['g_index']]
+    elif len(getattr(dataset, 'image_src', {})):
+        keys = [dataset.image_src.get(str(x), str(x)) for x in data['index']]
+    else:
+        return data
+    first = {}
+    order = [first.setdefault(k, len(first)) for k in keys]
+    return data.iloc[np.argsort(order, kind='stable')]
+
+
 def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, api_nproc=4, use_vllm=False):
     dataset_name = dataset.dataset_name
     prev_file = f'{work_dir}/{model_name}_{dataset_name}_PREV.pkl'
     res = load(prev_file) if osp.exists(prev_file) else {}
     if osp.exists(out_file):
         res.update(load(out_file))
+    # Predictions of local models are appended to a journal, replay the ones since the last compaction
+    journal = PredictionJournal(out_file)
+    res.update(journal.replay())
 
     rank, world_size = get_rank_and_world_size()
     sheet_indices = list(range(rank, len(dataset), world_size))
@@ -93,18 +115,14 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
     data_indices = [i for i in data['index']]
 
     # If finished, will exit without building the model
-    all_finished = True
-    for i in range(lt):
-        idx = data.iloc[i]['index']
-        if idx not in res:
-            all_finished = False
+    all_finished = all(idx in res for idx in data_indices)
     if all_finished:
         res = {k: res[k] for k in data_indices}
-        dump(res, out_file)
+        journal.compact(res)
         return model
 
     # Data need to be inferred
-    data = data[~data['index'].isin(res)]
+    data = group_by_image(data[~data['index'].isin(res)], dataset)
     lt = len(data)
 
     kwargs = {}
@@ -120,7 +138,8 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
     # (In VLMEvalKit, we use torchrun to launch multiple model instances on a single node).
     # To bypass this problem, we unset `WORLD_SIZE` before building the model to not use TP parallel.
     ws_bak = os.environ.pop('WORLD_SIZE', None)
-    model = supported_VLM[model_name](**kwargs) if isinstance(model, str) else model
+    # A warm worker serving the model is used if one is running (see `vlmutil serve`)
+    model = build_model(model_name, **kwargs) if isinstance(model, str) else model
     if ws_bak:
         os.environ['WORLD_SIZE'] = ws_bak
 
@@ -138,20 +157,71 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             assert idx in supp
         res.update(supp)
         res = {k: res[k] for k in data_indices}
-        dump(res, out_file)
+        journal.compact(res)
         return model
     else:
         model.set_dump_image(dataset.dump_image)
 
+    def _build_struct(line):
+        if hasattr(model, 'use_custom_prompt') and model.use_custom_prompt(dataset_name):
+            return model.build_prompt(line, dataset=dataset_name)
+        return dataset.build_prompt(line)
+
+    records = DataRecords(data)
+    if hasattr(model, 'support_batch_generate') and model.support_batch_generate():
+        # Offline batching (e.g. vLLM): submit `batch_size` samples per call, checkpoint after each chunk
+        from concurrent.futures import ThreadPoolExecutor
+        batch_size = int(os.environ.get('VLMEVAL_BATCH_SIZE', 256))
+        pending = list(records)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            pending_structs = list(executor.map(_build_struct, pending))
+        if use_prefix_order():
+            order = prefix_order(pending_structs, log_name=f'{model_name}/{dataset_name}')
+            pending, pending_structs = [pending[i] for i in order], [pending_structs[i] for i in order]
+        pbar = tqdm(total=len(pending), desc=f'Infer {model_name}/{dataset_name}, Rank {rank}/{world_size}')
+        reporter = ProgressReporter(f'{model_name}/{dataset_name}', len(data_indices), len(data_indices) - lt)
+        for start in range(0, len(pending), batch_size):
+            lines = pending[start: start + batch_size]
+            structs = pending_structs[start: start + batch_size]
+            if os.environ.get('SKIP_ERR', False) == '1':
+                try:
+                    responses = model.generate_batch(structs, dataset=dataset_name)
+                except RuntimeError as err:
+                    torch.cuda.synchronize()
+                    warnings.warn(f'{type(err)} {str(err)}, retrying the chunk sample by sample')
+                    # One bad sample must not fail the whole chunk, only the samples failing alone are recorded
+                    responses = []
+                    for struct in structs:
+                        try:
+                            responses.extend(model.generate_batch([struct], dataset=dataset_name))
+                        except RuntimeError as err:
+                            torch.cuda.synchronize()
+                            warnings.warn(f'{type(err)} {str(err)}')
+                            responses.append(f'Failed to obtain answer: {type(err)} {str(err)}')
+            else:
+                responses = model.generate_batch(structs, dataset=dataset_name)
+            torch.cuda.empty_cache()
+            for line, response in zip(lines, responses):
+                if verbose:
+                    print(response, flush=True)
+                res[line['index']] = response
+                journal.append(line['index'], response)
+            pbar.update(len(lines))
+            reporter.update(len(lines), responses)
+        pbar.close()
+        reporter.close()
+        res = {k: res[k] for k in data_indices}
+        journal.compact(res)
+        return model
+
+    reporter = ProgressReporter(f'{model_name}/{dataset_name}', len(data_indices), len(data_indices) - lt)
     for i in tqdm(range(lt), desc=f'Infer {model_name}/{dataset_name}, Rank {rank}/{world_size}'):
-        idx = data.iloc[i]['index']
+        line = records[i]
+        idx = line['index']
         if idx in res:
             continue
 
-        if hasattr(model, 'use_custom_prompt') and model.use_custom_prompt(dataset_name):
-            struct = model.build_prompt(data.iloc[i], dataset=dataset_name)
-        else:
-            struct = dataset.build_prompt(data.iloc[i])
+        struct = _build_struct(line)
 
         # If `SKIP_ERR` flag is set, the model will skip the generation if error is encountered
         if os.environ.get('SKIP_ERR', False) == '1':
@@ -170,11 +240,12 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             print(response, flush=True)
 
         res[idx] = response
-        if (i + 1) % 10 == 0:
-            dump(res, out_file)
+        journal.append(idx, response)
+        reporter.update(1, [response])
 
+    reporter.close()
     res = {k: res[k] for k in data_indices}
-    dump(res, out_file)
+    journal.compact(res)
     return model
 
 
@@ -184,9 +255,10 @@ def infer_data_job(
 ):
     rank, world_size = get_rank_and_world_size()
     dataset_name = dataset.dataset_name
-    result_file = osp.join(work_dir, f'{model_name}_{dataset_name}.xlsx')
+    result_file = osp.join(work_dir, f'{model_name}_{dataset_name}.{get_pred_file_format()}')
 
     prev_file = f'{work_dir}/{model_name}_{dataset_name}_PREV.pkl'
+    prev_ready = ready_marker(prev_file)
     if osp.exists(result_file):
         if rank == 0:
             data = load(result_file)
@@ -194,8 +266,10 @@ def infer_data_job(
             if not ignore_failed:
                 results = {k: v for k, v in results.items() if FAIL_MSG not in str(v)}
             dump(results, prev_file)
-        if world_size > 1:
-            dist.barrier()
+            if world_size > 1:
+                mark_ready(prev_ready)
+        elif world_size > 1:
+            wait_ready(prev_ready)
 
     tmpl = osp.join(work_dir, '{}' + f'{world_size}_{dataset_name}.pkl')
     out_file = tmpl.format(rank)
@@ -203,24 +277,21 @@ def infer_data_job(
     model = infer_data(
         model=model, work_dir=work_dir, model_name=model_name, dataset=dataset,
         out_file=out_file, verbose=verbose, api_nproc=api_nproc, use_vllm=use_vllm)
-    if world_size > 1:
-        dist.barrier()
+    # No barrier: every rank publishes its shard and moves on, rank 0 merges the shards as they arrive
+    publish_shard(out_file)
 
     if rank == 0:
-        data_all = {}
-        for i in range(world_size):
-            data_all.update(load(tmpl.format(i)))
+        data_all = collect_shards(tmpl, world_size)
 
         data = dataset.data
-        for x in data['index']:
-            assert x in data_all
+        missing = set(data['index']) - set(data_all)
+        assert not len(missing), f'{len(missing)} samples are missing in the predictions of {dataset_name}'
         data['prediction'] = [str(data_all[x]) for x in data['index']]
         if 'image' in data:
             data.pop('image')
 
         dump(data, result_file)
-        for i in range(world_size):
-            os.remove(tmpl.format(i))
-    if world_size > 1:
-        dist.barrier()
+        remove_shards(tmpl, world_size)
+        if osp.exists(prev_ready):
+            os.remove(prev_ready)
     return model
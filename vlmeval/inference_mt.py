@@ -1,7 +1,9 @@
 import torch
 import torch.distributed as dist
 from vlmeval.config import supported_VLM
-from vlmeval.utils import track_progress_rich
+from vlmeval.utils import track_progress_rich, PredictionJournal, publish_shard, collect_shards, remove_shards
+from vlmeval.utils import ProgressReporter
+from vlmeval.utils.warm_pool import build_model
 from vlmeval.smp import *
 
 FAIL_MSG = 'Failed to obtain answer via API.'
@@ -79,6 +81,8 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
     res = {}
     if osp.exists(out_file):
         res.update(load(out_file))
+    journal = PredictionJournal(out_file)
+    res.update(journal.replay())
 
     rank, world_size = get_rank_and_world_size()
     sheet_indices = list(range(rank, len(dataset), world_size))
@@ -94,7 +98,7 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             all_finished = False
     if all_finished:
         res = {k: res[k] for k in data_indices}
-        dump(res, out_file)
+        journal.compact(res)
         return model
 
     # Data need to be inferred
@@ -114,7 +118,8 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
     # (In VLMEvalKit, we use torchrun to launch multiple model instances on a single node).
     # To bypass this problem, we unset `WORLD_SIZE` before building the model to not use TP parallel.
     ws_bak = os.environ.pop('WORLD_SIZE', None)
-    model = supported_VLM[model_name](**kwargs) if isinstance(model, str) else model
+    # A warm worker serving the model is used if one is running (see `vlmutil serve`)
+    model = build_model(model_name, **kwargs) if isinstance(model, str) else model
     if ws_bak:
         os.environ['WORLD_SIZE'] = ws_bak
     assert hasattr(model, 'chat_inner')
@@ -133,11 +138,12 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             assert idx in supp
         res.update(supp)
         res = {k: res[k] for k in data_indices}
-        dump(res, out_file)
+        journal.compact(res)
         return model
     else:
         model.set_dump_image(dataset.dump_image)
 
+    reporter = ProgressReporter(f'{model_name}/{dataset_name}', len(data_indices), len(data_indices) - lt)
     for i in tqdm(range(lt)):
         idx = data.iloc[i]['index']
         if idx in res:
@@ -155,11 +161,12 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             print(response, flush=True)
 
         res[idx] = response
-        if (i + 1) % 20 == 0:
-            dump(res, out_file)
+        journal.append(idx, response)
+        reporter.update(1)
 
+    reporter.close()
     res = {k: res[k] for k in data_indices}
-    dump(res, out_file)
+    journal.compact(res)
     return model
 
 
@@ -177,23 +184,19 @@ def infer_data_job_mt(
     model = infer_data(
         model=model, work_dir=work_dir, model_name=model_name, dataset=dataset,
         out_file=out_file, verbose=verbose, api_nproc=api_nproc, use_vllm=use_vllm)
-    if world_size > 1:
-        dist.barrier()
+    publish_shard(out_file)
 
     if rank == 0:
-        data_all = {}
-        for i in range(world_size):
-            data_all.update(load(tmpl.format(i)))
+        data_all = collect_shards(tmpl, world_size)
 
         data = dataset.data
-        for x in data['index']:
-            assert x in data_all
+        missing = set(data['index']) - set(data_all)
+        assert not len(missing), f'{len(missing)} samples are missing in the predictions of {dataset_name}'
 
         data['prediction'] = [data_all[x] for x in data['index']]
         if 'image' in data:
             data.pop('image')
 
         dump(data, result_file)
-        for i in range(world_size):
-            os.remove(tmpl.format(i))
+        remove_shards(tmpl, world_size)
     return model
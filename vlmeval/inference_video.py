@@ -1,7 +1,9 @@
 import torch
 import torch.distributed as dist
 from vlmeval.config import supported_VLM
-from vlmeval.utils import track_progress_rich
+from vlmeval.utils import track_progress_rich, PredictionJournal, publish_shard, collect_shards, remove_shards
+from vlmeval.utils import ProgressReporter
+from vlmeval.utils.warm_pool import build_model
 from vlmeval.smp import *
 
 FAIL_MSG = 'Failed to obtain answer via API.'
@@ -79,6 +81,8 @@ def infer_data_api(model, work_dir, model_name, dataset, samples_dict={}, api_np
 
 def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, api_nproc=4, use_vllm=False):
     res = load(out_file) if osp.exists(out_file) else {}
+    journal = PredictionJournal(out_file)
+    res.update(journal.replay())
     rank, world_size = get_rank_and_world_size()
     dataset_name = dataset.dataset_name
 
@@ -88,6 +92,7 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
 
     sample_indices_sub = sample_indices[rank::world_size]
     if np.all([idx in res for idx in sample_indices_sub]):
+        journal.compact(res)
         return model
     sample_indices_subrem = [x for x in sample_indices_sub if x not in res]
 
@@ -105,7 +110,8 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
     # (In VLMEvalKit, we use torchrun to launch multiple model instances on a single node).
     # To bypass this problem, we unset `WORLD_SIZE` before building the model to not use TP parallel.
     ws_bak = os.environ.pop('WORLD_SIZE', None)
-    model = supported_VLM[model_name](**kwargs) if isinstance(model, str) else model
+    # A warm worker serving the model is used if one is running (see `vlmutil serve`)
+    model = build_model(model_name, **kwargs) if isinstance(model, str) else model
     if ws_bak:
         os.environ['WORLD_SIZE'] = ws_bak
 
@@ -122,7 +128,7 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
         for k in sample_indices_subrem:
             assert k in supp
         res.update(supp)
-        dump(res, out_file)
+        journal.compact(res)
         return model
 
     assert not getattr(dataset, 'pack', False), 'Current model not supported pack mode!'
@@ -133,6 +139,8 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
         )
         setattr(model, 'VIDEO_LLM', False)
 
+    reporter = ProgressReporter(
+        f'{model_name}/{dataset_name}', len(sample_indices_sub), len(sample_indices_sub) - len(sample_indices_subrem))
     for i, idx in tqdm(enumerate(sample_indices_subrem)):
         if idx in res:
             continue
@@ -195,11 +203,12 @@ def infer_data(model, model_name, work_dir, dataset, out_file, verbose=False, ap
             print(response, flush=True)
 
         res[idx] = response
-        if (i + 1) % 20 == 0:
-            dump(res, out_file)
+        journal.append(idx, response)
+        reporter.update(1, [response])
 
+    reporter.close()
     res = {k: res[k] for k in sample_indices_sub}
-    dump(res, out_file)
+    journal.compact(res)
     return model
 
 
@@ -233,27 +242,23 @@ def infer_data_job_video(
         verbose=verbose,
         api_nproc=api_nproc,
         use_vllm=use_vllm)
-
-    if world_size > 1:
-        dist.barrier()
+    # No barrier: every rank publishes its shard and moves on, rank 0 merges the shards as they arrive
+    publish_shard(out_file)
 
     if rank == 0:
-        data_all = {}
-        for i in range(world_size):
-            data_all.update(load(tmpl.format(i)))
+        data_all = collect_shards(tmpl, world_size)
 
         meta = dataset.data
         if dataset_name == 'MMBench-Video' and getattr(dataset, 'pack', False):
             meta, vstats = dataset.load_pack_answers(data_all)
             print(f'Statitics of Pack Video Inference: {vstats}')
         else:
-            for x in meta['index']:
-                assert x in data_all
+            missing = set(meta['index']) - set(data_all)
+            assert not len(missing), f'{len(missing)} samples are missing in the predictions of {dataset_name}'
             meta['prediction'] = [str(data_all[x]) for x in meta['index']]
             if 'image' in meta:
                 meta.pop('image')
 
         dump(meta, result_file)
-        for i in range(world_size):
-            os.remove(tmpl.format(i))
+        remove_shards(tmpl, world_size)
     return model
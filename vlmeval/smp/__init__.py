@@ -2,6 +2,7 @@ from .file import *
 from .vlm import *
 from .misc import *
 from .log import *
+from .image_meta import *
 
 # 显式导出 mkdir 和 download_file
 import os
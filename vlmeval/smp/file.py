@@ -133,6 +133,44 @@ class NumpyEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+# Formats that can be used for prediction files (see `--result-format` in run.py)
+PRED_FORMATS = ['xlsx', 'tsv', 'parquet']
+PRED_FILE_SUFFIXES = tuple(f'.{x}' for x in PRED_FORMATS)
+
+
+def get_pred_file_format():
+    pred_format = os.environ.get('PRED_FORMAT', 'xlsx').lower()
+    assert pred_format in PRED_FORMATS, f'Unsupported PRED_FORMAT {pred_format}, should be one of {PRED_FORMATS}'
+    return pred_format
+
+
+def get_intermediate_file_path(eval_file, suffix, target_format=None):
+    # `target_format=None` keeps the format of `eval_file`, e.g. `X.parquet` -> `X{suffix}.parquet`
+    base, ext = osp.splitext(eval_file)
+    if target_format is None:
+        target_format = ext[1:]
+    return f'{base}{suffix}.{target_format}'
+
+
+def _parquet_safe(data):
+    # Parquet columns must be homogeneous, object columns with mixed or nested types are stringified (like in xlsx)
+    data = data.copy()
+    for col in data.columns:
+        if data[col].dtype != object:
+            continue
+        types = set(type(x) for x in data[col] if not pd.api.types.is_scalar(x) or not pd.isna(x))
+        if len(types) > 1 or any(not issubclass(t, (str, bytes, bool, int, float, np.generic)) for t in types):
+            data[col] = [x if pd.api.types.is_scalar(x) and pd.isna(x) else str(x) for x in data[col]]
+    return data
+
+
+def export_xlsx(f, tgt=None):
+    # Export a prediction file in any format to xlsx for manual inspection. Cells longer than 32767 chars are cut.
+    tgt = get_intermediate_file_path(f, '', 'xlsx') if tgt is None else tgt
+    dump(load(f), tgt)
+    return tgt
+
+
 # LOAD & DUMP
 def dump(data, f, **kwargs):
     def dump_pkl(data, pth, **kwargs):
@@ -142,6 +180,8 @@ def dump(data, f, **kwargs):
         json.dump(data, open(pth, 'w'), indent=4, ensure_ascii=False, cls=NumpyEncoder)
 
     def dump_jsonl(data, f, **kwargs):
+        if isinstance(data, pd.DataFrame):
+            data = data.to_dict('records')
         lines = [json.dumps(x, ensure_ascii=False, cls=NumpyEncoder) for x in data]
         with open(f, 'w', encoding='utf8') as fout:
             fout.write('\n'.join(lines))
@@ -149,13 +189,18 @@ def dump(data, f, **kwargs):
     def dump_xlsx(data, f, **kwargs):
         data.to_excel(f, index=False, engine='xlsxwriter')
 
+    def dump_parquet(data, f, **kwargs):
+        _parquet_safe(data).to_parquet(f, index=False)
+
     def dump_csv(data, f, quoting=csv.QUOTE_ALL):
         data.to_csv(f, index=False, encoding='utf-8', quoting=quoting)
 
     def dump_tsv(data, f, quoting=csv.QUOTE_ALL):
         data.to_csv(f, sep='\t', index=False, encoding='utf-8', quoting=quoting)
 
-    handlers = dict(pkl=dump_pkl, json=dump_json, jsonl=dump_jsonl, xlsx=dump_xlsx, csv=dump_csv, tsv=dump_tsv)
+    handlers = dict(
+        pkl=dump_pkl, json=dump_json, jsonl=dump_jsonl, xlsx=dump_xlsx, csv=dump_csv, tsv=dump_tsv,
+        parquet=dump_parquet)
     suffix = f.split('.')[-1]
     return handlers[suffix](data, f, **kwargs)
 
@@ -184,6 +229,9 @@ def load(f, fmt=None):
     def load_tsv(f):
         return pd.read_csv(f, sep='\t')
 
+    def load_parquet(f):
+        return pd.read_parquet(f)
+
     import validators
     if validators.url(f):
         tgt = osp.join(LMUDataRoot(), 'files', osp.basename(f))
@@ -191,7 +239,9 @@ def load(f, fmt=None):
             download_file(f, tgt)
         f = tgt
 
-    handlers = dict(pkl=load_pkl, json=load_json, jsonl=load_jsonl, xlsx=load_xlsx, csv=load_csv, tsv=load_tsv)
+    handlers = dict(
+        pkl=load_pkl, json=load_json, jsonl=load_jsonl, xlsx=load_xlsx, csv=load_csv, tsv=load_tsv,
+        parquet=load_parquet)
     if fmt is not None:
         return handlers[fmt](f)
 
@@ -0,0 +1,172 @@
+import os
+import os.path as osp
+import json
+import atexit
+import hashlib
+import threading
+from PIL import Image
+
+IMAGE_META_FILE = '.image_meta.json'
+# New records are persisted after this many lookups of unindexed images, and at exit
+IMAGE_META_SAVE_EVERY = 1024
+# Registered indices, keyed by the (real) image root they cover
+_META_INDICES = {}
+_META_LOCK = threading.Lock()
+
+
+def image_content_hash(path):
+    hasher = hashlib.new('md5')
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def read_image_meta(path, with_hash=True):
+    # PIL only parses the header in `Image.open`, pixel data is not decoded here
+    stat = os.stat(path)
+    with Image.open(path) as im:
+        width, height = im.size
+        meta = dict(width=width, height=height, mode=im.mode, format=im.format)
+    meta['bytes'] = stat.st_size
+    meta['mtime'] = stat.st_mtime
+    meta['hash'] = image_content_hash(path) if with_hash else None
+    return meta
+
+
+class ImageMetaIndex:
+    """Per-directory index of image metadata (width, height, mode, format, byte size, content hash).
+
+    The index is persisted as `.image_meta.json` under `root` and validated against the file size & mtime,
+    so a record is recomputed only when the underlying image changes. Records added by `get` are saved every
+    `IMAGE_META_SAVE_EVERY` new records and when the process exits.
+    """
+
+    def __init__(self, root, persist=True):
+        self.root = osp.realpath(root)
+        self.persist = persist
+        self.meta_file = osp.join(self.root, IMAGE_META_FILE)
+        self.dirty = 0
+        self.lock = threading.Lock()
+        self.records = self._load()
+
+    def _load(self):
+        if not osp.exists(self.meta_file):
+            return {}
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as err:
+            import logging
+            logging.warning(f'Failed to load image meta index {self.meta_file}: {type(err)} {err}')
+            return {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def key(self, path):
+        path = osp.realpath(path)
+        if path.startswith(self.root + os.sep):
+            return osp.relpath(path, self.root)
+        return path
+
+    def lookup(self, path):
+        # Return the cached record if it is still valid, never touch the image content
+        rec = self.records.get(self.key(path), None)
+        if rec is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != rec['bytes'] or stat.st_mtime != rec['mtime']:
+            return None
+        return rec
+
+    def get(self, path, with_hash=True):
+        rec = self.lookup(path)
+        if rec is not None and (rec['hash'] is not None or not with_hash):
+            return rec
+        rec = read_image_meta(path, with_hash=with_hash)
+        with self.lock:
+            self.records[self.key(path)] = rec
+            self.dirty += 1
+            flush = self.dirty >= IMAGE_META_SAVE_EVERY
+        if flush:
+            self.save()
+        return rec
+
+    def size(self, path):
+        rec = self.get(path, with_hash=False)
+        return rec['width'], rec['height']
+
+    def hash(self, path):
+        return self.get(path)['hash']
+
+    def build(self, paths, nproc=16, with_hash=True):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def _get(p):
+            try:
+                return self.get(p, with_hash=with_hash)
+            except Exception:
+                return None
+
+        paths = [p for p in set(paths) if osp.exists(p)]
+        with ThreadPoolExecutor(max_workers=max(nproc, 1)) as executor:
+            list(executor.map(_get, paths))
+        self.save()
+        return self
+
+    def save(self):
+        if not self.persist or not self.dirty:
+            return
+        with self.lock:
+            records = dict(self.records)
+            self.dirty = 0
+        # Other processes (e.g. the other ranks) may have saved records of their own since we loaded the file
+        records = {**self._load(), **records}
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f'{self.meta_file}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_file)
+
+
+def image_meta_index(root, persist=True):
+    root = osp.realpath(root)
+    with _META_LOCK:
+        if root not in _META_INDICES:
+            _META_INDICES[root] = ImageMetaIndex(root, persist=persist)
+        return _META_INDICES[root]
+
+
+@atexit.register
+def save_image_meta_indices():
+    for index in list(_META_INDICES.values()):
+        try:
+            index.save()
+        except Exception:
+            pass
+
+
+def lookup_image_meta(path):
+    # Only consult the registered indices, returns None if the image is not indexed
+    if len(_META_INDICES) == 0:
+        return None
+    dirname = osp.dirname(osp.realpath(path))
+    while True:
+        if dirname in _META_INDICES:
+            return _META_INDICES[dirname].lookup(path)
+        parent = osp.dirname(dirname)
+        if parent == dirname:
+            return None
+        dirname = parent
+
+
+def get_image_size(path):
+    rec = lookup_image_meta(path)
+    if rec is not None:
+        return rec['width'], rec['height']
+    with Image.open(path) as im:
+        return im.size
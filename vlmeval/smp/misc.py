@@ -133,6 +133,41 @@ def listinstr(lst, s):
 def d2df(D):
     return pd.DataFrame({x: [D[x]] for x in D})
 
+class DataRecords:
+    """Lightweight row access over a DataFrame, used in place of `data.iloc[i]` in hot loops.
+
+    Columns are materialized once as python lists, each row is returned as a plain dict (no pd.Series is built).
+    Rows can be accessed by position (`records[i]`) or by the `index` field (`records.by_index(idx)`).
+    """
+
+    def __init__(self, data, key='index'):
+        self.columns = list(data.columns)
+        self.arrays = [data[c].tolist() for c in self.columns]
+        self.key = key
+        self._pos = None
+
+    def __len__(self):
+        return len(self.arrays[0]) if len(self.arrays) else 0
+
+    def __getitem__(self, i):
+        return dict(zip(self.columns, [arr[i] for arr in self.arrays]))
+
+    def __iter__(self):
+        for row in zip(*self.arrays):
+            yield dict(zip(self.columns, row))
+
+    def column(self, name):
+        return self.arrays[self.columns.index(name)]
+
+    def position(self, idx):
+        if self._pos is None:
+            self._pos = {x: i for i, x in enumerate(self.column(self.key))}
+        return self._pos[idx]
+
+    def by_index(self, idx):
+        return self[self.position(idx)]
+
+
 def cn_string(s):
     import re
     if re.search(u'[\u4e00-\u9fff]', s):
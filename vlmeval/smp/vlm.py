@@ -96,6 +96,13 @@ def resize_image_by_factor(img, factor=1):
     return img
 
 
+def _image_to_base64(img, fmt='JPEG'):
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format=fmt)
+    image_data = img_buffer.getvalue()
+    return base64.b64encode(image_data).decode('utf-8')
+
+
 def encode_image_to_base64(img, target_size=-1, fmt='JPEG'):
     # if target_size == -1, will not do resizing
     # else, will set the max_size ot (target_size, target_size)
@@ -103,10 +110,7 @@ def encode_image_to_base64(img, target_size=-1, fmt='JPEG'):
         img = img.convert('RGB')
     if target_size > 0:
         img.thumbnail((target_size, target_size))
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format=fmt)
-    image_data = img_buffer.getvalue()
-    ret = base64.b64encode(image_data).decode('utf-8')
+    ret = _image_to_base64(img, fmt=fmt)
     max_size = os.environ.get('VLMEVAL_MAX_IMAGE_SIZE', 1e9)
     min_edge = os.environ.get('VLMEVAL_MIN_IMAGE_EDGE', 1e2)
     max_size = int(max_size)
@@ -115,19 +119,15 @@ def encode_image_to_base64(img, target_size=-1, fmt='JPEG'):
     if min(img.size) < min_edge:
         factor = min_edge / min(img.size)
         image_new = resize_image_by_factor(img, factor)
-        img_buffer = io.BytesIO()
-        image_new.save(img_buffer, format=fmt)
-        image_data = img_buffer.getvalue()
-        ret = base64.b64encode(image_data).decode('utf-8')
+        ret = _image_to_base64(image_new, fmt=fmt)
 
+    # The encoded size is roughly proportional to the pixel count, so we estimate the resize factor directly
+    # (with a small margin) instead of shrinking by a constant step. Usually converges in a single re-encode.
     factor = 1
     while len(ret) > max_size:
-        factor *= 0.7  # Half Pixels Per Resize, approximately
+        factor *= min(0.7 ** 0.5, (max_size / len(ret)) ** 0.5 * 0.95)
         image_new = resize_image_by_factor(img, factor)
-        img_buffer = io.BytesIO()
-        image_new.save(img_buffer, format=fmt)
-        image_data = img_buffer.getvalue()
-        ret = base64.b64encode(image_data).decode('utf-8')
+        ret = _image_to_base64(image_new, fmt=fmt)
 
     if factor < 1:
         new_w, new_h = image_new.size
@@ -139,9 +139,209 @@ def encode_image_to_base64(img, target_size=-1, fmt='JPEG'):
     return ret
 
 
+class EncodedImageCache:
+    """Thread-safe LRU cache of base64 image payloads, bounded by the total payload size.
+
+    If `cache_dir` is set, payloads are also written to disk and survive across processes.
+    """
+
+    def __init__(self, max_bytes=2 ** 28, cache_dir=None):
+        from collections import OrderedDict
+        import threading
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.cur_bytes = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def disk_path(self, key):
+        from hashlib import md5
+        digest = md5(repr(key).encode('utf-8')).hexdigest()
+        return osp.join(self.cache_dir, digest[:2], digest + '.b64')
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+        if self.cache_dir is not None:
+            pth = self.disk_path(key)
+            if osp.exists(pth):
+                with open(pth, 'r') as f:
+                    value = f.read()
+                self.put(key, value, to_disk=False)
+                with self.lock:
+                    self.hits += 1
+                return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value, to_disk=True):
+        if len(value) <= self.max_bytes:
+            with self.lock:
+                if key not in self.items:
+                    self.items[key] = value
+                    self.cur_bytes += len(value)
+                while self.cur_bytes > self.max_bytes:
+                    _, old = self.items.popitem(last=False)
+                    self.cur_bytes -= len(old)
+        if to_disk and self.cache_dir is not None:
+            pth = self.disk_path(key)
+            os.makedirs(osp.dirname(pth), exist_ok=True)
+            tmp = f'{pth}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                f.write(value)
+            os.replace(tmp, pth)
+
+
+def image_file_key(image_path):
+    # Prefer the content hash from the image meta index, fall back to (path, size, mtime)
+    from .image_meta import lookup_image_meta
+    meta = lookup_image_meta(image_path)
+    if meta is not None and meta['hash'] is not None:
+        return meta['hash']
+    stat = os.stat(image_path)
+    return (osp.realpath(image_path), stat.st_size, stat.st_mtime_ns)
+
+
+_ENCODED_IMAGE_CACHE = None
+
+
+def encoded_image_cache():
+    # Configured via `VLMEVAL_IMAGE_CACHE_MB` (0 to disable) and `VLMEVAL_IMAGE_CACHE_DIR` (disk tier)
+    global _ENCODED_IMAGE_CACHE
+    if _ENCODED_IMAGE_CACHE is None:
+        max_mb = int(os.environ.get('VLMEVAL_IMAGE_CACHE_MB', 256))
+        cache_dir = os.environ.get('VLMEVAL_IMAGE_CACHE_DIR', None)
+        _ENCODED_IMAGE_CACHE = EncodedImageCache(max_bytes=max_mb * 2 ** 20, cache_dir=cache_dir or None)
+    return _ENCODED_IMAGE_CACHE
+
+
 def encode_image_file_to_base64(image_path, target_size=-1, fmt='JPEG'):
-    image = Image.open(image_path)
-    return encode_image_to_base64(image, target_size=target_size, fmt=fmt)
+    cache = encoded_image_cache()
+    if cache.max_bytes <= 0 or not osp.exists(image_path):
+        image = Image.open(image_path)
+        return encode_image_to_base64(image, target_size=target_size, fmt=fmt)
+
+    key = (
+        image_file_key(image_path), target_size, fmt,
+        int(os.environ.get('VLMEVAL_MAX_IMAGE_SIZE', 1e9)), int(os.environ.get('VLMEVAL_MIN_IMAGE_EDGE', 1e2))
+    )
+    ret = cache.get(key)
+    if ret is None:
+        image = Image.open(image_path)
+        ret = encode_image_to_base64(image, target_size=target_size, fmt=fmt)
+        cache.put(key, ret)
+    return ret
+
+
+class TensorCache(EncodedImageCache):
+    """LRU cache of preprocessed image tensors (e.g. the pixel values of dynamic tiling), bounded by tensor bytes.
+
+    Values can be tensors or tuples / lists containing tensors. With `cache_dir`, floating tensors are stored on
+    disk in fp16 and restored to fp32. Cached tensors are shared, callers must not modify them in place.
+    """
+
+    @staticmethod
+    def nbytes(value):
+        import torch
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(TensorCache.nbytes(v) for v in value)
+        return 0
+
+    @staticmethod
+    def convert(value, dtype):
+        import torch
+        if isinstance(value, torch.Tensor):
+            return value.to(dtype) if value.is_floating_point() else value
+        if isinstance(value, (tuple, list)):
+            return type(value)(TensorCache.convert(v, dtype) for v in value)
+        return value
+
+    def disk_path(self, key):
+        return super().disk_path(key)[:-4] + '.pt'
+
+    def get(self, key):
+        import torch
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key][0]
+        if self.cache_dir is not None:
+            pth = self.disk_path(key)
+            if osp.exists(pth):
+                value = self.convert(torch.load(pth), torch.float32)
+                self.put(key, value, to_disk=False)
+                with self.lock:
+                    self.hits += 1
+                return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value, to_disk=True):
+        import torch
+        size = self.nbytes(value)
+        if size <= self.max_bytes:
+            with self.lock:
+                if key not in self.items:
+                    self.items[key] = (value, size)
+                    self.cur_bytes += size
+                while self.cur_bytes > self.max_bytes:
+                    _, (_, old_size) = self.items.popitem(last=False)
+                    self.cur_bytes -= old_size
+        if to_disk and self.cache_dir is not None:
+            pth = self.disk_path(key)
+            os.makedirs(osp.dirname(pth), exist_ok=True)
+            tmp = f'{pth}.{os.getpid()}.tmp'
+            torch.save(self.convert(value, torch.float16), tmp)
+            os.replace(tmp, pth)
+
+
+_PREPROCESS_CACHE = None
+
+
+def preprocess_cache():
+    # Configured via `VLMEVAL_PREPROC_CACHE_MB` (0 to disable) and `VLMEVAL_PREPROC_CACHE_DIR` (fp16 disk tier)
+    global _PREPROCESS_CACHE
+    if _PREPROCESS_CACHE is None:
+        max_mb = int(os.environ.get('VLMEVAL_PREPROC_CACHE_MB', 1024))
+        cache_dir = os.environ.get('VLMEVAL_PREPROC_CACHE_DIR', None)
+        _PREPROCESS_CACHE = TensorCache(max_bytes=max_mb * 2 ** 20, cache_dir=cache_dir or None)
+    return _PREPROCESS_CACHE
+
+
+def cached_image_preprocess(func):
+    """Decorator for image preprocessing functions whose first argument is an image file, e.g. `load_image` of
+    InternVL-style models. Results are cached by (image content, function, all other arguments)."""
+    import functools
+    import inspect
+    signature = inspect.signature(func)
+    file_arg = next(iter(signature.parameters))
+
+    @functools.wraps(func)
+    def wrapper(image_file, *args, **kwargs):
+        cache = preprocess_cache()
+        if cache.max_bytes <= 0 or not isinstance(image_file, str) or not osp.exists(image_file):
+            return func(image_file, *args, **kwargs)
+        bound = signature.bind(image_file, *args, **kwargs)
+        bound.apply_defaults()
+        params = tuple((k, v) for k, v in bound.arguments.items() if k != file_arg)
+        key = (image_file_key(image_file), func.__module__, func.__qualname__, params)
+        value = cache.get(key)
+        if value is None:
+            value = func(image_file, *args, **kwargs)
+            cache.put(key, value)
+        return value
+    return wrapper
 
 
 def decode_base64_to_image(base64_string, target_size=-1):
@@ -159,7 +359,78 @@ def decode_base64_to_image_file(base64_string, image_path, target_size=-1):
     base_dir = osp.dirname(image_path)
     if not osp.exists(base_dir):
         os.makedirs(base_dir, exist_ok=True)
-    image.save(image_path)
+    # Write to a temporary file and rename it: several ranks may dump the same (shared) image at the same time,
+    # and a reader must never see a partially written file
+    tmp_path = osp.join(base_dir, f'.{uuid4().hex}_{osp.basename(image_path)}')
+    try:
+        image.save(tmp_path)
+        os.replace(tmp_path, image_path)
+    finally:
+        if osp.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def video_meta(video_path):
+    # Returns (frame_count, fps) from the container metadata, no frame is decoded
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return frame_count, fps
+
+
+def read_video_frames(video_path, indices, seek_gap=None):
+    """Decode only the frames at `indices` (sorted, 0-based) and return them as RGB PIL images.
+
+    Short gaps are skipped with `grab` (no color conversion / copy), gaps longer than `seek_gap` frames
+    (default: 2 seconds of video) seek directly to the target frame. Frames past the end of the stream are dropped.
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if seek_gap is None:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        seek_gap = max(int(2 * fps), 16) if fps and fps > 0 else 64
+    frames = []
+    pos = 0
+    for idx in sorted(set(indices)):
+        if idx - pos > seek_gap:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            pos = idx
+        ok = True
+        while pos < idx and ok:
+            ok = cap.grab()
+            pos += 1
+        if not ok:
+            break
+        ok, frame = cap.read()
+        pos += 1
+        if not ok:
+            break
+        frames.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+    cap.release()
+    return frames
+
+
+def read_video_frames_sequential(video_path, gap=1):
+    """Decode the whole stream and keep every `gap`-th frame as an RGB PIL image.
+
+    Used when the container metadata cannot be trusted (missing or wrong frame count), returns (frames, frame_count)
+    where frame_count is the number of frames actually decoded.
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    frame_count = 0
+    while cap.grab():
+        if frame_count % gap == 0:
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            frames.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        frame_count += 1
+    cap.release()
+    return frames, frame_count
 
 
 def build_option_str(option_dict):
@@ -175,8 +446,12 @@ def isimg(s):
 
 
 def read_ok(img_path):
+    from .image_meta import lookup_image_meta
     if not osp.exists(img_path):
         return False
+    meta = lookup_image_meta(img_path)
+    if meta is not None:
+        return meta['width'] > 0 and meta['height'] > 0
     try:
         im = Image.open(img_path)
         assert im.size[0] > 0 and im.size[1] > 0
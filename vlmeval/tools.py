@@ -5,7 +5,9 @@ from vlmeval.config import *
 from vlmeval.smp import *
 
 # Define valid modes
-MODES = ('dlist', 'mlist', 'missing', 'circular', 'localize', 'check', 'run', 'eval', 'merge_pkl', 'scan')
+MODES = (
+    'dlist', 'mlist', 'missing', 'circular', 'localize', 'check', 'run', 'eval', 'merge_pkl', 'scan', 'sched', 'serve'
+)
 
 CLI_HELP_MSG = \
     f"""
@@ -38,6 +40,10 @@ CLI_HELP_MSG = \
             vlmutil merge_pkl [pkl_dir] [world_size]
         10. Scan evaluation results and detect api failure
             vlmutil scan --model [model_list.txt or model_names] --data [dataset_names] --root [root_dir]
+        11. Pack the evaluation of several local models onto the GPUs of the node
+            vlmutil sched --model [model_names] --data [dataset_names] [--max-replicas N] [--dry-run] [-- run.py args]
+        12. Load a model once and serve it to run.py (until idle for --idle-timeout seconds)
+            vlmutil serve --model [model_name] [--idle-timeout 1800] [--use-vllm]
     GitHub: https://github.com/open-compass/VLMEvalKit
     """  # noqa: E501
 
@@ -471,6 +477,53 @@ def parse_args_sync():
     return args, unknownargs
 
 
+def parse_args_sched():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, nargs='+', required=True)
+    parser.add_argument('--data', type=str, nargs='+', required=True)
+    parser.add_argument('--max-replicas', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true')
+    # Arguments after `--` are passed to run.py
+    argv = sys.argv[2:]
+    run_args = []
+    if '--' in argv:
+        run_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+    args = parser.parse_args(argv)
+    args.run_args = run_args
+    return args
+
+
+def SCHED(models, datasets, max_replicas=None, run_args=None, dry_run=False):
+    from vlmeval.utils.gpu_sched import GPUSlotScheduler
+    logger = get_logger('Sched')
+    scheduler = GPUSlotScheduler(max_replicas=max_replicas, run_args=run_args)
+    jobs = [(m, datasets) for m in models]
+    for m, need, mem in scheduler.plan(jobs):
+        mem = 'unknown' if mem is None else f'{mem:.1f} GB'
+        logger.info(f'{m}: {mem}, {need} GPU(s) per instance')
+    if not dry_run:
+        scheduler.run(jobs)
+
+
+def parse_args_serve():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, required=True)
+    parser.add_argument('--idle-timeout', type=int, default=1800)
+    parser.add_argument('--use-vllm', action='store_true')
+    args = parser.parse_args(sys.argv[2:])
+    return args
+
+
+def SERVE(model_name, idle_timeout=1800, use_vllm=False):
+    from vlmeval.utils.warm_pool import WarmModelWorker
+    # Same build kwargs as `infer_data`, so that run.py finds the worker
+    kwargs = {}
+    if listinstr(['Llama-4', 'Qwen2-VL', 'Qwen2.5-VL'], model_name):
+        kwargs = {'use_vllm': use_vllm}
+    WarmModelWorker(model_name, idle_timeout=idle_timeout, **kwargs).serve()
+
+
 def MERGE_PKL(pkl_dir, world_size=1):
     prefs = []
     for ws in list(range(1, 9)):
@@ -651,6 +704,12 @@ def cli():
         assert len(models)
         datasets = args.data
         SCAN(root, models, datasets if datasets is not None else [])
+    elif args[0].lower() == 'serve':
+        args = parse_args_serve()
+        SERVE(args.model, args.idle_timeout, args.use_vllm)
+    elif args[0].lower() == 'sched':
+        args = parse_args_sched()
+        SCHED(args.model, args.data, args.max_replicas, args.run_args, args.dry_run)
     else:
         logger.error('WARNING: command error!')
         logger.info(CLI_HELP_MSG)
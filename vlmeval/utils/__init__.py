@@ -1,7 +1,13 @@
 from .matching_util import can_infer, can_infer_option, can_infer_text, can_infer_sequence, can_infer_lego
-from .mp_util import track_progress_rich
+from .mp_util import track_progress_rich, track_pipeline_rich
+from .journal import PredictionJournal, publish_shard, collect_shards, remove_shards
+from .journal import ready_marker, mark_ready, wait_ready
+from .progress import ProgressReporter, emit_event, set_progress_context, record_api_usage
 
 
 __all__ = [
-    'can_infer', 'can_infer_option', 'can_infer_text', 'track_progress_rich', 'can_infer_sequence', 'can_infer_lego',
+    'can_infer', 'can_infer_option', 'can_infer_text', 'track_progress_rich', 'track_pipeline_rich',
+    'can_infer_sequence', 'can_infer_lego', 'PredictionJournal', 'publish_shard', 'collect_shards',
+    'remove_shards', 'ready_marker', 'mark_ready', 'wait_ready', 'ProgressReporter', 'emit_event',
+    'set_progress_context', 'record_api_usage',
 ]
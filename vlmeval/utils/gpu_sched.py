@@ -0,0 +1,167 @@
+import os
+import os.path as osp
+import re
+import sys
+import json
+import math
+import time
+import socket
+import subprocess
+from ..smp import get_logger
+
+# Memory (GB) needed per billion parameters (bf16 weights), and a fixed margin for activations / vision tower / cache
+GB_PER_BILLION = 2.4
+GB_MARGIN = 4
+# Fraction of the memory of a GPU a model is planned to use
+GPU_MEM_UTIL = 0.9
+
+
+def gpu_profile_file():
+    return os.environ.get(
+        'VLMEVAL_GPU_PROFILE', osp.join(osp.expanduser('~'), '.cache', 'vlmeval', 'gpu_profile.json'))
+
+
+def load_gpu_profile():
+    pth = gpu_profile_file()
+    if not osp.exists(pth):
+        return {}
+    try:
+        with open(pth) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def record_model_memory(model_name, gb):
+    """Record the measured peak memory (GB, summed over its GPUs) of one instance of `model_name`."""
+    profile = load_gpu_profile()
+    profile[model_name] = round(max(gb, profile.get(model_name, 0)), 2)
+    pth = gpu_profile_file()
+    os.makedirs(osp.dirname(pth), exist_ok=True)
+    tmp = f'{pth}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(profile, f, indent=4)
+    os.replace(tmp, pth)
+
+
+def measured_gpu_memory():
+    """Peak memory (GB) reserved by torch in this process, summed over the visible GPUs."""
+    import torch
+    if not torch.cuda.is_available():
+        return 0
+    return sum(torch.cuda.max_memory_reserved(i) for i in range(torch.cuda.device_count())) / 2**30
+
+
+def reset_measured_gpu_memory():
+    """Reset the peak memory counters of torch, so that `measured_gpu_memory` only covers the next model."""
+    import torch
+    if not torch.cuda.is_available():
+        return
+    for i in range(torch.cuda.device_count()):
+        torch.cuda.reset_peak_memory_stats(i)
+
+
+def estimate_model_memory(model_name):
+    """Memory (GB) of one instance of `model_name`: the measured value if profiled, else estimated from the
+    parameter count in its name (e.g. `InternVL3-78B`). Returns None if it can not be estimated."""
+    profile = load_gpu_profile()
+    if model_name in profile:
+        return profile[model_name]
+    sizes = [float(x) for x in re.findall(r'(?<![\d.])(\d+(?:\.\d+)?)[bB](?![a-zA-Z])', model_name)]
+    if not len(sizes):
+        return None
+    # For MoE names like `30B-A3B`, the total parameter count is the largest one
+    return max(sizes) * GB_PER_BILLION + GB_MARGIN
+
+
+def list_gpus():
+    """[(gpu id, memory in GB)] of the GPUs visible to this process, read from nvidia-smi."""
+    try:
+        output = subprocess.check_output(
+            ['nvidia-smi', '--query-gpu=index,memory.total', '--format=csv,noheader,nounits'], text=True)
+    except Exception:
+        return []
+    gpus = []
+    for line in output.strip().split('\n'):
+        if line.strip():
+            idx, mem = line.split(',')
+            gpus.append((int(idx), float(mem) / 1024))
+    visible = os.environ.get('CUDA_VISIBLE_DEVICES', '')
+    if visible != '':
+        visible = [int(x) for x in visible.split(',')]
+        gpus = [x for x in gpus if x[0] in visible]
+    return gpus
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+class GPUSlotScheduler:
+    """Pack model instances onto the GPUs of a node, instead of splitting all GPUs evenly among the processes.
+
+    Each model needs `ceil(memory / usable memory of a GPU)` GPUs per instance (see `estimate_model_memory`).
+    Jobs run concurrently on disjoint GPU sets: a small model gets several replicas (launched with `torchrun`,
+    each replica on its own GPUs), while a large model holds only the GPUs it needs. When a job finishes, its GPUs
+    are given to the pending jobs. Models whose memory is unknown take the whole node, API models take no GPU.
+    """
+
+    def __init__(self, gpus=None, max_replicas=None, run_args=None, script=None):
+        self.gpus = gpus if gpus is not None else list_gpus()
+        assert len(self.gpus), 'No GPU found'
+        self.gpu_mem = min(mem for _, mem in self.gpus) * GPU_MEM_UTIL
+        self.max_replicas = max_replicas or len(self.gpus)
+        self.run_args = run_args or []
+        self.script = script or osp.join(osp.dirname(__file__), '..', '..', 'run.py')
+        self.logger = get_logger('GPUSlotScheduler')
+
+    def gpus_per_instance(self, model_name):
+        from ..config import supported_VLM
+        model = supported_VLM.get(model_name, None)
+        if getattr(getattr(model, 'func', model), 'is_api', False):
+            return 0
+        mem = estimate_model_memory(model_name)
+        if mem is None:
+            return len(self.gpus)
+        return min(max(math.ceil(mem / self.gpu_mem), 1), len(self.gpus))
+
+    def command(self, model_name, datasets, replicas):
+        args = ['--model', model_name, '--data', *datasets, *self.run_args]
+        if replicas == 1:
+            return [sys.executable, self.script, *args]
+        return [
+            'torchrun', f'--nproc-per-node={replicas}', f'--master-port={_free_port()}', self.script, *args]
+
+    def plan(self, jobs):
+        """[(model_name, GPUs per instance, memory in GB)] for the jobs [(model_name, datasets)]."""
+        return [(m, self.gpus_per_instance(m), estimate_model_memory(m)) for m, _ in jobs]
+
+    def run(self, jobs, poll=5):
+        # Largest models first, smaller ones fill the remaining GPUs
+        pending = sorted(jobs, key=lambda x: -self.gpus_per_instance(x[0]))
+        free = [idx for idx, _ in self.gpus]
+        running = []
+        while len(pending) or len(running):
+            for job in list(pending):
+                model_name, datasets = job
+                need = self.gpus_per_instance(model_name)
+                if need > len(free):
+                    continue
+                # Share the free GPUs among the pending jobs, a job gets at least one instance
+                replicas = max(1, min(self.max_replicas, len(free) // len(pending) // need)) if need else 1
+                assigned, free = free[:need * replicas], free[need * replicas:]
+                env = dict(os.environ, CUDA_VISIBLE_DEVICES=','.join(str(x) for x in assigned))
+                cmd = self.command(model_name, datasets, replicas)
+                self.logger.info(f'Launching {model_name} ({replicas} x {need} GPUs) on GPU {assigned}: {cmd}')
+                running.append((job, assigned, subprocess.Popen(cmd, env=env)))
+                pending.remove(job)
+            time.sleep(poll if len(running) else 0)
+            for item in list(running):
+                job, assigned, proc = item
+                if proc.poll() is not None:
+                    if proc.returncode != 0:
+                        self.logger.error(f'{job[0]} exited with code {proc.returncode}')
+                    free = sorted(free + assigned)
+                    running.remove(item)
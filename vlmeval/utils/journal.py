@@ -0,0 +1,153 @@
+import os
+import os.path as osp
+import time
+import pickle
+import struct
+from ..smp import get_logger, dump
+
+
+class PredictionJournal:
+    """Append-only journal of predictions, stored next to the checkpoint as `{out_file}.journal`.
+
+    Every prediction is appended as a length-prefixed pickle record and flushed to the OS right away, so a crash of
+    the process loses nothing and a crash of the host loses at most the records since the last fsync. Fsyncs are
+    batched every `VLMEVAL_JOURNAL_FSYNC` records (default 16) or every second. The cost per prediction is constant,
+    whatever the size of the dataset.
+    On startup, `replay` rebuilds the predictions (a torn record at the end is dropped), and `compact` writes all
+    predictions to `out_file` and removes the journal.
+    """
+
+    HEADER = struct.Struct('<I')
+
+    def __init__(self, out_file, fsync_every=None, fsync_interval=1.0):
+        self.out_file = out_file
+        self.path = f'{out_file}.journal'
+        self.fsync_every = fsync_every or int(os.environ.get('VLMEVAL_JOURNAL_FSYNC', 16))
+        self.fsync_interval = fsync_interval
+        self.fh = None
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+    def replay(self):
+        res = {}
+        if not osp.exists(self.path):
+            return res
+        valid = 0
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        while valid + self.HEADER.size <= len(data):
+            size, = self.HEADER.unpack_from(data, valid)
+            end = valid + self.HEADER.size + size
+            if end > len(data):
+                break
+            try:
+                key, value = pickle.loads(data[valid + self.HEADER.size: end])
+            except Exception:
+                break
+            res[key] = value
+            valid = end
+        if valid < len(data):
+            get_logger('PredictionJournal').warning(
+                f'Dropped a torn record at the end of {self.path} ({len(data) - valid} bytes)')
+            # Truncate, so that new records are appended after the last valid one
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid)
+        return res
+
+    def append(self, key, value):
+        if self.fh is None:
+            self.fh = open(self.path, 'ab')
+        payload = pickle.dumps((key, value))
+        self.fh.write(self.HEADER.pack(len(payload)) + payload)
+        self.fh.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.time() - self.last_sync > self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.fh is not None and self.unsynced:
+            os.fsync(self.fh.fileno())
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+    def close(self):
+        if self.fh is not None:
+            self.sync()
+            self.fh.close()
+            self.fh = None
+
+    def compact(self, res):
+        """Write the final predictions to `out_file` and drop the journal."""
+        self.close()
+        # Replace atomically, the aggregating rank may be reading a previously published shard
+        tmp = osp.join(osp.dirname(self.out_file), f'.{os.getpid()}_{osp.basename(self.out_file)}')
+        dump(res, tmp)
+        os.replace(tmp, self.out_file)
+        if osp.exists(self.path):
+            os.remove(self.path)
+
+
+def publish_shard(out_file):
+    """Mark the per-rank prediction file as complete. The rank can move on, the shard is merged by rank 0."""
+    with open(f'{out_file}.done', 'w'):
+        pass
+
+
+def collect_shards(tmpl, world_size, timeout=None, poll=1):
+    """Load the per-rank shards `tmpl.format(rank)` as soon as each one is published, returns the merged predictions.
+
+    The shards are loaded (concurrently) while the slower ranks are still running, so the merge is done shortly
+    after the last rank finishes, without a barrier.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..smp import load
+    timeout = timeout or float(os.environ.get('DIST_TIMEOUT', 3600))
+    res, pending, futures = {}, set(range(world_size)), []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        while len(pending):
+            ready = [i for i in pending if osp.exists(f'{tmpl.format(i)}.done')]
+            for i in ready:
+                futures.append(executor.submit(load, tmpl.format(i)))
+                pending.remove(i)
+            if len(pending):
+                if time.time() - start > timeout:
+                    raise TimeoutError(f'Shards {sorted(pending)} of {tmpl} are not published after {timeout}s')
+                time.sleep(poll)
+        for fut in futures:
+            res.update(fut.result())
+    return res
+
+
+def remove_shards(tmpl, world_size):
+    for i in range(world_size):
+        # The marker goes first, a shard without marker is never merged
+        for pth in [f'{tmpl.format(i)}.done', tmpl.format(i)]:
+            if osp.exists(pth):
+                os.remove(pth)
+
+
+def ready_marker(path):
+    # Markers are specific to one launch (`VLMEVAL_RUN_TOKEN`, shared by the ranks), stale ones are never read
+    return f'{path}.{os.environ.get("VLMEVAL_RUN_TOKEN", "")}.ready'
+
+
+def mark_ready(marker, ok=True):
+    """Tell the other ranks that a preparation step done by this rank (e.g. building a dataset) has finished."""
+    tmp = f'{marker}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write('ok' if ok else 'failed')
+    os.replace(tmp, marker)
+
+
+def wait_ready(marker, timeout=None, poll=1):
+    """Wait for `mark_ready(marker)` on another rank, returns whether the step succeeded. Unlike a barrier, only
+    the ranks that need the result wait, and only for the rank doing the step."""
+    timeout = timeout or float(os.environ.get('DIST_TIMEOUT', 3600))
+    start = time.time()
+    while not osp.exists(marker):
+        if time.time() - start > timeout:
+            raise TimeoutError(f'{marker} is not ready after {timeout}s')
+        time.sleep(poll)
+    with open(marker) as f:
+        return f.read() == 'ok'
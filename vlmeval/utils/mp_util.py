@@ -9,6 +9,7 @@ import os.path as osp
 import time
 import portalocker
 from ..smp import load, dump
+from .progress import ProgressReporter
 
 
 def track_progress_rich(
@@ -50,6 +51,8 @@ def track_progress_rich(
 
         unfinished = set(range(len(tasks)))
         pbar = tqdm(total=len(unfinished))
+        name = osp.basename(save) if save is not None else getattr(getattr(func, 'func', func), '__name__', 'tasks')
+        reporter = ProgressReporter(name, len(unfinished))
         while len(unfinished):
             new_finished = set()
             for idx in unfinished:
@@ -62,11 +65,84 @@ def track_progress_rich(
                 if save is not None:
                     dump(res, save)
                 pbar.update(len(new_finished))
+                reporter.update(len(new_finished), [results[k] for k in new_finished])
                 for k in new_finished:
                     unfinished.remove(k)
             time.sleep(0.1)
         pbar.close()
+        reporter.close()
 
     if save is not None:
         dump(res, save)
     return results
+
+
+def track_pipeline_rich(
+        stages,
+        tasks,
+        keys,
+        nproc: int = 4,
+        save=None) -> dict:
+    """Run multi-stage jobs (e.g. extract -> score) as a pipeline.
+
+    Each stage is a callable `stage(item) -> dict`; the returned fields are merged into the item passed to the next
+    stage. An item moves on to the next stage as soon as its current stage finishes, each stage runs at most `nproc`
+    items concurrently. `save` is a single resumable checkpoint: {key: {stage name: result of the stage}}.
+    Returns {key: item with the fields of all stages merged}.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    from tqdm import tqdm
+    assert len(keys) == len(tasks)
+    if save is not None:
+        assert osp.exists(osp.dirname(save)) or osp.dirname(save) == ''
+    res = load(save) if save is not None and osp.exists(save) else {}
+    # Stages can be functools.partial objects, they are identified by the name of the wrapped function
+    names = [getattr(stage, 'func', stage).__name__ for stage in stages]
+
+    def progress(k):
+        # Index of the first stage not finished for key `k`
+        done = res.setdefault(k, {})
+        return next((i for i, name in enumerate(names) if name not in done), len(names))
+
+    def merged(k, item):
+        item = dict(item)
+        for name in names:
+            if name in res[k]:
+                item.update(res[k][name])
+        return item
+
+    executors = [ThreadPoolExecutor(max_workers=nproc) for _ in stages]
+    futures = {}
+    finished_cnt = 0
+    for k, item in zip(keys, tasks):
+        i = progress(k)
+        finished_cnt += i
+        if i < len(stages):
+            futures[executors[i].submit(stages[i], merged(k, item))] = (k, item, i)
+
+    pbar = tqdm(total=len(keys) * len(stages), initial=finished_cnt)
+    reporter = ProgressReporter(
+        osp.basename(save) if save is not None else '/'.join(names), len(keys) * len(stages), finished_cnt)
+    last_save = 0
+    try:
+        while len(futures):
+            finished, _ = wait(list(futures), timeout=1, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                k, item, i = futures.pop(fut)
+                res[k][names[i]] = fut.result()
+                if i + 1 < len(stages):
+                    futures[executors[i + 1].submit(stages[i + 1], merged(k, item))] = (k, item, i + 1)
+            pbar.update(len(finished))
+            reporter.update(len(finished))
+            if save is not None and (time.time() - last_save > 1 or len(futures) == 0):
+                dump(res, save)
+                last_save = time.time()
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=False)
+        pbar.close()
+        reporter.close()
+
+    if save is not None:
+        dump(res, save)
+    return {k: merged(k, item) for k, item in zip(keys, tasks)}
@@ -0,0 +1,75 @@
+import os
+import os.path as osp
+from ..smp import get_logger, image_file_key
+
+# Rough number of prompt tokens of an image, only used to estimate the reusable prefix
+IMAGE_TOKEN_ESTIMATE = 512
+CHARS_PER_TOKEN = 4
+
+
+def _message_items(message):
+    if isinstance(message, dict) and 'message' in message:
+        message = message['message']
+    if isinstance(message, str):
+        return [('text', message)]
+    if isinstance(message, dict):
+        message = [message]
+    items = []
+    for msg in message:
+        if isinstance(msg, str):
+            items.append(('text', msg))
+            continue
+        value = msg['value']
+        if msg['type'] != 'text' and isinstance(value, str) and osp.exists(value):
+            # Identify images / videos by content, so that copies of the same image share the prefix
+            value = str(image_file_key(value))
+        items.append((msg['type'], str(value)))
+    return items
+
+
+def _item_tokens(item):
+    return len(item[1]) / CHARS_PER_TOKEN if item[0] == 'text' else IMAGE_TOKEN_ESTIMATE
+
+
+def shared_prefix_tokens(items_a, items_b):
+    """Estimated number of leading prompt tokens shared by two messages."""
+    shared = 0
+    for a, b in zip(items_a, items_b):
+        if a == b:
+            shared += _item_tokens(a)
+            continue
+        if a[0] == 'text' and b[0] == 'text':
+            shared += len(osp.commonprefix([a[1], b[1]])) / CHARS_PER_TOKEN
+        break
+    return shared
+
+
+def prefix_reuse_stats(items):
+    # Estimated fraction of prompt tokens that can be served from a prefix cache if the requests are sent in order
+    total = sum(sum(_item_tokens(x) for x in it) for it in items)
+    shared = sum(shared_prefix_tokens(a, b) for a, b in zip(items[:-1], items[1:]))
+    return dict(total_tokens=int(total), shared_tokens=int(shared), reuse_ratio=shared / total if total else 0)
+
+
+def prefix_order(messages, log_name=None):
+    """Order requests so that those sharing a prefix (system prompt, images, few-shot examples) are adjacent.
+
+    The messages are sorted by their items (images by content key, texts lexicographically), so requests sharing
+    longer prefixes end up closer. Returns the permutation (a list of positions into `messages`).
+    """
+    items = [_message_items(m) for m in messages]
+    order = sorted(range(len(items)), key=lambda i: items[i])
+    if log_name is not None:
+        before = prefix_reuse_stats(items)
+        after = prefix_reuse_stats([items[i] for i in order])
+        get_logger('PrefixOrder').info(
+            f'{log_name}: {len(items)} requests, estimated prefix reuse '
+            f'{before["reuse_ratio"]:.1%} -> {after["reuse_ratio"]:.1%} '
+            f'({after["shared_tokens"]} / {after["total_tokens"]} tokens)'
+        )
+    return order
+
+
+def use_prefix_order():
+    # Opt-in via `VLMEVAL_PREFIX_ORDER=1`
+    return os.environ.get('VLMEVAL_PREFIX_ORDER', '0') == '1'
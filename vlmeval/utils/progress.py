@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import threading
+
+# Minimum seconds between two progress events of one loop, the first and the last events are always written
+PROGRESS_INTERVAL = 1.0
+FAIL_MARKERS = ('Failed to obtain answer', )
+
+_context = threading.local()
+_usage = dict(requests=0, prompt_tokens=0, completion_tokens=0)
+_usage_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def progress_file():
+    # Set by the caller (e.g. the flask service sets one file per job), events are not recorded if unset
+    return os.environ.get('VLMEVAL_PROGRESS_FILE', None)
+
+
+def set_progress_context(**kwargs):
+    """Set the fields (e.g. stage, model, dataset) added to the progress events emitted by the current thread."""
+    _context.fields = kwargs
+
+
+def record_api_usage(usage):
+    """Add the `usage` field of an API response (prompt / completion tokens) to the spend of this process."""
+    if not isinstance(usage, dict):
+        return
+    with _usage_lock:
+        _usage['requests'] += 1
+        _usage['prompt_tokens'] += int(usage.get('prompt_tokens') or 0)
+        _usage['completion_tokens'] += int(usage.get('completion_tokens') or 0)
+
+
+def api_usage():
+    with _usage_lock:
+        return dict(_usage)
+
+
+def emit_event(event, **kwargs):
+    """Append one json event to `VLMEVAL_PROGRESS_FILE`. Lines are written with a single append, so the events of
+    several processes (e.g. the ranks of `run.py`) can share the file."""
+    pth = progress_file()
+    if pth is None:
+        return
+    record = dict(event=event, time=time.time(), pid=os.getpid(), rank=int(os.environ.get('RANK', 0)))
+    record.update(getattr(_context, 'fields', {}))
+    record.update(kwargs)
+    line = json.dumps(record, default=str) + '\n'
+    try:
+        with _write_lock, open(pth, 'a') as f:
+            f.write(line)
+    except OSError:
+        pass
+
+
+class ProgressReporter:
+    """Emit `progress` events (completed / total, failures, throughput, ETA, API spend) for a loop.
+
+    Events are written at most every `VLMEVAL_PROGRESS_INTERVAL` seconds, the reporter is a no-op if
+    `VLMEVAL_PROGRESS_FILE` is not set.
+    """
+
+    def __init__(self, name, total, initial=0):
+        self.name = name
+        self.total = total
+        self.completed = initial
+        self.initial = initial
+        self.failures = 0
+        self.enabled = progress_file() is not None
+        self.interval = float(os.environ.get('VLMEVAL_PROGRESS_INTERVAL', PROGRESS_INTERVAL))
+        self.start = time.time()
+        self.last_emit = 0
+        self.usage = api_usage()
+        self.emit()
+
+    def update(self, n=1, results=()):
+        self.completed += n
+        self.failures += sum(isinstance(x, str) and any(m in x for m in FAIL_MARKERS) for x in results)
+        if self.enabled and time.time() - self.last_emit >= self.interval:
+            self.emit()
+
+    def emit(self, done=False):
+        if not self.enabled:
+            return
+        now = time.time()
+        self.last_emit = now
+        throughput = (self.completed - self.initial) / max(now - self.start, 1e-6)
+        remaining = self.total - self.completed
+        usage = {k: v - self.usage[k] for k, v in api_usage().items()}
+        emit_event(
+            'progress', name=self.name, completed=self.completed, total=self.total, failures=self.failures,
+            throughput=round(throughput, 4), eta=round(remaining / throughput, 1) if throughput > 0 else None,
+            api_usage=usage, done=done)
+
+    def close(self):
+        self.emit(done=True)
@@ -23,7 +23,7 @@ def MMMU_result_transfer(result_path):
             res[line['id']] = infer_prediction
         else:
             res[line['id']] = line['prediction']
-    result_json = result_path.replace('.xlsx', '.json')
+    result_json = get_intermediate_file_path(result_path, '', 'json')
     dump(res, result_json)
     return result_json
 
@@ -0,0 +1,258 @@
+import os
+import os.path as osp
+import json
+import time
+import pickle
+import hashlib
+import threading
+from ..smp import get_logger
+
+# A worker exits after being idle (no connection, no request) for this many seconds
+WARM_IDLE_TIMEOUT = 1800
+
+
+def warm_pool_dir():
+    return os.environ.get('VLMEVAL_WARM_POOL_DIR', osp.join(osp.expanduser('~'), '.cache', 'vlmeval', 'workers'))
+
+
+def worker_files(model_name, **kwargs):
+    # A worker is identified by the model name and the build kwargs (e.g. `use_vllm`)
+    key = json.dumps(dict(model=model_name, **kwargs), sort_keys=True)
+    name = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+    root = warm_pool_dir()
+    return osp.join(root, f'{name}.sock'), osp.join(root, f'{name}.json')
+
+
+class DatasetRef:
+    """Placeholder of a dataset object in the requests to a worker, the dataset is sent once per connection."""
+
+    def __init__(self, key):
+        self.key = key
+
+
+def _is_dataset(obj):
+    return not isinstance(obj, (str, bytes)) and hasattr(obj, 'dataset_name') and hasattr(obj, 'build_prompt')
+
+
+class WarmModelWorker:
+    """Serve a loaded model to other processes over a unix socket, so that the weights are loaded only once.
+
+    Requests are executed one at a time (models are not thread-safe), several clients (e.g. the ranks of `run.py`)
+    can be connected. Each connection has its own datasets and attribute overrides (`setattr`, `set_dump_image`),
+    applied to the shared model before each of its requests, so clients do not see the state of each other.
+    The worker exits after `idle_timeout` seconds without any connection or request.
+    """
+
+    MISSING = object()
+
+    def __init__(self, model_name, idle_timeout=WARM_IDLE_TIMEOUT, **kwargs):
+        from ..config import supported_VLM
+        self.model_name = model_name
+        self.kwargs = kwargs
+        self.idle_timeout = idle_timeout
+        self.address, self.meta_file = worker_files(model_name, **kwargs)
+        self.logger = get_logger('WarmModelWorker')
+        self.logger.info(f'Loading {model_name} with {kwargs}')
+        self.model = supported_VLM[model_name](**kwargs)
+        # Values of the attributes overridden by any connection, as loaded
+        self.defaults = {}
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.last_active = time.time()
+
+    def _load_dataset(self, payload, dataset_name):
+        if payload is not None:
+            return pickle.loads(payload)
+        # The dataset object can not be pickled, build it from its name
+        from ..dataset import build_dataset
+        return build_dataset(dataset_name)
+
+    def _override(self, state, name, value):
+        if name not in self.defaults:
+            self.defaults[name] = getattr(self.model, name, self.MISSING)
+        state['attrs'][name] = value
+
+    def _apply(self, state):
+        # The overrides of this connection on top of the model as loaded
+        for name, default in self.defaults.items():
+            value = state['attrs'].get(name, default)
+            if value is self.MISSING:
+                if hasattr(self.model, name):
+                    delattr(self.model, name)
+            else:
+                setattr(self.model, name, value)
+
+    def _resolve(self, state, value):
+        return state['datasets'][value.key] if isinstance(value, DatasetRef) else value
+
+    def handle(self, request, state):
+        op, name = request[0], request[1]
+        if op == 'dataset':
+            state['datasets'][name] = self._load_dataset(*request[2:])
+            return 'value', None
+        if op == 'setattr':
+            self._override(state, name, request[2])
+            return 'value', None
+        if op == 'set_dump_image':
+            self._override(state, 'dump_image_func', state['datasets'][name].dump_image)
+            return 'value', None
+        self._apply(state)
+        if op == 'getattr':
+            if not hasattr(self.model, name):
+                return 'missing', None
+            value = getattr(self.model, name)
+            return ('method', None) if callable(value) else ('value', value)
+        args = [self._resolve(state, x) for x in request[2]]
+        kwargs = {k: self._resolve(state, v) for k, v in request[3].items()}
+        return 'value', getattr(self.model, name)(*args, **kwargs)
+
+    def _serve_connection(self, conn):
+        state = dict(datasets={}, attrs={})
+        with self.lock:
+            self.connections += 1
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                with self.lock:
+                    self.last_active = time.time()
+                    try:
+                        response = self.handle(request, state)
+                    except Exception as err:
+                        response = 'error', err
+                    self.last_active = time.time()
+                try:
+                    conn.send(response)
+                except Exception as err:
+                    # e.g. the return value can not be pickled
+                    conn.send(('error', RuntimeError(f'{type(err)}: {err}')))
+        finally:
+            conn.close()
+            with self.lock:
+                self.connections -= 1
+                self.last_active = time.time()
+
+    def _idle_monitor(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 10))
+            with self.lock:
+                idle = self.connections == 0 and time.time() - self.last_active > self.idle_timeout
+            if idle:
+                self.logger.info(f'{self.model_name} idle for {self.idle_timeout}s, exiting')
+                self.cleanup()
+                os._exit(0)
+
+    def cleanup(self):
+        for pth in [self.meta_file, self.address]:
+            if osp.exists(pth):
+                os.remove(pth)
+
+    def serve(self):
+        from multiprocessing.connection import Listener
+        os.makedirs(osp.dirname(self.address), exist_ok=True)
+        if osp.exists(self.address):
+            os.remove(self.address)
+        authkey = os.urandom(16)
+        listener = Listener(self.address, family='AF_UNIX', authkey=authkey)
+        os.chmod(self.address, 0o600)
+        # The meta file is only readable by the owner, it holds the key to connect
+        fd = os.open(self.meta_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(model=self.model_name, kwargs=self.kwargs, pid=os.getpid(), authkey=authkey.hex()), f)
+        self.logger.info(f'Serving {self.model_name} at {self.address}')
+        threading.Thread(target=self._idle_monitor, daemon=True).start()
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn, ), daemon=True).start()
+        finally:
+            self.cleanup()
+
+
+class WarmModel:
+    """Client of a `WarmModelWorker`, used in place of the model object.
+
+    Method calls and attribute accesses are forwarded to the worker. Dataset objects passed to the model (as
+    arguments or through `set_dump_image`) are sent once, and referred to by a `DatasetRef` in later requests.
+    """
+
+    def __init__(self, conn, model_name):
+        self.__dict__['_conn'] = conn
+        self.__dict__['_model_name'] = model_name
+        self.__dict__['_lock'] = threading.Lock()
+        # Datasets sent to the worker, the references keep their ids from being reused
+        self.__dict__['_datasets'] = {}
+
+    def _request(self, *request):
+        with self._lock:
+            self._conn.send(request)
+            status, value = self._conn.recv()
+        if status == 'error':
+            raise value
+        return status, value
+
+    def _dataset_ref(self, dataset):
+        key = id(dataset)
+        if key not in self._datasets:
+            try:
+                payload = pickle.dumps(dataset)
+            except Exception:
+                payload = None
+            self._request('dataset', key, payload, dataset.dataset_name)
+            self._datasets[key] = dataset
+        return DatasetRef(key)
+
+    def _call(self, name, args, kwargs):
+        args = tuple(self._dataset_ref(x) if _is_dataset(x) else x for x in args)
+        kwargs = {k: self._dataset_ref(v) if _is_dataset(v) else v for k, v in kwargs.items()}
+        return self._request('call', name, args, kwargs)[1]
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        status, value = self._request('getattr', name)
+        if status == 'missing':
+            raise AttributeError(f'{self._model_name} has no attribute {name}')
+        if status == 'method':
+            return lambda *args, **kwargs: self._call(name, args, kwargs)
+        return value
+
+    def __setattr__(self, name, value):
+        self._request('setattr', name, value)
+
+    def set_dump_image(self, dump_image_func):
+        self._request('set_dump_image', self._dataset_ref(dump_image_func.__self__).key)
+
+    def close(self):
+        self._conn.close()
+
+
+def connect_warm_model(model_name, **kwargs):
+    """Return a `WarmModel` connected to the worker serving `model_name` with `kwargs`, None if there is none.
+
+    Set `VLMEVAL_WARM_POOL=0` to always load the model in the current process.
+    """
+    if os.environ.get('VLMEVAL_WARM_POOL', '1') == '0':
+        return None
+    address, meta_file = worker_files(model_name, **kwargs)
+    if not osp.exists(address) or not osp.exists(meta_file):
+        return None
+    from multiprocessing.connection import Client
+    try:
+        with open(meta_file) as f:
+            meta = json.load(f)
+        conn = Client(address, family='AF_UNIX', authkey=bytes.fromhex(meta['authkey']))
+    except Exception as err:
+        get_logger('WarmModel').warning(f'Failed to connect to the worker of {model_name}: {type(err)} {err}')
+        return None
+    get_logger('WarmModel').info(f'Using the warm worker of {model_name} (pid {meta["pid"]})')
+    return WarmModel(conn, model_name)
+
+
+def build_model(model_name, **kwargs):
+    """Connect to a warm worker of `model_name` if one is running, else build the model in this process."""
+    from ..config import supported_VLM
+    model = connect_warm_model(model_name, **kwargs)
+    return model if model is not None else supported_VLM[model_name](**kwargs)
@@ -108,12 +108,36 @@ class BaseModel:
         Returns:
             str: The generated message.
         """
+        message = self._check_and_preproc(message)
+        return self.generate_inner(message, dataset)
+
+    def _check_and_preproc(self, message):
         assert self.check_content(message) in ['str', 'dict', 'liststr', 'listdict'], f'Invalid input type: {message}'
         message = self.preproc_content(message)
         assert message is not None and self.check_content(message) == 'listdict'
         for item in message:
             assert item['type'] in self.allowed_types, f'Invalid input type: {item["type"]}'
-        return self.generate_inner(message, dataset)
+        return message
+
+    def support_batch_generate(self):
+        """Whether the model can generate a list of messages at once (via `generate_batch_inner`).
+        Currently only enabled for models running on the vLLM backend."""
+        return getattr(self, 'use_vllm', False) and hasattr(self, 'generate_batch_inner')
+
+    def generate_batch(self, messages, dataset=None):
+        """Generate the output messages for a list of input messages.
+
+        Args:
+            messages (list[list[dict]]): The input messages.
+            dataset (str, optional): The name of the dataset. Defaults to None.
+
+        Returns:
+            list[str]: The generated messages, in the same order as the inputs.
+        """
+        messages = [self._check_and_preproc(m) for m in messages]
+        if self.support_batch_generate():
+            return self.generate_batch_inner(messages, dataset)
+        return [self.generate_inner(m, dataset) for m in messages]
 
     def chat(self, messages, dataset=None):
         """The main function for multi-turn chatting. Will call `chat_inner` with the preprocessed input messages."""
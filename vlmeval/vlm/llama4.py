@@ -56,8 +56,9 @@ class llama4(BaseModel):
                 )
             self.llm = LLM(
                 model=model_path,
-                max_num_seqs=4,
+                max_num_seqs=kwargs.get('max_num_seqs', 4),
                 max_model_len=32768,
+                enable_prefix_caching=kwargs.get('enable_prefix_caching', True),
                 limit_mm_per_prompt={"image": self.limit_mm_per_prompt},
                 tensor_parallel_size=tp_size,
                 gpu_memory_utilization=kwargs.get("gpu_utils", 0.9),
@@ -226,8 +227,7 @@ class llama4(BaseModel):
             )
         return processed_message, images
 
-    def generate_inner_vllm(self, message, dataset=None):
-        from vllm import LLM, SamplingParams
+    def _build_vllm_request(self, message, dataset=None):
         prompt, images = self.message_to_promptimg_vllm(message, dataset=dataset)
         messages = [
             {'role': 'user', 'content': prompt}
@@ -237,26 +237,38 @@ class llama4(BaseModel):
             tokenize=False,
             add_generation_prompt=True
         )
-        sampling_params = SamplingParams(temperature=self.generate_kwargs['temperature'],
-                                         max_tokens=self.generate_kwargs['max_new_tokens'])
-        outputs = self.llm.generate(
-            {
-                "prompt": prompt,
-                "multi_modal_data": {
-                    "image": images
-                },
+        return {
+            "prompt": prompt,
+            "multi_modal_data": {
+                "image": images
             },
-            sampling_params=sampling_params
-        )
+        }
 
-        for o in outputs:
-            generated_text = o.outputs[0].text
+    def _vllm_sampling_params(self):
+        from vllm import SamplingParams
+        return SamplingParams(temperature=self.generate_kwargs['temperature'],
+                              max_tokens=self.generate_kwargs['max_new_tokens'])
 
+    def _postprocess_vllm_output(self, generated_text):
         if generated_text.endswith("<|eot|>"):
             generated_text = generated_text[:-7]  # 删除末尾的<|eot|>
-
         return generated_text
 
+    def generate_inner_vllm(self, message, dataset=None):
+        outputs = self.llm.generate(
+            self._build_vllm_request(message, dataset=dataset),
+            sampling_params=self._vllm_sampling_params()
+        )
+        return self._postprocess_vllm_output(outputs[0].outputs[0].text)
+
+    def generate_batch_inner(self, messages, dataset=None):
+        # Submit the whole batch in a single `LLM.generate` call, vLLM returns the outputs in the input order
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            requests = list(executor.map(lambda m: self._build_vllm_request(m, dataset=dataset), messages))
+        outputs = self.llm.generate(requests, sampling_params=self._vllm_sampling_params(), use_tqdm=False)
+        return [self._postprocess_vllm_output(o.outputs[0].text) for o in outputs]
+
     def generate_inner_lmdeploy(self, message, dataset=None):
         from lmdeploy import GenerationConfig
         gen_config = GenerationConfig(
@@ -131,6 +131,7 @@ def dynamic_preprocess2(image, min_num=1, max_num=6, image_size=448, use_thumbna
     return processed_images
 
 
+@cached_image_preprocess
 def load_image(image_file, input_size=448, min_num=1, max_num=6):
     image = Image.open(image_file).convert('RGB')
     transform = build_transform(input_size=input_size)
@@ -141,6 +142,7 @@ def load_image(image_file, input_size=448, min_num=1, max_num=6):
     return pixel_values, target_aspect_ratio
 
 
+@cached_image_preprocess
 def load_image2(image_file, input_size=448, target_aspect_ratio=(1, 1), min_num=1, max_num=6):
     image = Image.open(image_file).convert('RGB')
     transform = build_transform(input_size=input_size)
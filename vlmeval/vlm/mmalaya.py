@@ -144,6 +144,7 @@ def dynamic_preprocess(
     return processed_images
 
 
+@cached_image_preprocess
 def load_image(image_file, input_size=448, max_num=6, upscale=False):
     image = Image.open(image_file).convert('RGB')
     if upscale:
@@ -11,7 +11,7 @@ from transformers import StoppingCriteria
 
 from ..base import BaseModel
 from .prompt import Qwen2VLPromptMixin
-from ...smp import get_gpu_memory, listinstr
+from ...smp import get_gpu_memory, listinstr, video_meta, read_video_frames, read_video_frames_sequential
 from ...dataset import DATASET_MODALITY
 
 VLLM_MAX_IMAGE_INPUT_NUM = 24
@@ -89,42 +89,37 @@ def _resize_image(image, max_side):
 
 
 def process_video(video_path, num_frames, min_pixels, max_pixels):
-    import cv2
-    # Open the video file
-    cap = cv2.VideoCapture(video_path)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)  # Frames per second
-
-    # the sampling rate using max number of frames
-    sampling_gap_maxframe = (
-        1 if not num_frames else math.ceil(frame_count / num_frames)
-    )
-    sampling_gap = max(math.ceil(fps / 5), sampling_gap_maxframe)
-
-    frame_number = 0
-    images = []
-
-    while True:
-        import tempfile
-        success, frame = cap.read()
-        if not success:
-            break
-        # Sample frames based on the dynamic sampling rate
-        if frame_number % sampling_gap == 0:
-            # Create a temporary file for the frame
-            with tempfile.NamedTemporaryFile(
-                suffix=".jpg", delete=False
-            ) as temp_frame:
-                cv2.imwrite(temp_frame.name, frame)
-                images.append(create_image_content(temp_frame.name, min_pixels, max_pixels))
-                os.remove(temp_frame.name)
-        frame_number += 1
-    if frame_number == 0:
+    frame_count, fps = video_meta(video_path)
+    fps_gap = math.ceil(fps / 5) if fps and fps > 0 else 1
+
+    frames = None
+    if frame_count > 0:
+        # the sampling rate using max number of frames
+        sampling_gap_maxframe = (
+            1 if not num_frames else math.ceil(frame_count / num_frames)
+        )
+        sampling_gap = max(fps_gap, sampling_gap_maxframe)
+        # Only the sampled frames are decoded, and they are passed to the processor as in-memory PIL images
+        indices = list(range(0, frame_count, sampling_gap))
+        frames = read_video_frames(video_path, indices)
+        if len(frames) < len(indices):
+            # The stream is shorter than the metadata claims, the sampled positions cannot be trusted
+            frames = None
+    if frames is None:
+        # Missing or inconsistent frame count: decode sequentially, then apply the gap of the real frame count
+        frames, frame_count = read_video_frames_sequential(video_path, fps_gap)
+        if num_frames and frame_count:
+            sampling_gap = max(fps_gap, math.ceil(frame_count / num_frames))
+            frames = frames[::math.ceil(sampling_gap / fps_gap)]
+    if len(frames) == 0:
         raise ValueError(f"Failed to read video from {video_path}, check data...")
+    images = [
+        {'type': 'image', 'image': frame, 'min_pixels': min_pixels, 'max_pixels': max_pixels}
+        for frame in frames
+    ]
     logging.info(
-        f"Sampled {len(images)}/{frame_number} frames from video {video_path}"
+        f"Sampled {len(images)}/{frame_count} frames from video {video_path}"
     )
-    cap.release()
     return images
 
 
@@ -248,6 +243,7 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
         self.limit_mm_per_prompt = VLLM_MAX_IMAGE_INPUT_NUM
         assert self.use_vllm + self.use_lmdeploy <= 1, "You can only set one flag between `use_vllm` and `use_lmdeploy` to True"  # noqa: E501
 
+        self.batch_nproc = kwargs.get('batch_nproc', 8)
         if self.use_vllm:
             from vllm import LLM
             gpu_count = torch.cuda.device_count()
@@ -270,8 +266,9 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
                 )
             self.llm = LLM(
                 model=self.model_path,
-                max_num_seqs=5,
+                max_num_seqs=kwargs.get('max_num_seqs', 5),
                 max_model_len=32768,
+                enable_prefix_caching=kwargs.get('enable_prefix_caching', True),
                 limit_mm_per_prompt={"image": self.limit_mm_per_prompt},
                 tensor_parallel_size=tp_size,
                 gpu_memory_utilization=kwargs.get("gpu_utils", 0.9),
@@ -517,9 +514,7 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
         response = response.text
         return response
 
-    def generate_inner_vllm(self, message, dataset=None):
-        from vllm import SamplingParams
-
+    def _build_vllm_request(self, message, dataset=None):
         if listinstr(['omni'], self.model_path.lower()):
             try:
                 from qwen_omni_utils import process_mm_info
@@ -545,7 +540,6 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
             audios, images, videos = process_mm_info(messages, use_audio_in_video=self.use_audio_in_video)
         else:
             images, videos = process_vision_info(messages)
-        print('finishing process vision info in vllm.')
 
         if DATASET_MODALITY(dataset) == 'VIDEO' and 'megabench' not in dataset.lower():
             assert len(videos) == 1
@@ -563,33 +557,13 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
                 video_inputs['mm_processor_kwargs']['use_audio_in_video'] = True
             if videos_nd[0].shape[0] > VLLM_MAX_IMAGE_INPUT_NUM:
                 print('video input sequence may be too long for vllm, Maybe cannot generate response for VLLM')
-        sampling_params = SamplingParams(
-            temperature=0.0, max_tokens=self.max_new_tokens, stop_token_ids=None
-        )
+            if not images:
+                return video_inputs
         if images:
-            outputs = self.llm.generate(
-                {
-                    "prompt": text,
-                    "multi_modal_data": {"image": images},
-                },
-                sampling_params=sampling_params,
-            )
-        elif videos_nd:
-            outputs = self.llm.generate(
-                video_inputs,
-                sampling_params=sampling_params,
-            )
-        else:
-            outputs = self.llm.generate(
-                {
-                    "prompt": text,
-                },
-                sampling_params=sampling_params,
-            )
-
-        for o in outputs:
-            generated_text = o.outputs[0].text
+            return {"prompt": text, "multi_modal_data": {"image": images}}
+        return {"prompt": text}
 
+    def _postprocess_vllm_output(self, generated_text):
         if self.post_process:
             resp = generated_text.split('\\boxed{')[-1]
             lt = len(resp)
@@ -612,6 +586,24 @@ class Qwen2VLChat(Qwen2VLPromptMixin, BaseModel):
             print(f'\033[32m{generated_text}\033[0m')
         return generated_text
 
+    def _vllm_sampling_params(self):
+        from vllm import SamplingParams
+        return SamplingParams(temperature=0.0, max_tokens=self.max_new_tokens, stop_token_ids=None)
+
+    def generate_inner_vllm(self, message, dataset=None):
+        request = self._build_vllm_request(message, dataset=dataset)
+        outputs = self.llm.generate(request, sampling_params=self._vllm_sampling_params())
+        return self._postprocess_vllm_output(outputs[0].outputs[0].text)
+
+    def generate_batch_inner(self, messages, dataset=None):
+        # Prompts & vision inputs are prepared in parallel, then submitted in a single `LLM.generate` call
+        # so that vLLM can schedule them with continuous batching. Outputs keep the input order.
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.batch_nproc) as executor:
+            requests = list(executor.map(lambda m: self._build_vllm_request(m, dataset=dataset), messages))
+        outputs = self.llm.generate(requests, sampling_params=self._vllm_sampling_params(), use_tqdm=False)
+        return [self._postprocess_vllm_output(o.outputs[0].text) for o in outputs]
+
     def generate_inner(self, message, dataset=None):
         if self.use_vllm:
             return self.generate_inner_vllm(message, dataset=dataset)
@@ -99,6 +99,7 @@ def dynamic_preprocess(image, min_num=1, max_num=6, image_size=448, use_thumbnai
     return processed_images
 
 
+@cached_image_preprocess
 def load_image(image_file, input_size=448, max_num=6, upscale=False, normalize_type="imagenet"):
     image = Image.open(image_file).convert('RGB')
     if upscale:
@@ -115,6 +115,7 @@ def dynamic_preprocess(image, min_num=1, max_num=6, image_size=448, use_thumbnai
     return processed_images
 
 
+@cached_image_preprocess
 def load_image(image_file, input_size=448, max_num=6, upscale=False):
     image = Image.open(image_file).convert("RGB")
     if upscale:
@@ -322,6 +323,7 @@ def dynamic_preprocess_msac2(
     return processed_images
 
 
+@cached_image_preprocess
 def load_image_msac(image_file, input_size=448, max_num=10, upscale=False):
     image = Image.open(image_file).convert("RGB")
     if upscale: